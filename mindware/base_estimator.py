@@ -30,7 +30,9 @@ class BaseEstimator(object):
             evaluation='holdout', 
             resampling_params=None,
             output_dir="/tmp/", 
-            delete_output_dir_after_fit=False): 
+            delete_output_dir_after_fit=False,
+            resume=False,
+            continue_training=False): 
         self.dataset_name = dataset_name 
         self.metric = metric
         self.task_type = None
@@ -58,6 +60,11 @@ class BaseEstimator(object):
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
         self.delete_output_dir = delete_output_dir_after_fit
+        # Restore the runs of an earlier process with the same output_dir and timestamp.
+        self.resume = resume
+        # In the 'partial' evaluation, iterative learners spend the resource on iterations and resume
+        # the estimator fitted on the lower rung, instead of training on a subsample.
+        self.continue_training = continue_training
 
     def get_output_dir(self):
         return self.output_dir
@@ -82,7 +89,9 @@ class BaseEstimator(object):
             n_jobs=self.n_jobs,
             evaluation=self.evaluation,
             resampling_params=self.resampling_params,
-            output_dir=self.output_dir
+            output_dir=self.output_dir,
+            resume=self.resume,
+            continue_training=self.continue_training
         )
         return engine
 
@@ -99,7 +108,10 @@ class BaseEstimator(object):
         return self
 
     def predict(self, X: DataNode, batch_size=None, n_jobs=1):
-        return self._ml_engine.predict(X)
+        if batch_size is None and n_jobs == 1:
+            return self._ml_engine.predict(X)
+        # Stream the test data through the pipelines in batches, with members evaluated in parallel.
+        return self._ml_engine.solver.predict(X, batch_size=batch_size, n_jobs=n_jobs)
 
     def score(self, data: DataNode):
         return self._ml_engine.score(data)
@@ -108,7 +120,20 @@ class BaseEstimator(object):
         return self._ml_engine.refit()
 
     def predict_proba(self, X: DataNode, batch_size=None, n_jobs=1):
-        return self._ml_engine.predict_proba(X)
+        if batch_size is None and n_jobs == 1:
+            return self._ml_engine.predict_proba(X)
+        return self._ml_engine.solver.predict_proba(X, batch_size=batch_size, n_jobs=n_jobs)
+
+    def export(self, path, label_encoder=None):
+        """
+            Export the fitted models into a single inference artifact.
+            Load it with mindware.components.computation.inference_artifact.load_artifact.
+        :param path: the file to save the artifact.
+        :param label_encoder: the label encoder fitted on the training labels.
+        """
+        if self._ml_engine is None:
+            raise AttributeError("Please fit the estimator first!")
+        return self._ml_engine.solver.export(path, label_encoder=label_encoder)
 
     def get_automl(self):
         return AutoML
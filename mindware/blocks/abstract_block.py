@@ -6,10 +6,13 @@ import numpy as np
 from ConfigSpace import ConfigurationSpace
 from mindware.components.metrics.metric import get_metric
 from mindware.components.feature_engineering.transformation_graph import DataNode
-from mindware.components.feature_engineering.parse import construct_node, parse_config
+from mindware.components.feature_engineering.parse import construct_node, parse_config, compile_node
 from mindware.components.ensemble.ensemble_bulider import EnsembleBuilder
+from mindware.components.computation.batch_inference import predict_pipeline, get_pipeline_key
+from mindware.components.computation.inference_artifact import InferenceArtifact
 from mindware.components.evaluators.base_evaluator import fetch_predict_estimator
-from mindware.components.utils.topk_saver import CombinedTopKModelSaver, load_combined_transformer_estimator
+from mindware.components.utils.topk_saver import CombinedTopKModelSaver, load_combined_transformer_estimator, \
+    load_topk_config
 from mindware.components.utils.constants import CLS_TASKS
 from mindware.utils.functions import is_imbalanced_dataset
 from mindware.utils.logging_utils import get_logger
@@ -34,7 +37,9 @@ class AbstractBlock(object):
                  eval_type='holdout',
                  resampling_params=None,
                  n_jobs=1,
-                 seed=1):
+                 seed=1,
+                 resume=False,
+                 continue_training=False):
         # Tree setting
         self.node_list = node_list
         self.node_index = node_index
@@ -62,6 +67,10 @@ class AbstractBlock(object):
         self.ensemble_size = ensemble_size
         self.n_jobs = n_jobs
         self.seed = seed
+        # Restore the runs of an earlier process with the same output_dir and timestamp.
+        self.resume = resume
+        # In the 'partial' strategy, iterative learners resume the estimator fitted on the lower rung.
+        self.continue_training = continue_training
         self.output_dir = output_dir
 
         self.early_stop_flag = False
@@ -80,14 +89,13 @@ class AbstractBlock(object):
     def refit(self):
         if self.ensemble_method is not None:
             self.logger.info('Start to refit all the well-performed models!')
-            config_path = os.path.join(self.output_dir, '%s_topk_config.pkl' % self.timestamp)
+            stats = load_topk_config(self.output_dir, self.timestamp)
 
-            if not os.path.exists(config_path):
-                warnings.warn("Config path %s not found! Please check if all the evaluations are failed!" % config_path)
+            if not stats:
+                warnings.warn("Top-k configs of %s not found! Please check if all the evaluations are failed!"
+                              % self.timestamp)
                 return
 
-            with open(config_path, 'rb') as f:
-                stats = pkl.load(f)
             for algo_id in stats.keys():
                 model_to_eval = stats[algo_id]
                 for idx, (config, perf, path) in enumerate(model_to_eval):
@@ -124,9 +132,7 @@ class AbstractBlock(object):
 
     def fit_ensemble(self):
         if self.ensemble_method is not None:
-            config_path = os.path.join(self.output_dir, '%s_topk_config.pkl' % self.timestamp)
-            with open(config_path, 'rb') as f:
-                stats = pkl.load(f)
+            stats = load_topk_config(self.output_dir, self.timestamp)
 
             # Ensembling all intermediate/ultimate models found in above optimization process.
             self.es = EnsembleBuilder(stats=stats,
@@ -138,20 +144,20 @@ class AbstractBlock(object):
                                       output_dir=self.output_dir)
             self.es.fit(data=self.original_data)
 
-    def predict(self, test_data: DataNode):
+    def predict(self, test_data: DataNode, batch_size=None, n_jobs=1):
         if self.task_type in CLS_TASKS:
-            pred = self._predict(test_data)
+            pred = self._predict(test_data, batch_size=batch_size, n_jobs=n_jobs)
             return np.argmax(pred, axis=-1)
         else:
-            return self._predict(test_data)
+            return self._predict(test_data, batch_size=batch_size, n_jobs=n_jobs)
 
-    def _predict(self, test_data: DataNode):
+    def _predict(self, test_data: DataNode, batch_size=None, n_jobs=1):
         if self.ensemble_method is not None:
             if self.es is None and self.eval_type == 'cv':
                 raise AttributeError("Please call refit() for cross-validation!")
             elif self.es is None:
                 raise AttributeError("AutoML is not fitted!")
-            return self.es.predict(test_data)
+            return self.es.predict(test_data, batch_size=batch_size, n_jobs=n_jobs)
         else:
             try:
                 best_op_list, estimator = load_combined_transformer_estimator(self.output_dir, self.incumbent,
@@ -161,18 +167,51 @@ class AbstractBlock(object):
                     raise AttributeError("Please call refit() for cross-validation!")
                 else:
                     raise e
-            test_data_node = test_data.copy_()
-            test_data_node = construct_node(test_data_node, best_op_list)
+            return predict_pipeline(best_op_list, [estimator], test_data, self.task_type, batch_size=batch_size)
 
-            if self.task_type in CLS_TASKS:
-                return estimator.predict_proba(test_data_node.data[0])
-            else:
-                return estimator.predict(test_data_node.data[0])
-
-    def predict_proba(self, test_data: DataNode):
+    def predict_proba(self, test_data: DataNode, batch_size=None, n_jobs=1):
         if self.task_type not in CLS_TASKS:
             raise AttributeError("predict_proba is not supported in regression")
-        return self._predict(test_data)
+        return self._predict(test_data, batch_size=batch_size, n_jobs=n_jobs)
+
+    def export(self, path, label_encoder=None):
+        """
+            Freeze the fitted models into a self-contained inference artifact, see InferenceArtifact.
+        :param path: the file to save the artifact.
+        :param label_encoder: the label encoder fitted on the training labels, e.g., DataManager.label_encoder.
+        :return: the artifact.
+        """
+        if self.ensemble_method is not None:
+            if self.es is None:
+                raise AttributeError("AutoML is not fitted!")
+            ensemble = self.es.export()
+        else:
+            try:
+                best_op_list, estimator = load_combined_transformer_estimator(self.output_dir, self.incumbent,
+                                                                              self.timestamp)
+            except Exception as e:
+                if self.eval_type == 'cv':
+                    raise AttributeError("Please call refit() for cross-validation!")
+                else:
+                    raise e
+            ensemble = {'members': [(best_op_list, [estimator])], 'weights': np.ones(1), 'meta_learner': None}
+
+        # Members with the same fitted FE pipeline share one compiled pipeline.
+        pipelines, pipeline_index, members = list(), dict(), list()
+        for op_list, estimators in ensemble['members']:
+            key = get_pipeline_key(op_list)
+            if key not in pipeline_index:
+                pipeline_index[key] = len(pipelines)
+                pipelines.append(compile_node(op_list))
+            members.append((pipeline_index[key], estimators))
+
+        artifact = InferenceArtifact(self.task_type, pipelines, members,
+                                     weights=ensemble['weights'],
+                                     meta_learner=ensemble['meta_learner'],
+                                     label_encoder=label_encoder,
+                                     feature_types=self.original_data.feature_types)
+        artifact.save(path)
+        return artifact
 
     def score(self, test_data: DataNode, metric_func=None):
         if metric_func is None:
@@ -182,3 +221,9 @@ class AbstractBlock(object):
 
     def iterate(self, trial_num=10):
         raise NotImplementedError()
+
+    def gc(self):
+        """
+            Release the processes held by the optimizers and the evaluators of this block.
+        """
+        return
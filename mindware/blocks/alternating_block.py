@@ -1,8 +1,11 @@
 import os
 import time
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ConfigSpace import ConfigurationSpace
 from openbox.utils.constants import SUCCESS, TIMEOUT, FAILED
+from openbox.utils.limit import time_limit as process_time_limit
 
 from mindware.components.feature_engineering.transformation_graph import DataNode
 from mindware.components.utils.constants import CLS_TASKS
@@ -11,6 +14,39 @@ from mindware.blocks.abstract_block import AbstractBlock
 from mindware.utils.decorators import time_limit
 
 
+def _evaluate_once(evaluator, config):
+    # The evaluator is used for a single config, so its fold workers are released right after;
+    # the child process of process_time_limit exits without finalizing it.
+    try:
+        return evaluator(config)
+    finally:
+        evaluator.gc()
+
+
+class IncumbentBoard(object):
+    """
+        The latest incumbents of the FE and HPO arms, shared with the background joint evaluation.
+        Each post bumps the version, so the evaluator always picks up the newest pair.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._incumbents = dict()
+        self._lock = threading.Lock()
+
+    def post(self, arm, config, fixed_config=None):
+        """
+        :param fixed_config: the config of the other part that the incumbent was evaluated with.
+        """
+        with self._lock:
+            self._incumbents[arm] = (config, fixed_config)
+            self.version += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self.version, self._incumbents.copy()
+
+
 class AlternatingBlock(AbstractBlock):
     def __init__(self, node_list, node_index,
                  task_type, timestamp,
@@ -30,7 +66,14 @@ class AlternatingBlock(AbstractBlock):
                  eval_type='holdout',
                  resampling_params=None,
                  n_jobs=1,
-                 seed=1):
+                 seed=1,
+                 resume=False,
+                 continue_training=False,
+                 async_alternation=False):
+        """
+        :param async_alternation: if True, the FE and HPO arms are pulled concurrently in each round, with the cores
+        split between them, and the joint performance of their incumbents is evaluated in the background.
+        """
         super(AlternatingBlock, self).__init__(node_list, node_index, task_type, timestamp,
                                                fe_config_space, cash_config_space, data,
                                                fixed_config=fixed_config,
@@ -46,9 +89,20 @@ class AlternatingBlock(AbstractBlock):
                                                eval_type=eval_type,
                                                resampling_params=resampling_params,
                                                n_jobs=n_jobs,
-                                               seed=seed)
+                                               seed=seed,
+                                               resume=resume,
+                                               continue_training=continue_training)
 
         self.arms = ['hpo', 'fe']
+        self.async_alternation = async_alternation
+        self.sub_n_jobs = max(1, n_jobs // len(self.arms)) if async_alternation else n_jobs
+        self.board = IncumbentBoard()
+        self.joint_pool = None
+        self.joint_future = None
+        self.joint_running = False
+        self.joint_results = list()
+        self.joint_evaluated = set()
+        self._joint_lock = threading.Lock()
         self.optimal_algo_id = None
         self.first_start = True
         self.sub_bandits = dict()
@@ -94,8 +148,10 @@ class AlternatingBlock(AbstractBlock):
                     dataset_name=dataset_name,
                     eval_type=eval_type,
                     resampling_params=resampling_params,
-                    n_jobs=n_jobs,
-                    seed=seed
+                    n_jobs=self.sub_n_jobs,
+                    seed=seed,
+                    resume=resume,
+                    continue_training=continue_training
                 )
             else:
                 from mindware.blocks.block_utils import get_node_type
@@ -112,33 +168,36 @@ class AlternatingBlock(AbstractBlock):
                     dataset_name=dataset_name,
                     eval_type=eval_type,
                     resampling_params=resampling_params,
-                    n_jobs=n_jobs,
-                    seed=seed
+                    n_jobs=self.sub_n_jobs,
+                    seed=seed,
+                    resume=resume,
+                    continue_training=continue_training
                 )
 
         self.topk_saver = CombinedTopKModelSaver(k=50, model_dir=self.output_dir, identifier=self.timestamp)
 
-    def iterate(self, trial_num=10):
-        # First choose one arm.
-        arm_to_pull = self.arms[self.pull_cnt % 2]
-        self.logger.debug('Pulling arm: %s in node %s at %d-th round' % (arm_to_pull, self.node_index, self.pull_cnt))
-        if self.first_start is True and arm_to_pull == 'hpo':
+    def get_trial_budget(self, arm, trial_num=10):
+        if self.first_start is True and arm == 'hpo':
             # trial_budget = 20
-            trial_budget = 10
             self.first_start = False
-        else:
-            trial_budget = trial_num
+            return 10
+        return trial_num
 
-        if self.sub_bandits[arm_to_pull].early_stop_flag:
-            arm_to_pull = self.arms[(self.pull_cnt + 1) % 2]
+    def pull_arm(self, arm, trial_budget):
         start_time = time.time()
-        reward = self.sub_bandits[arm_to_pull].iterate(trial_num=trial_budget)
-        iter_cost = time.time() - start_time
+        reward = self.sub_bandits[arm].iterate(trial_num=trial_budget)
+        return reward, time.time() - start_time
+
+    def update_arm(self, arm_to_pull, reward, iter_cost):
+        """
+            Update the results after pulling an arm.
+        :return: improved, arm_to_reinit: whether the global incumbent is improved,
+                 and the other arm to reinitialize with the new incumbent (or None).
+        """
         self.action_sequence.append(arm_to_pull)
         self.pull_cnt += 1
 
         # Update results after each iteration
-        pre_inc_perf = self.incumbent_perf
         for arm_id in self.arms:
             self.update_flag[arm_id] = False
         self.arm_eval_dict[arm_to_pull].update(self.sub_bandits[arm_to_pull].eval_dict)
@@ -148,38 +207,37 @@ class AlternatingBlock(AbstractBlock):
         self.local_inc[arm_to_pull] = self.sub_bandits[arm_to_pull].incumbent
 
         # Update global incumbent from FE and HPO.
-        if np.isfinite(reward) and reward > self.incumbent_perf:
-            cur_inc = self.sub_bandits[arm_to_pull].incumbent
-            self.inc[arm_to_pull] = cur_inc
-            self.local_hist[arm_to_pull].append(cur_inc)
-            self.optimal_algo_id = arm_to_pull
-            self.incumbent_perf = reward
-
-            # Alter-HPO strategy: HPO changes if FE changes, FE keeps though HPO changes
-            if arm_to_pull == 'fe':
-                self.inc['hpo'] = self.init_config['hpo']
-            _incumbent = dict()
-            _incumbent.update(self.inc['fe'])
-            _incumbent.update(self.inc['hpo'])
-            self.incumbent = _incumbent.copy()
+        if not (np.isfinite(reward) and reward > self.incumbent_perf):
+            return False, None
 
-            arm_id = 'fe' if arm_to_pull == 'hpo' else 'hpo'
-            if arm_to_pull == 'fe':
-                self.reinitialize(arm_id)
-            else:
-                # Only reinitialize fe blocks once.
-                if len(self.rewards[arm_to_pull]) == 1:
-                    self.reinitialize(arm_id)
-                    if cur_inc != self.init_config['hpo']:
-                        self.logger.info('Initial hp_config for FE has changed!')
-                    self.init_config['hpo'] = cur_inc
-
-            # Evaluate joint result here
-            # Alter-HPO specific
-            if arm_to_pull == 'fe' and self.sub_bandits['fe'].fixed_config != self.local_inc['hpo']:
-                self.logger.info("Evaluate joint performance in node %s" % self.node_index)
-                self.evaluate_joint_perf()
+        cur_inc = self.sub_bandits[arm_to_pull].incumbent
+        self.inc[arm_to_pull] = cur_inc
+        self.local_hist[arm_to_pull].append(cur_inc)
+        self.optimal_algo_id = arm_to_pull
+        self.incumbent_perf = reward
 
+        # Alter-HPO strategy: HPO changes if FE changes, FE keeps though HPO changes
+        if arm_to_pull == 'fe':
+            self.inc['hpo'] = self.init_config['hpo']
+        _incumbent = dict()
+        _incumbent.update(self.inc['fe'])
+        _incumbent.update(self.inc['hpo'])
+        self.incumbent = _incumbent.copy()
+
+        arm_id = 'fe' if arm_to_pull == 'hpo' else 'hpo'
+        arm_to_reinit = None
+        if arm_to_pull == 'fe':
+            arm_to_reinit = arm_id
+        else:
+            # Only reinitialize fe blocks once.
+            if len(self.rewards[arm_to_pull]) == 1:
+                arm_to_reinit = arm_id
+                if cur_inc != self.init_config['hpo']:
+                    self.logger.info('Initial hp_config for FE has changed!')
+                self.init_config['hpo'] = cur_inc
+        return True, arm_to_reinit
+
+    def log_pull(self, arm_to_pull, pre_inc_perf):
         # Logger output
         scores = list()
         for _arm in self.arms:
@@ -199,6 +257,68 @@ class AlternatingBlock(AbstractBlock):
         else:
             self.inc_record[arm_to_pull].append(0.)
 
+    def iterate_sequentially(self, trial_num=10):
+        # First choose one arm.
+        arm_to_pull = self.arms[self.pull_cnt % 2]
+        self.logger.debug('Pulling arm: %s in node %s at %d-th round' % (arm_to_pull, self.node_index, self.pull_cnt))
+        trial_budget = self.get_trial_budget(arm_to_pull, trial_num)
+
+        if self.sub_bandits[arm_to_pull].early_stop_flag:
+            arm_to_pull = self.arms[(self.pull_cnt + 1) % 2]
+        reward, iter_cost = self.pull_arm(arm_to_pull, trial_budget)
+
+        pre_inc_perf = self.incumbent_perf
+        improved, arm_to_reinit = self.update_arm(arm_to_pull, reward, iter_cost)
+        if arm_to_reinit is not None:
+            self.reinitialize(arm_to_reinit)
+
+        # Evaluate joint result here
+        # Alter-HPO specific
+        if improved and arm_to_pull == 'fe' and self.sub_bandits['fe'].fixed_config != self.local_inc['hpo']:
+            self.logger.info("Evaluate joint performance in node %s" % self.node_index)
+            self.evaluate_joint_perf()
+        self.log_pull(arm_to_pull, pre_inc_perf)
+
+    def iterate_asynchronously(self, trial_num=10):
+        """
+            Pull the FE and HPO arms at the same time. Their evaluations run in the worker processes forked by
+            the optimizers, while the results are applied in this thread as each pull finishes.
+            The incumbents are posted to the board, and the joint evaluation runs in the background.
+            The sub-bandits to reinitialize are replaced after both pulls finish.
+        """
+        self.collect_joint_results()
+        arms_to_pull = [arm for arm in self.arms if not self.sub_bandits[arm].early_stop_flag]
+        if len(arms_to_pull) == 0:
+            return
+
+        arms_to_reinit = list()
+        with ThreadPoolExecutor(max_workers=len(arms_to_pull)) as pool:
+            futures = dict()
+            for arm in arms_to_pull:
+                self.logger.debug('Pulling arm: %s in node %s at %d-th round' % (arm, self.node_index, self.pull_cnt))
+                futures[pool.submit(self.pull_arm, arm, self.get_trial_budget(arm, trial_num))] = arm
+
+            for future in as_completed(futures):
+                arm_to_pull = futures[future]
+                reward, iter_cost = future.result()
+                pre_inc_perf = self.incumbent_perf
+                _, arm_to_reinit = self.update_arm(arm_to_pull, reward, iter_cost)
+                if arm_to_reinit is not None and arm_to_reinit not in arms_to_reinit:
+                    arms_to_reinit.append(arm_to_reinit)
+                self.board.post(arm_to_pull, self.local_inc[arm_to_pull], self.sub_bandits[arm_to_pull].fixed_config)
+                self.submit_joint_evaluation()
+                self.log_pull(arm_to_pull, pre_inc_perf)
+
+        for arm_id in arms_to_reinit:
+            self.reinitialize(arm_id)
+        self.collect_joint_results()
+
+    def iterate(self, trial_num=10):
+        if self.async_alternation:
+            self.iterate_asynchronously(trial_num=trial_num)
+        else:
+            self.iterate_sequentially(trial_num=trial_num)
+
         # Update stop flag
         self.early_stop_flag = True
         self.timeout_flag = False
@@ -214,7 +334,13 @@ class AlternatingBlock(AbstractBlock):
 
         return self.incumbent_perf
 
+    def gc(self):
+        for arm in self.arms:
+            self.sub_bandits[arm].gc()
+
     def reinitialize(self, arm_id):
+        # Release the workers of the optimizers that are replaced.
+        self.sub_bandits[arm_id].gc()
         if arm_id == 'fe':
             # Build the Feature Engineering component.
             inc_hpo = self.inc['hpo'].copy()
@@ -234,8 +360,10 @@ class AlternatingBlock(AbstractBlock):
                 dataset_name=self.dataset_name,
                 eval_type=self.eval_type,
                 resampling_params=self.resampling_params,
-                n_jobs=self.n_jobs,
-                seed=self.seed
+                n_jobs=self.sub_n_jobs,
+                seed=self.seed,
+                resume=self.resume,
+                continue_training=self.continue_training
             )
         else:
             # trials_per_iter = self.optimizer['fe'].evaluation_num_last_iteration // 2
@@ -256,84 +384,161 @@ class AlternatingBlock(AbstractBlock):
                 dataset_name=self.dataset_name,
                 eval_type=self.eval_type,
                 resampling_params=self.resampling_params,
-                n_jobs=self.n_jobs,
-                seed=self.seed
+                n_jobs=self.sub_n_jobs,
+                seed=self.seed,
+                resume=self.resume,
+                continue_training=self.continue_training
             )
 
         self.logger.debug('=' * 30)
         self.logger.debug('UPDATE OPTIMIZER: %s' % arm_id)
         self.logger.debug('=' * 30)
 
+    def get_joint_evaluator(self, fe_config):
+        if self.task_type in CLS_TASKS:
+            from mindware.components.evaluators.cls_evaluator import ClassificationEvaluator
+            return ClassificationEvaluator(
+                fe_config.copy(),
+                scorer=self.metric,
+                data_node=self.original_data,
+                if_imbal=self.if_imbal,
+                timestamp=self.timestamp,
+                seed=self.seed,
+                output_dir=self.output_dir,
+                resampling_strategy=self.eval_type,
+                resampling_params=self.resampling_params)
+        else:
+            from mindware.components.evaluators.rgs_evaluator import RegressionEvaluator
+            return RegressionEvaluator(
+                fe_config.copy(),
+                scorer=self.metric,
+                data_node=self.original_data,
+                timestamp=self.timestamp,
+                seed=self.seed,
+                output_dir=self.output_dir,
+                resampling_strategy=self.eval_type,
+                resampling_params=self.resampling_params)
+
     # TODO: Need refactoring
     def evaluate_joint_perf(self):
         # Update join incumbent from FE and HPO.
         _perf = None
         try:
             with time_limit(self.per_run_time_limit):
-                if self.task_type in CLS_TASKS:
-                    from mindware.components.evaluators.cls_evaluator import ClassificationEvaluator
-                    evaluator = ClassificationEvaluator(
-                        self.local_inc['fe'].copy(),
-                        scorer=self.metric,
-                        data_node=self.original_data,
-                        if_imbal=self.if_imbal,
-                        timestamp=self.timestamp,
-                        seed=self.seed,
-                        output_dir=self.output_dir,
-                        resampling_strategy=self.eval_type,
-                        resampling_params=self.resampling_params)
-                else:
-                    from mindware.components.evaluators.rgs_evaluator import RegressionEvaluator
-                    evaluator = RegressionEvaluator(
-                        self.local_inc['fe'].copy(),
-                        scorer=self.metric,
-                        data_node=self.original_data,
-                        timestamp=self.timestamp,
-                        seed=self.seed,
-                        output_dir=self.output_dir,
-                        resampling_strategy=self.eval_type,
-                        resampling_params=self.resampling_params)
-                _perf = -evaluator(self.local_inc['hpo'].copy())
+                evaluator = self.get_joint_evaluator(self.local_inc['fe'])
+                _perf = -_evaluate_once(evaluator, self.local_inc['hpo'].copy())
         except Exception as e:
             self.logger.error(str(e))
+        self.update_joint_perf(self.local_inc['fe'], self.local_inc['hpo'], _perf)
+
+    def get_joint_pair(self, incumbents):
+        # Return the pair of incumbents to evaluate jointly, or None if there is no new pair.
+        if 'fe' not in incumbents or 'hpo' not in incumbents:
+            return None
+        (fe_config, fe_context), (hpo_config, _) = incumbents['fe'], incumbents['hpo']
+        # Alter-HPO specific: the FE incumbent is already evaluated with its own hp_config.
+        if fe_context == hpo_config:
+            return None
+        _config = fe_config.copy()
+        _config.update(hpo_config.copy())
+        pair_id = CombinedTopKModelSaver.get_configuration_id(_config)
+        if pair_id in self.joint_evaluated:
+            return None
+        self.joint_evaluated.add(pair_id)
+        return fe_config, hpo_config
+
+    def run_joint_evaluations(self):
+        # Evaluate the newest pair of incumbents on the board until no new pair is posted.
+        try:
+            while True:
+                version, incumbents = self.board.snapshot()
+                with self._joint_lock:
+                    pair = self.get_joint_pair(incumbents)
+                    if pair is None:
+                        if self.board.version == version:
+                            self.joint_running = False
+                            return
+                        continue
+                fe_config, hpo_config = pair
+
+                self.logger.info("Evaluate joint performance in node %s" % self.node_index)
+                _perf = None
+                try:
+                    # The signal-based time limit only works in the main thread,
+                    # so the evaluation runs in a process.
+                    evaluator = self.get_joint_evaluator(fe_config)
+                    timeout_status, _result = process_time_limit(_evaluate_once, self.per_run_time_limit,
+                                                                 args=(evaluator, hpo_config.copy()), kwargs=dict())
+                    if timeout_status:
+                        self.logger.error('Timeout: time limit for the joint evaluation is %.1fs'
+                                          % self.per_run_time_limit)
+                    else:
+                        _perf = -_result
+                except Exception as e:
+                    self.logger.error(str(e))
+                with self._joint_lock:
+                    self.joint_results.append((fe_config, hpo_config, _perf))
+        except Exception:
+            with self._joint_lock:
+                self.joint_running = False
+            raise
 
+    def submit_joint_evaluation(self):
+        with self._joint_lock:
+            if self.joint_running:
+                # The running evaluation picks up the new incumbents when it finishes.
+                return
+            self.joint_running = True
+        if self.joint_pool is None:
+            self.joint_pool = ThreadPoolExecutor(max_workers=1)
+        self.joint_future = self.joint_pool.submit(self.run_joint_evaluations)
+
+    def collect_joint_results(self, wait=False):
+        """
+            Apply the results of the background joint evaluations.
+        :param wait: wait for the running evaluation to finish.
+        """
+        if wait and self.joint_future is not None:
+            self.joint_future.result()
+        with self._joint_lock:
+            results, self.joint_results = self.joint_results, list()
+        for fe_config, hpo_config, _perf in results:
+            self.update_joint_perf(fe_config, hpo_config, _perf)
+
+    def fit_ensemble(self):
+        self.collect_joint_results(wait=True)
+        return super().fit_ensemble()
+
+    def refit(self):
+        self.collect_joint_results(wait=True)
+        return super().refit()
+
+    def update_joint_perf(self, fe_config, hpo_config, _perf):
+        # The incumbents are dicts, so the record is keyed by their items.
+        eval_key = (tuple(sorted(fe_config.items())), tuple(sorted(hpo_config.items())))
         if _perf is not None and np.isfinite(_perf):
-            _config = self.local_inc['fe'].copy()
-            _config.update(self.local_inc['hpo'].copy())
+            _config = fe_config.copy()
+            _config.update(hpo_config.copy())
 
             classifier_id = _config['algorithm']
             # -perf: The larger, the better.
+            # The saver writes the staged model if it enters the top-k, and deletes the evicted one.
             save_flag, model_path, delete_flag, model_path_deleted = self.topk_saver.add(_config, -_perf,
                                                                                          classifier_id)
-            # By default, the evaluator has already stored the models.
             if self.eval_type in ['holdout', 'partial']:
-                if save_flag:
-                    pass
-                else:
-                    os.remove(model_path)
-                    self.logger.info("Model deleted from %s" % model_path)
-
-                try:
-                    if delete_flag:
-                        os.remove(model_path_deleted)
-                        self.logger.info("Model deleted from %s" % model_path_deleted)
-                    else:
-                        pass
-                except:
-                    pass
-            self.eval_dict[(self.local_inc['fe'].copy(), self.local_inc['hpo'].copy())] = [_perf,
-                                                                                           time.time(),
-                                                                                           SUCCESS]
+                if not save_flag:
+                    self.logger.info("Model discarded: %s" % model_path)
+                if delete_flag:
+                    self.logger.info("Model deleted from %s" % model_path_deleted)
+            self.eval_dict[eval_key] = [_perf, time.time(), SUCCESS]
             self.topk_saver.save_topk_config()
         else:
-            self.eval_dict[(self.local_inc['fe'].copy(), self.local_inc['hpo'].copy())] = [_perf,
-                                                                                           time.time(),
-                                                                                           FAILED]
+            self.eval_dict[eval_key] = [_perf, time.time(), FAILED]
 
         # Update INC.
         if _perf is not None and np.isfinite(_perf) and _perf > self.incumbent_perf:
-            self.inc['hpo'] = self.local_inc['hpo']
-            self.inc['fe'] = self.local_inc['fe']
+            self.inc['hpo'] = hpo_config
+            self.inc['fe'] = fe_config
             self.incumbent_perf = _perf
             _incumbent = dict()
             _incumbent.update(self.inc['fe'])
@@ -1,6 +1,7 @@
 import time
 import numpy as np
 from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from ConfigSpace import ConfigurationSpace, Constant
 from mindware.utils.constant import MAX_INT
 from mindware.components.feature_engineering.transformation_graph import DataNode
@@ -26,11 +27,20 @@ class ConditioningBlock(AbstractBlock):
                  eval_type='holdout',
                  resampling_params=None,
                  n_jobs=1,
-                 seed=1):
+                 seed=1,
+                 resume=False,
+                 continue_training=False,
+                 concurrent_arms=False,
+                 elimination_policy='slope'):
         """
         :param classifier_ids: subset of {'adaboost','bernoulli_nb','decision_tree','extra_trees','gaussian_nb','gradient_boosting',
         'gradient_boosting','k_nearest_neighbors','lda','liblinear_svc','libsvm_svc','multinomial_nb','passive_aggressive','qda',
         'random_forest','sgd'}
+        :param concurrent_arms: if True, the surviving arms are pulled concurrently, at most n_jobs at a time,
+        and the cores are split evenly among the sub-bandits.
+        :param elimination_policy: 'slope' or 'cost_aware'. With 'cost_aware' and a time limit, the upper bound of
+        each arm is projected over the pulls it can finish in the remaining time given its own cost per pull,
+        and the arms are checked after every round, so slow arms that cannot catch up are dropped early.
         """
         super(ConditioningBlock, self).__init__(node_list, node_index, task_type, timestamp,
                                                 fe_config_space, cash_config_space, data,
@@ -47,7 +57,9 @@ class ConditioningBlock(AbstractBlock):
                                                 eval_type=eval_type,
                                                 resampling_params=resampling_params,
                                                 n_jobs=n_jobs,
-                                                seed=seed)
+                                                seed=seed,
+                                                resume=resume,
+                                                continue_training=continue_training)
 
         # Best configuration.
         self.optimal_arm = None
@@ -56,6 +68,12 @@ class ConditioningBlock(AbstractBlock):
         # Bandit settings.
         self.alpha = 4
         self.arms = list(cash_config_space.get_hyperparameter('algorithm').choices)
+        self.concurrent_arms = concurrent_arms
+        if elimination_policy not in ['slope', 'cost_aware']:
+            raise ValueError('Invalid elimination policy: %s!' % elimination_policy)
+        self.elimination_policy = elimination_policy
+        # Share the core budget among the arms pulled at the same time.
+        sub_n_jobs = max(1, n_jobs // len(self.arms)) if concurrent_arms else n_jobs
         self.rewards = dict()
         self.sub_bandits = dict()
         self.evaluation_cost = dict()
@@ -107,8 +125,10 @@ class ConditioningBlock(AbstractBlock):
                 dataset_name=dataset_name,
                 eval_type=eval_type,
                 resampling_params=resampling_params,
-                n_jobs=n_jobs,
-                seed=seed
+                n_jobs=sub_n_jobs,
+                seed=seed,
+                resume=resume,
+                continue_training=continue_training
             )
 
         self.action_sequence = list()
@@ -131,92 +151,178 @@ class ConditioningBlock(AbstractBlock):
         else:
             self.trial_num = MAX_INT
 
-    def iterate(self, trial_num=10):
+    def gc(self):
+        for arm in self.arms:
+            self.sub_bandits[arm].gc()
+
+    def pull_arm(self, arm, trial_num=10):
+        _start_time = time.time()
+        reward = self.sub_bandits[arm].iterate(trial_num=trial_num)
+        return reward, time.time() - _start_time
+
+    def update_arm(self, arm, reward, cost):
+        # Update results after each iteration
+        self.arm_cost_stats[arm].append(cost)
+        if reward > self.incumbent_perf:
+            self.optimal_algo_id = arm
+            self.incumbent_perf = reward
+            self.incumbent = self.sub_bandits[arm].incumbent
+        self.eval_dict.update(self.sub_bandits[arm].eval_dict)
+        self.rewards[arm].append(reward)
+        self.action_sequence.append(arm)
+        self.final_rewards.append(reward)
+        self.time_records.append(time.time() - self.start_time)
+        # self.logger.info('The best performance found for %s is %.4f' % (arm, reward))
+        self.pull_cnt += 1
+
+        # Logger output
+        scores = list()
+        for _arm in self.arms:
+            scores.append(self.sub_bandits[_arm].incumbent_perf)
+        scores = np.array(scores)
+        self.logger.info('=' * 50)
+        self.logger.info('Node index: %s' % str(self.node_index))
+        self.logger.info('Best_algo_perf:  %s' % str(self.incumbent_perf))
+        self.logger.info('Best_algo_id:    %s' % str(self.optimal_algo_id))
+        self.logger.info('Arm candidates:  %s' % str(self.arms))
+        self.logger.info('Best val scores: %s' % str(list(scores)))
+        self.logger.info('=' * 50)
+
+    @property
+    def cost_aware(self):
+        # Costs are only meaningful with a time budget.
+        return self.elimination_policy == 'cost_aware' and self.time_limit is not None
+
+    def get_projected_steps(self, arm):
+        """
+            The number of pulls that arm can still make.
+        """
+        if self.time_limit is None:
+            return self.trial_num - self.pull_cnt
+        budget_left = max(self.time_limit - (time.time() - self.start_time), 0)
+        if self.cost_aware:
+            # Each arm gets an equal share of the remaining time, and spends it at its own mean cost per pull.
+            # Concurrent arms share the time of n_jobs workers instead of a single one.
+            n_arms = len(self.arm_candidate)
+            n_workers = min(max(self.n_jobs, 1), n_arms) if self.concurrent_arms else 1
+            cost_arm = np.mean(self.arm_cost_stats[arm])
+            return int(budget_left * n_workers / n_arms / cost_arm)
+        avg_cost = np.array([np.mean(self.arm_cost_stats[_arm]) for _arm in self.arm_candidate]).mean()
+        return int(budget_left / avg_cost)
+
+    def can_eliminate(self):
+        # Update the bounds once each surviving arm has been pulled for at least alpha times.
+        if self.cost_aware:
+            return all(len(self.rewards[_arm]) > 0 for _arm in self.arm_candidate)
+        return all(len(self.rewards[_arm]) >= self.alpha for _arm in self.arm_candidate)
+
+    def eliminate_arms(self):
+        """
+            Reject the arms whose upper bound is below the lower bound of another arm.
+        :return: the arms removed.
+        """
+        # Update the upper/lower bound estimation.
+        upper_bounds, lower_bounds = list(), list()
+        for _arm in self.arm_candidate:
+            rewards = self.rewards[_arm]
+            steps = self.get_projected_steps(_arm)
+            if steps == 0:
+                # The arm cannot finish another pull.
+                upper_bound = rewards[-1]
+            elif len(rewards) >= min(self.alpha, 2):
+                # In the cost-aware mode, arms with less than alpha rewards use the slope over the ones they have.
+                k = min(self.alpha, len(rewards))
+                slope = (rewards[-1] - rewards[-k]) / k
+                upper_bound = np.min([1.0, rewards[-1] + slope * steps])
+            else:
+                upper_bound = 1.0
+            upper_bounds.append(upper_bound)
+            lower_bounds.append(rewards[-1])
+            self.best_lower_bounds[self.arms.index(_arm)] = rewards[-1]
+
+        # Reject the sub-optimal arms.
+        n = len(self.arm_candidate)
+        flags = [False] * n
+        for i in range(n):
+            for j in range(n):
+                if i != j:
+                    if upper_bounds[i] < lower_bounds[j]:
+                        flags[i] = True
+
+        if np.sum(flags) == n:
+            self.logger.error('Removing all the arms simultaneously!')
+
+        removed = [item for idx, item in enumerate(self.arm_candidate) if flags[idx]]
+        self.logger.info('=' * 50)
+        self.logger.info('Node index: %s' % str(self.node_index))
+        self.logger.info('Candidates  : %s' % ','.join(self.arm_candidate))
+        self.logger.info('Upper bound : %s' % ','.join(['%.4f' % val for val in upper_bounds]))
+        self.logger.info('Lower bound : %s' % ','.join(['%.4f' % val for val in lower_bounds]))
+        self.logger.info('Arms removed: %s' % removed)
+        self.logger.info('=' * 50)
+
+        # Update arm_candidates.
+        self.arm_candidate = [item for index, item in enumerate(self.arm_candidate) if not flags[index]]
+        return removed
+
+    def iterate_sequentially(self, trial_num=10):
         # Search for an arm that is not early-stopped.
-        while self.sub_bandits[self.arm_candidate[self.pick_id]].early_stop_flag and \
-                self.pick_id < len(self.arm_candidate):
+        while self.pick_id < len(self.arm_candidate) and \
+                self.sub_bandits[self.arm_candidate[self.pick_id]].early_stop_flag:
             self.pick_id += 1
 
         if self.pick_id < len(self.arm_candidate):
             # Pull the arm.
             arm_to_pull = self.arm_candidate[self.pick_id]
             self.logger.info('Optimize %s in the %d-th iteration' % (arm_to_pull, self.pull_cnt))
-            _start_time = time.time()
-            reward = self.sub_bandits[arm_to_pull].iterate(trial_num=trial_num)
-
-            # Update results after each iteration
-            self.arm_cost_stats[arm_to_pull].append(time.time() - _start_time)
-            if reward > self.incumbent_perf:
-                self.optimal_algo_id = arm_to_pull
-                self.incumbent_perf = reward
-                self.incumbent = self.sub_bandits[arm_to_pull].incumbent
-            self.eval_dict.update(self.sub_bandits[arm_to_pull].eval_dict)
-            self.rewards[arm_to_pull].append(reward)
-            self.action_sequence.append(arm_to_pull)
-            self.final_rewards.append(reward)
-            self.time_records.append(time.time() - self.start_time)
-            # self.logger.info('The best performance found for %s is %.4f' % (arm_to_pull, reward))
-            self.pull_cnt += 1
+            reward, cost = self.pull_arm(arm_to_pull, trial_num=trial_num)
+            self.update_arm(arm_to_pull, reward, cost)
             self.pick_id += 1
 
-            # Logger output
-            scores = list()
-            for _arm in self.arms:
-                scores.append(self.sub_bandits[_arm].incumbent_perf)
-            scores = np.array(scores)
-            self.logger.info('=' * 50)
-            self.logger.info('Node index: %s' % str(self.node_index))
-            self.logger.info('Best_algo_perf:  %s' % str(self.incumbent_perf))
-            self.logger.info('Best_algo_id:    %s' % str(self.optimal_algo_id))
-            self.logger.info('Arm candidates:  %s' % str(self.arms))
-            self.logger.info('Best val scores: %s' % str(list(scores)))
-            self.logger.info('=' * 50)
-
         # Eliminate arms after pulling each arm a few times.
         if self.pick_id == len(self.arm_candidate):
             self.update_cnt += 1
             self.pick_id = 0
             # Update the arms until pulling each arm for at least alpha times.
-            if self.update_cnt >= self.alpha:
-                # Update the upper/lower bound estimation.
-                budget_left = max(self.time_limit - (time.time() - self.start_time), 0)
-                avg_cost = np.array([np.mean(self.arm_cost_stats[_arm]) for _arm in self.arm_candidate]).mean()
-                steps = int(budget_left / avg_cost)
-                upper_bounds, lower_bounds = list(), list()
-
-                for _arm in self.arm_candidate:
-                    rewards = self.rewards[_arm]
-                    slope = (rewards[-1] - rewards[-self.alpha]) / self.alpha
-                    if self.time_limit is None:
-                        steps = self.trial_num - self.pull_cnt
-                    upper_bound = np.min([1.0, rewards[-1] + slope * steps])
-                    upper_bounds.append(upper_bound)
-                    lower_bounds.append(rewards[-1])
-                    self.best_lower_bounds[self.arms.index(_arm)] = rewards[-1]
-
-                # Reject the sub-optimal arms.
-                n = len(self.arm_candidate)
-                flags = [False] * n
-                for i in range(n):
-                    for j in range(n):
-                        if i != j:
-                            if upper_bounds[i] < lower_bounds[j]:
-                                flags[i] = True
-
-                if np.sum(flags) == n:
-                    self.logger.error('Removing all the arms simultaneously!')
-
-                self.logger.info('=' * 50)
-                self.logger.info('Node index: %s' % str(self.node_index))
-                self.logger.info('Candidates  : %s' % ','.join(self.arm_candidate))
-                self.logger.info('Upper bound : %s' % ','.join(['%.4f' % val for val in upper_bounds]))
-                self.logger.info('Lower bound : %s' % ','.join(['%.4f' % val for val in lower_bounds]))
-                self.logger.info(
-                    'Arms removed: %s' % [item for idx, item in enumerate(self.arm_candidate) if flags[idx]])
-                self.logger.info('=' * 50)
-
-                # Update arm_candidates.
-                self.arm_candidate = [item for index, item in enumerate(self.arm_candidate) if not flags[index]]
+            if (self.update_cnt >= self.alpha or self.cost_aware) and self.can_eliminate():
+                self.eliminate_arms()
+
+    def iterate_concurrently(self, trial_num=10):
+        """
+            Pull all the surviving arms at the same time. The evaluations run in the worker processes
+            forked by the optimizers, so the arms are driven by threads in this process, which keeps
+            the state of the sub-bandits and the top-k models in one place.
+            The arms are eliminated as the results come in, and the pending pulls of the removed arms are cancelled.
+        """
+        arms_to_pull = [_arm for _arm in self.arm_candidate if not self.sub_bandits[_arm].early_stop_flag]
+        if len(arms_to_pull) == 0:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max(self.n_jobs, 1), len(arms_to_pull))) as pool:
+            futures = dict()
+            for _arm in arms_to_pull:
+                self.logger.info('Optimize %s in the %d-th iteration' % (_arm, self.pull_cnt))
+                futures[pool.submit(self.pull_arm, _arm, trial_num)] = _arm
+
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                arm = futures[future]
+                reward, cost = future.result()
+                self.update_arm(arm, reward, cost)
+
+                if self.can_eliminate():
+                    removed = self.eliminate_arms()
+                    for _future, _arm in futures.items():
+                        if _arm in removed:
+                            _future.cancel()
+        self.update_cnt += 1
+
+    def iterate(self, trial_num=10):
+        if self.concurrent_arms:
+            self.iterate_concurrently(trial_num=trial_num)
+        else:
+            self.iterate_sequentially(trial_num=trial_num)
 
         # Update stop flag
         self.early_stop_flag = True
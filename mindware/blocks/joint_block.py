@@ -26,7 +26,9 @@ class JointBlock(AbstractBlock):
                  eval_type='holdout',
                  resampling_params=None,
                  n_jobs=1,
-                 seed=1):
+                 seed=1,
+                 resume=False,
+                 continue_training=False):
         super(JointBlock, self).__init__(node_list, node_index, task_type, timestamp,
                                          fe_config_space, cash_config_space, data,
                                          fixed_config=fixed_config,
@@ -42,7 +44,9 @@ class JointBlock(AbstractBlock):
                                          eval_type=eval_type,
                                          resampling_params=resampling_params,
                                          n_jobs=n_jobs,
-                                         seed=seed)
+                                         seed=seed,
+                                         resume=resume,
+                                         continue_training=continue_training)
 
         self.fixed_config = fixed_config
 
@@ -70,7 +74,8 @@ class JointBlock(AbstractBlock):
                 output_dir=self.output_dir,
                 seed=self.seed,
                 resampling_strategy=self.eval_type,
-                resampling_params=self.resampling_params)
+                resampling_params=self.resampling_params,
+                continue_training=self.continue_training)
         else:
             from mindware.components.evaluators.rgs_evaluator import RegressionEvaluator
             self.evaluator = RegressionEvaluator(
@@ -81,7 +86,8 @@ class JointBlock(AbstractBlock):
                 output_dir=self.output_dir,
                 seed=self.seed,
                 resampling_strategy=self.eval_type,
-                resampling_params=self.resampling_params)
+                resampling_params=self.resampling_params,
+                continue_training=self.continue_training)
 
         self.optimizer = build_hpo_optimizer(self.eval_type, self.evaluator, self.joint_cs,
                                              optimizer=self.optimizer,
@@ -89,7 +95,7 @@ class JointBlock(AbstractBlock):
                                              per_run_time_limit=self.per_run_time_limit,
                                              inner_iter_num_per_iter=1,
                                              timestamp=self.timestamp,
-                                             seed=self.seed, n_jobs=self.n_jobs)
+                                             seed=self.seed, n_jobs=self.n_jobs, resume=self.resume)
 
     def iterate(self, trial_num=10):
         self.optimizer.inner_iter_num_per_iter = trial_num
@@ -102,3 +108,7 @@ class JointBlock(AbstractBlock):
         self.incumbent = self.optimizer.incumbent_config.get_dictionary().copy()
         self.eval_dict = self.optimizer.eval_dict
         return self.incumbent_perf
+
+    def gc(self):
+        self.optimizer.gc()
+        self.evaluator.gc()
@@ -0,0 +1,176 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import pickle as pkl
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mindware.components.utils.constants import CLS_TASKS
+from mindware.components.feature_engineering.parse import construct_node
+from mindware.components.feature_engineering.transformation_graph import DataNode
+
+
+def _slice_rows(array, start, end):
+    if array is None:
+        return None
+    if isinstance(array, (pd.DataFrame, pd.Series)):
+        return array.iloc[start:end]
+    return array[start:end]
+
+
+def iter_node_batches(data_node: DataNode, batch_size=None):
+    """
+        Split the rows of a data node into batches.
+    :return: a generator of (start, end, batch_node); the batch nodes are views of data_node,
+             which should be copied before being transformed.
+    """
+    num_samples = data_node.data[0].shape[0]
+    if batch_size is None or batch_size >= num_samples:
+        yield 0, num_samples, data_node
+        return
+    if batch_size < 1:
+        raise ValueError('Batch size should be positive!')
+
+    X, y = data_node.data[0], data_node.data[1]
+    for start in range(0, num_samples, batch_size):
+        end = min(start + batch_size, num_samples)
+        batch_node = DataNode([_slice_rows(X, start, end), _slice_rows(y, start, end)],
+                              data_node.feature_types.copy(), data_node.task_type,
+                              data_node.feature_names.copy() if data_node.feature_names is not None else None)
+        batch_node.trans_hist = data_node.trans_hist.copy()
+        batch_node.depth = data_node.depth
+        batch_node.enable_balance = data_node.enable_balance
+        batch_node.data_balance = data_node.data_balance
+        batch_node.config = data_node.config
+        yield start, end, batch_node
+
+
+def get_pipeline_key(op_list):
+    """
+        Fingerprint of a fitted FE pipeline. Members with the same key produce the same features.
+    """
+    return hashlib.sha1(pkl.dumps(op_list)).hexdigest()
+
+
+def group_members(members, keys=None):
+    """
+        Group the members that share the same FE pipeline.
+    :param members: a list of (op_list, estimators).
+    :param keys: the pipeline key of each member; computed with get_pipeline_key if not given.
+    :return: a list of (op_list, member indices), one for each distinct pipeline.
+    """
+    if keys is None:
+        keys = [get_pipeline_key(op_list) for op_list, _ in members]
+    groups = OrderedDict()
+    for idx, (key, (op_list, _)) in enumerate(zip(keys, members)):
+        groups.setdefault(key, (op_list, list()))[1].append(idx)
+    return list(groups.values())
+
+
+def _predict_group(members, group, batch_node: DataNode, task_type):
+    # Transform the batch once and fan the features out to all the members of the group.
+    op_list, member_idx = group
+    X_batch = construct_node(batch_node.copy_(), op_list).data[0]
+    results = list()
+    for idx in member_idx:
+        estimators = members[idx][1]
+        pred = None
+        for estimator in estimators:
+            _pred = estimator.predict_proba(X_batch) if task_type in CLS_TASKS else estimator.predict(X_batch)
+            pred = _pred if pred is None else pred + _pred
+        if len(estimators) > 1:
+            pred = pred / len(estimators)
+        results.append((idx, pred))
+    return results
+
+
+def _iter_batch_predictions(members, data_node: DataNode, task_type, batch_size=None, n_jobs=1, keys=None):
+    """
+        Predict with the members one batch of rows at a time, so that the transformed data never exceeds one batch.
+    :return: a generator of (start, end, predictions of each member on the batch).
+    """
+    groups = group_members(members, keys)
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    pool = None
+    if n_jobs is not None and n_jobs > 1 and len(groups) > 1:
+        pool = ThreadPoolExecutor(max_workers=min(n_jobs, len(groups)))
+
+    try:
+        for start, end, batch_node in iter_node_batches(data_node, batch_size):
+            if pool is None:
+                group_results = [_predict_group(members, group, batch_node, task_type) for group in groups]
+            else:
+                group_results = pool.map(lambda group: _predict_group(members, group, batch_node, task_type), groups)
+            batch_preds = [None] * len(members)
+            for results in group_results:
+                for idx, pred in results:
+                    batch_preds[idx] = pred
+            yield start, end, batch_preds
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def parallel_predict(members, data_node: DataNode, task_type, batch_size=None, n_jobs=1, keys=None):
+    """
+        Predict with several pipelines. The members that share the same FE pipeline transform the data once.
+    :param members: a list of (op_list, estimators); the predictions of the estimators of a member are averaged.
+    :param batch_size: the number of rows transformed and predicted at a time.
+    :param n_jobs: the number of threads; distinct pipelines are evaluated in parallel. -1 means using all the CPUs.
+    :param keys: the pipeline key of each member, see get_pipeline_key.
+    :return: the predictions of each member, in the same order as members;
+             predict_proba for classification and predict for regression.
+    """
+    num_samples = data_node.data[0].shape[0]
+    predictions = [None] * len(members)
+    for start, end, batch_preds in _iter_batch_predictions(members, data_node, task_type, batch_size=batch_size,
+                                                           n_jobs=n_jobs, keys=keys):
+        for idx, pred in enumerate(batch_preds):
+            if start == 0 and end == num_samples:
+                predictions[idx] = pred
+                continue
+            if predictions[idx] is None:
+                predictions[idx] = np.zeros((num_samples,) + pred.shape[1:], dtype=pred.dtype)
+            predictions[idx][start:end] = pred
+    return predictions
+
+
+def predict_pipeline(op_list, estimators, data_node: DataNode, task_type, batch_size=None):
+    """
+        Transform the data with op_list and predict with the estimators, one batch of rows at a time.
+    :param estimators: a list of estimators fitted on the same features, whose predictions are averaged.
+    """
+    return parallel_predict([(op_list, estimators)], data_node, task_type, batch_size=batch_size, keys=[None])[0]
+
+
+def weighted_predict(members, weights, data_node: DataNode, task_type, batch_size=None, n_jobs=1, keys=None):
+    """
+        Compute the weighted average of the predictions of several pipelines.
+        The weighted sum is accumulated in place batch by batch, so only the predictions of one batch
+        are kept for each member.
+    :param members: a list of (op_list, estimators).
+    :param weights: the weight of each member.
+    :return: the averaged predictions.
+    """
+    num_samples = data_node.data[0].shape[0]
+    total_weight = float(np.sum(weights))
+    predictions = None
+    for start, end, batch_preds in _iter_batch_predictions(members, data_node, task_type, batch_size=batch_size,
+                                                           n_jobs=n_jobs, keys=keys):
+        # Accumulate in the order of members, so that the result does not depend on n_jobs.
+        batch_sum = None
+        for weight, pred in zip(weights, batch_preds):
+            if batch_sum is None:
+                batch_sum = weight * np.asarray(pred, dtype=np.float64)
+            else:
+                batch_sum += weight * pred
+        batch_sum /= total_weight
+
+        if start == 0 and end == num_samples:
+            return batch_sum
+        if predictions is None:
+            predictions = np.zeros((num_samples,) + batch_sum.shape[1:])
+        predictions[start:end] = batch_sum
+    return predictions
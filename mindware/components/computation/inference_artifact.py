@@ -0,0 +1,163 @@
+import os
+import mmap
+import struct
+import pickle as pkl
+import numpy as np
+
+from mindware.components.utils.constants import CLS_TASKS
+from mindware.components.feature_engineering.transformation_graph import DataNode
+
+_MAGIC = b'MWINFER1'
+_ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class InferenceArtifact(object):
+    """
+        A fitted estimator frozen into one self-contained object for serving.
+
+        The FE pipelines are compiled into ordered lists of fitted transformers (see compile_node), so prediction
+        neither reads the per-config pickles in output_dir nor goes through the search-space modules.
+        The artifact is saved as a single file; the numpy buffers are stored out-of-band, page-aligned,
+        and mapped from the file on loading instead of being copied.
+    """
+
+    def __init__(self, task_type, pipelines, members, weights=None, meta_learner=None,
+                 label_encoder=None, feature_types=None):
+        """
+        :param pipelines: a list of compiled FE pipelines, each a list of fitted transformers.
+        :param members: a list of (pipeline index, estimators); the predictions of the estimators are averaged.
+        :param weights: the weight of each member, if the members are averaged.
+        :param meta_learner: the fitted meta-learner of blending or stacking, if weights is None.
+        :param label_encoder: the fitted label encoder, used to decode the predicted classes.
+        :param feature_types: the feature types of the input data, used if predict receives an array.
+        """
+        if weights is None and meta_learner is None:
+            raise ValueError('Either weights or meta_learner should be provided!')
+        self.task_type = task_type
+        self.pipelines = pipelines
+        self.members = members
+        self.weights = weights
+        self.meta_learner = meta_learner
+        self.label_encoder = label_encoder
+        self.feature_types = feature_types
+
+    def _get_node(self, data):
+        if isinstance(data, DataNode):
+            return data
+        if self.feature_types is None:
+            raise ValueError('Feature types are required to predict on raw arrays!')
+        return DataNode([data, None], self.feature_types, self.task_type)
+
+    def _transform(self, pipeline_idx, data_node: DataNode):
+        data_node = data_node.copy_()
+        for tran in self.pipelines[pipeline_idx]:
+            data_node = tran.operate(data_node)
+        return data_node.data[0]
+
+    def predict_members(self, data_node: DataNode):
+        features = dict()
+        predictions = list()
+        for pipeline_idx, estimators in self.members:
+            if pipeline_idx not in features:
+                features[pipeline_idx] = self._transform(pipeline_idx, data_node)
+            X = features[pipeline_idx]
+            pred = None
+            for estimator in estimators:
+                _pred = estimator.predict_proba(X) if self.task_type in CLS_TASKS else estimator.predict(X)
+                pred = _pred if pred is None else pred + _pred
+            predictions.append(pred / len(estimators) if len(estimators) > 1 else pred)
+        return predictions
+
+    def _predict(self, data_node: DataNode):
+        predictions = self.predict_members(data_node)
+        if self.weights is not None:
+            return np.average(np.asarray(predictions), axis=0, weights=self.weights)
+
+        # Stack the predictions of the members into the features of the meta-learner.
+        features = list()
+        for pred in predictions:
+            if self.task_type in CLS_TASKS:
+                features.append(pred[:, 1:2] if pred.shape[1] == 2 else pred)
+            else:
+                features.append(pred.reshape(-1, 1))
+        features = np.hstack(features)
+        if self.task_type in CLS_TASKS:
+            return self.meta_learner.predict_proba(features)
+        return self.meta_learner.predict(features)
+
+    def predict_proba(self, data):
+        """
+        :param data: a DataNode, or an array with the feature types of the training data.
+        :return: the predicted class probabilities.
+        """
+        if self.task_type not in CLS_TASKS:
+            raise AttributeError("predict_proba is not supported in regression")
+        return self._predict(self._get_node(data))
+
+    def predict(self, data):
+        """
+        :param data: a DataNode, or an array with the feature types of the training data.
+        :return: the predicted classes (decoded by the label encoder if given) or values.
+        """
+        pred = self._predict(self._get_node(data))
+        if self.task_type not in CLS_TASKS:
+            return pred
+        pred = np.argmax(pred, axis=-1)
+        if self.label_encoder is not None:
+            pred = self.label_encoder.inverse_transform(pred)
+        return pred
+
+    def save(self, path):
+        buffers = list()
+        if pkl.HIGHEST_PROTOCOL >= 5:
+            body = pkl.dumps(self, protocol=5, buffer_callback=buffers.append)
+        else:
+            body = pkl.dumps(self, protocol=pkl.HIGHEST_PROTOCOL)
+        buffers = [buffer.raw() for buffer in buffers]
+
+        # Offsets are relative to the start of the data section.
+        offsets, offset = list(), len(body)
+        for buffer in buffers:
+            offset = _align(offset)
+            offsets.append((offset, buffer.nbytes))
+            offset += buffer.nbytes
+        header = pkl.dumps((len(body), offsets), protocol=pkl.HIGHEST_PROTOCOL)
+        data_start = _align(len(_MAGIC) + 8 + len(header))
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            f.write(b'\0' * (data_start - f.tell()))
+            f.write(body)
+            for (offset, _), buffer in zip(offsets, buffers):
+                f.write(b'\0' * (data_start + offset - f.tell()))
+                f.write(buffer)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            # Copy-on-write mapping: the arrays are backed by the file and stay writable.
+            content = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY))
+        if bytes(content[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError('%s is not an inference artifact!' % path)
+        header_start = len(_MAGIC) + 8
+        header_size = struct.unpack('<Q', content[len(_MAGIC):header_start])[0]
+        body_size, offsets = pkl.loads(content[header_start:header_start + header_size])
+        data_start = _align(header_start + header_size)
+
+        body = content[data_start:data_start + body_size]
+        if len(offsets) == 0:
+            return pkl.loads(body)
+        buffers = [content[data_start + offset:data_start + offset + size] for offset, size in offsets]
+        return pkl.loads(body, buffers=buffers)
+
+
+def load_artifact(path):
+    return InferenceArtifact.load(path)
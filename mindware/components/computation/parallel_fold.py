@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import warnings
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+def load_shared_array(array):
+    if isinstance(array, str):
+        return np.load(array, mmap_mode='r')
+    return array
+
+
+def _init_worker():
+    # The evaluators filter warnings in the calling thread; a process worker does it once when it starts.
+    warnings.filterwarnings("ignore")
+
+
+def execute_func(params):
+    func, X, y, args = params
+    return func(load_shared_array(X), load_shared_array(y), *args)
+
+
+class ParallelFoldExecutor(object):
+    """
+        Evaluate the folds of a cross-validation in parallel.
+
+        With the thread backend, all folds read the same in-memory arrays.
+        With the process backend, dense numeric arrays are dumped once into a temporary directory
+        and opened by each worker as read-only memmaps, so the data is never pickled per fold.
+    """
+
+    def __init__(self, n_worker=1, backend='thread'):
+        if backend not in ['thread', 'process']:
+            raise ValueError('Invalid fold backend: %s!' % backend)
+        self.n_worker = n_worker
+        self.backend = backend
+        self.pool = None
+        self.tmp_dir = None
+        self._shared = None
+
+    def __getstate__(self):
+        # Pools and memmap files belong to the process that created them.
+        state = self.__dict__.copy()
+        state['pool'], state['tmp_dir'], state['_shared'] = None, None, None
+        return state
+
+    def _get_pool(self):
+        if self.pool is None:
+            if self.backend == 'thread':
+                self.pool = ThreadPoolExecutor(max_workers=self.n_worker)
+            else:
+                # Forking a process that has already started OpenMP threads (e.g., LightGBM) may deadlock.
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self.pool = ProcessPoolExecutor(max_workers=self.n_worker,
+                                                mp_context=multiprocessing.get_context(method),
+                                                initializer=_init_worker)
+        return self.pool
+
+    def share(self, X, y):
+        if self.backend == 'thread':
+            return X, y
+        if self._shared is not None and self._shared[0] is X and self._shared[1] is y:
+            return self._shared[2]
+
+        if self.tmp_dir is None:
+            self.tmp_dir = tempfile.mkdtemp(prefix='mindware_folds_')
+        shared = list()
+        for name, array in (('X', X), ('y', y)):
+            if isinstance(array, np.ndarray) and array.dtype != object:
+                path = os.path.join(self.tmp_dir, '%s.npy' % name)
+                np.save(path, array)
+                shared.append(path)
+            else:
+                # Sparse matrices, data frames and object arrays are sent to the workers as they are.
+                shared.append(array)
+        # Keep references to X and y so that their identities stay valid.
+        self._shared = (X, y, tuple(shared))
+        return self._shared[2]
+
+    def parallel_execute(self, func, X, y, param_list):
+        """
+            Run func(X, y, *params) for each params in param_list.
+        :return: the results, in the same order as param_list.
+        """
+        _X, _y = self.share(X, y)
+        pool = self._get_pool()
+        futures = [pool.submit(execute_func, (func, _X, _y, params)) for params in param_list]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            self.tmp_dir = None
+        self._shared = None
+
+    def __del__(self):
+        try:
+            self.shutdown()
+        except Exception:
+            pass
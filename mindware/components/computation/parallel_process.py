@@ -46,6 +46,14 @@ class ParallelProcessEvaluator(object):
 
         return evaluation_result
 
+    def submit(self, param, resource_ratio=1., eta=3, first_iter=False, callback=None, error_callback=None):
+        """
+            Evaluate one configuration without waiting; callback receives (score, time_taken).
+        """
+        return self.process_pool.apply_async(execute_func,
+                                             (self.evaluator, param, resource_ratio, eta, first_iter, self.rwlock),
+                                             callback=callback, error_callback=error_callback)
+
     # def shutdown(self):
     #     self.process_pool.close()
 
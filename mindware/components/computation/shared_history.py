@@ -0,0 +1,112 @@
+import os
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+
+_HEADER_BYTES = 64
+
+
+def get_observation_key(vector):
+    """
+        Hash key of a configuration vector; inactive hyperparameters (NaN) are mapped to the same key.
+    """
+    vector = np.asarray(vector, dtype=np.float64)
+    return np.where(np.isnan(vector), -1., vector).tobytes()
+
+
+class SharedHistoryBuffer(object):
+    """
+        A ring buffer of observations in shared memory, written and read by several processes.
+
+        Each slot holds (sequence number, worker id, cost, configuration vector). Writers append under
+        a lock; a reader keeps its own cursor, and the observations overwritten before it reads them are lost.
+    """
+
+    def __init__(self, dim, capacity=4096, lock=None):
+        self.dim = dim
+        self.capacity = capacity
+        self.lock = multiprocessing.Lock() if lock is None else lock
+        size = _HEADER_BYTES + capacity * (dim + 3) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        # Only the creating process unlinks the segment, also when the others are forked from it.
+        self.owner_pid = os.getpid()
+        self._attach()
+        self.counter[0] = 0
+
+    def _attach(self):
+        self.counter = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf[:8])
+        self.slots = np.ndarray((self.capacity, self.dim + 3), dtype=np.float64,
+                                buffer=self.shm.buf[_HEADER_BYTES:])
+
+    def __getstate__(self):
+        # Processes started with spawn attach to the segment by name.
+        return {'dim': self.dim, 'capacity': self.capacity, 'lock': self.lock, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.dim = state['dim']
+        self.capacity = state['capacity']
+        self.lock = state['lock']
+        self.shm = shared_memory.SharedMemory(name=state['name'])
+        self.owner_pid = None
+        self._attach()
+
+    def publish(self, vector, cost, worker_id):
+        with self.lock:
+            seq = int(self.counter[0])
+            slot = self.slots[seq % self.capacity]
+            slot[1], slot[2], slot[3:] = worker_id, cost, vector
+            slot[0] = seq
+            self.counter[0] = seq + 1
+
+    def read(self, cursor):
+        """
+        :param cursor: the sequence number of the first observation to read.
+        :return: (new cursor, a list of (worker id, cost, vector), the number of lost observations).
+        """
+        with self.lock:
+            end = int(self.counter[0])
+            start = max(cursor, end - self.capacity)
+            index = np.arange(start, end) % self.capacity
+            rows = self.slots[index].copy()
+        observations = [(int(row[1]), row[2], row[3:]) for row in rows]
+        return end, observations, start - cursor
+
+    def close(self):
+        # Drop the views before closing, or the segment cannot be released.
+        self.counter, self.slots = None, None
+        self.shm.close()
+        if self.owner_pid == os.getpid():
+            self.shm.unlink()
+
+
+class HistoryReader(object):
+    """
+        Read the observations of the other workers from a shared history, skipping the configurations
+        seen before with a hash index.
+    """
+
+    def __init__(self, history: SharedHistoryBuffer, worker_id=-1):
+        self.history = history
+        self.worker_id = worker_id
+        self.cursor = 0
+        self.seen = set()
+        self.lost_num = 0
+
+    def mark_seen(self, vector):
+        """
+        :return: True if the configuration is new.
+        """
+        key = get_observation_key(vector)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    def poll(self):
+        """
+        :return: a list of (vector, cost), the new configurations published by the other workers.
+        """
+        self.cursor, observations, lost_num = self.history.read(self.cursor)
+        self.lost_num += lost_num
+        return [(vector, cost) for worker_id, cost, vector in observations
+                if worker_id != self.worker_id and self.mark_seen(vector)]
@@ -0,0 +1,189 @@
+import time
+import queue
+import weakref
+import multiprocessing
+import psutil
+
+from mindware.components.utils.constants import SUCCESS, TIMEOUT, ERROR, MEMORYOUT, CRASHED
+from mindware.utils.proc_thread.proc_func import kill_proc_tree
+
+
+def _worker_loop(func, conn, parent_conn):
+    # The parent end is closed here, so that the worker exits on EOF once the parent is gone.
+    parent_conn.close()
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        args, kwargs = task
+        try:
+            result = (SUCCESS, func(*args, **kwargs))
+        except MemoryError:
+            result = (MEMORYOUT, None)
+        except Exception as e:
+            result = (ERROR, repr(e))
+        try:
+            conn.send(result)
+        except Exception as e:
+            conn.send((ERROR, 'Failed to send the result: %s' % repr(e)))
+
+
+def _get_tree_usage(process):
+    """
+    :return: (rss in MB, cpu time in seconds) of the process and all its descendants.
+    """
+    rss, cpu_time = 0, 0.
+    try:
+        processes = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return rss, cpu_time
+    for proc in processes:
+        try:
+            rss += proc.memory_info().rss
+            cpu_times = proc.cpu_times()
+            cpu_time += cpu_times.user + cpu_times.system
+        except psutil.NoSuchProcess:
+            pass
+    return rss / 1024 / 1024, cpu_time
+
+
+def _stop_process(process, conn, timeout=5):
+    # Ask the worker to exit, and kill its process tree if it does not.
+    try:
+        conn.send(None)
+    except (BrokenPipeError, OSError):
+        pass
+    process.join(timeout=timeout)
+    if process.is_alive():
+        try:
+            kill_proc_tree(process.pid)
+        except psutil.NoSuchProcess:
+            pass
+        process.join()
+    conn.close()
+
+
+class TrialWorker(object):
+    """
+        A forked subprocess that runs the trials of func one at a time; the arguments and results go over a pipe.
+        The subprocess is stopped by close, or when the worker is collected.
+
+        The worker is forked on the first trial and reused by the following ones. While a trial runs, the parent
+        watches its wall-clock time, and the RSS and CPU time of the whole process tree; a trial that exceeds
+        a limit is killed along with its descendants, and the next trial forks a new worker.
+    """
+
+    def __init__(self, func, poll_interval=0.1):
+        self.func = func
+        self.poll_interval = poll_interval
+        self.process = None
+        self.conn = None
+        self._finalizer = None
+
+    def start(self):
+        ctx = multiprocessing.get_context('fork')
+        self.conn, child_conn = ctx.Pipe()
+        # Not daemonic: the trials may start processes of their own.
+        self.process = ctx.Process(target=_worker_loop, args=(self.func, child_conn, self.conn))
+        self.process.start()
+        child_conn.close()
+        # Stops the process when the worker is collected or at exit; it does not reference func,
+        # so the evaluator is released along with the worker.
+        self._finalizer = weakref.finalize(self, _stop_process, self.process, self.conn)
+
+    def kill(self):
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        if self.process is not None:
+            try:
+                kill_proc_tree(self.process.pid)
+            except psutil.NoSuchProcess:
+                pass
+            self.process.join()
+            self.conn.close()
+        self.process, self.conn, self._finalizer = None, None, None
+
+    def close(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.process, self.conn, self._finalizer = None, None, None
+
+    def run(self, args, kwargs, time_limit=None, mem_limit=None, cpu_time_limit=None):
+        """
+        :param time_limit: the wall-clock limit in seconds.
+        :param mem_limit: the RSS limit of the process tree in MB.
+        :param cpu_time_limit: the CPU time limit of the process tree in seconds.
+        :return: (status, result); result is the return value of func if the status is SUCCESS.
+        """
+        if self.process is None or not self.process.is_alive():
+            self.kill()
+            self.start()
+        process = psutil.Process(self.process.pid)
+        _, base_cpu_time = _get_tree_usage(process)
+        start_time = time.time()
+        self.conn.send((args, kwargs))
+
+        while True:
+            timeout = self.poll_interval
+            if time_limit is not None:
+                timeout = max(0., min(timeout, start_time + time_limit - time.time()))
+            try:
+                if self.conn.poll(timeout):
+                    return self.conn.recv()
+            except (EOFError, OSError):
+                self.kill()
+                return CRASHED, None
+
+            status = None
+            if not self.process.is_alive():
+                status = CRASHED
+            elif time_limit is not None and time.time() - start_time >= time_limit:
+                status = TIMEOUT
+            elif mem_limit is not None or cpu_time_limit is not None:
+                rss, cpu_time = _get_tree_usage(process)
+                if mem_limit is not None and rss > mem_limit:
+                    status = MEMORYOUT
+                elif cpu_time_limit is not None and cpu_time - base_cpu_time > cpu_time_limit:
+                    status = TIMEOUT
+            if status is not None:
+                self.kill()
+                return status, None
+
+
+class TrialExecutor(object):
+    """
+        Run the trials of func in a pool of pre-forked TrialWorkers, with per-trial wall-clock, RSS and CPU limits.
+        execute is thread-safe; each calling thread takes an idle worker, so a thread pool of n_worker threads
+        gets one subprocess per thread.
+    """
+
+    def __init__(self, func, n_worker=1, time_limit=None, mem_limit=None, cpu_time_limit=None):
+        self.func = func
+        self.n_worker = n_worker
+        self.time_limit = time_limit
+        self.mem_limit = mem_limit
+        self.cpu_time_limit = cpu_time_limit
+        self.workers = [TrialWorker(func) for _ in range(n_worker)]
+        self.idle_workers = queue.Queue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    def execute(self, *args, **kwargs):
+        """
+        :return: (status, result, time_taken)
+        """
+        start_time = time.time()
+        worker = self.idle_workers.get()
+        try:
+            status, result = worker.run(args, kwargs, time_limit=self.time_limit, mem_limit=self.mem_limit,
+                                        cpu_time_limit=self.cpu_time_limit)
+        finally:
+            self.idle_workers.put(worker)
+        return status, result, time.time() - start_time
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
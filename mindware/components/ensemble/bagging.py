@@ -1,12 +1,7 @@
 from sklearn.metrics._scorer import _BaseScorer
 import numpy as np
-import os
-import pickle as pkl
 
-from mindware.components.utils.constants import CLS_TASKS
 from mindware.components.ensemble.base_ensemble import BaseEnsembleModel
-from mindware.components.feature_engineering.parse import construct_node
-from functools import reduce
 
 
 class Bagging(BaseEnsembleModel):
@@ -26,34 +21,16 @@ class Bagging(BaseEnsembleModel):
     def fit(self, datanode):
         return self
 
-    def predict(self, data):
-        model_pred_list = []
-        final_pred = []
+    def predict(self, data, batch_size=None, n_jobs=1):
         # Get predictions from each model
-        model_cnt = 0
-        for algo_id in self.stats:
-            model_to_eval = self.stats[algo_id]
-            for idx, (_, _, path) in enumerate(model_to_eval):
-                with open(path, 'rb')as f:
-                    op_list, model, _ = pkl.load(f)
-                _node = data.copy_()
-
-                _node = construct_node(_node, op_list)
-
-                if self.base_model_mask[model_cnt] == 1:
-                    if self.task_type in CLS_TASKS:
-                        model_pred_list.append(model.predict_proba(_node.data[0]))
-                    else:
-                        model_pred_list.append(model.predict(_node.data[0]))
-                model_cnt += 1
-
+        model_pred_list = [pred for pred in self.predict_members(data, batch_size=batch_size, n_jobs=n_jobs)
+                           if pred is not None]
         # Calculate the average of predictions
-        for i in range(len(data.data[0])):
-            sample_pred_list = [model_pred[i] for model_pred in model_pred_list]
-            pred_average = reduce(lambda x, y: x + y, sample_pred_list) / len(sample_pred_list)
-            final_pred.append(pred_average)
+        return np.mean(model_pred_list, axis=0)
 
-        return np.array(final_pred)
+    def export(self):
+        members = self.export_members()
+        return {'members': members, 'weights': np.ones(len(members)), 'meta_learner': None}
 
     def get_ens_model_info(self):
         model_cnt = 0
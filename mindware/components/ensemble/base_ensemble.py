@@ -1,5 +1,4 @@
 from sklearn.metrics._scorer import _BaseScorer
-from sklearn.model_selection import StratifiedShuffleSplit, ShuffleSplit
 import numpy as np
 import pickle as pkl
 import time
@@ -8,6 +7,9 @@ from mindware.components.utils.constants import CLS_TASKS
 from mindware.components.ensemble.unnamed_ensemble import choose_base_models_classification, \
     choose_base_models_regression
 from mindware.components.feature_engineering.parse import construct_node
+from mindware.components.computation.batch_inference import parallel_predict, get_pipeline_key
+from mindware.components.utils.split_registry import get_split_registry
+from mindware.components.utils.topk_saver import load_validation_prediction
 from mindware.utils.logging_utils import get_logger
 
 
@@ -30,35 +32,46 @@ class BaseEnsembleModel(object):
 
         self.predictions = []
         self.train_labels = None
+        self.model_cache = dict()
+        self.pipeline_keys = dict()
         self.timestamp = str(time.time())
         logger_name = 'EnsembleBuilder'
         self.logger = get_logger(logger_name)
 
+        # TODO: Test size
+        test_size = 0.33
+        # All the members are evaluated on the same validation split as the evaluators.
+        _, val_index = get_split_registry().get_holdout_split(self.node.data[1], test_size=test_size,
+                                                              stratify=self.task_type in CLS_TASKS, random_state=1)
+
+        # Use the validation predictions saved by the evaluators if all the members share the same samples,
+        # e.g., the holdout split or the out-of-fold predictions of cross-validation.
+        cached_preds = list()
+        for algo_id in self.stats.keys():
+            for _, _, path in self.stats[algo_id]:
+                cached_preds.append(load_validation_prediction(path))
+        if len(cached_preds) > 0 and all(item is not None for item in cached_preds) and \
+                all(np.array_equal(item[0], cached_preds[0][0]) for item in cached_preds):
+            val_index = cached_preds[0][0]
+        self.train_labels = self.node.data[1][val_index]
+
+        self.cached_predictions = True
+        model_cnt = 0
         for algo_id in self.stats.keys():
             model_to_eval = self.stats[algo_id]
             for idx, (_, _, path) in enumerate(model_to_eval):
+                cached_pred = cached_preds[model_cnt]
+                model_cnt += 1
+                if cached_pred is not None and np.array_equal(cached_pred[0], val_index):
+                    self.predictions.append(cached_pred[1])
+                    continue
+
+                self.cached_predictions = False
                 with open(path, 'rb')as f:
                     op_list, model, _ = pkl.load(f)
                 _node = self.node.copy_()
                 _node = construct_node(_node, op_list)
-
-                # TODO: Test size
-                test_size = 0.33
-                X, y = _node.data
-
-                if self.task_type in CLS_TASKS:
-                    ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=1)
-                else:
-                    ss = ShuffleSplit(n_splits=1, test_size=test_size, random_state=1)
-
-                for train_index, val_index in ss.split(X, y):
-                    X_valid = X[val_index]
-                    y_valid = y[val_index]
-
-                if self.train_labels is not None:
-                    assert (self.train_labels == y_valid).all()
-                else:
-                    self.train_labels = y_valid
+                X_valid = _node.data[0][val_index]
 
                 if self.task_type in CLS_TASKS:
                     y_valid_pred = model.predict_proba(X_valid)
@@ -76,14 +89,108 @@ class BaseEnsembleModel(object):
             self.base_model_mask = choose_base_models_classification(np.array(self.predictions),
                                                                      self.ensemble_size)
         else:
-            self.base_model_mask = choose_base_models_regression(np.array(self.predictions), np.array(y_valid),
+            self.base_model_mask = choose_base_models_regression(np.array(self.predictions),
+                                                                 np.array(self.train_labels),
                                                                  self.ensemble_size)
         self.ensemble_size = sum(self.base_model_mask)
 
+    def get_meta_feature(self, predictions):
+        """
+            Stack the predictions of the selected members into the features of the meta-learner.
+        :param predictions: the predictions of all the members.
+        """
+        features = list()
+        for model_cnt, pred in enumerate(predictions):
+            if self.base_model_mask[model_cnt] != 1:
+                continue
+            pred = np.asarray(pred)
+            if self.task_type in CLS_TASKS:
+                # Binary classification
+                features.append(pred[:, 1:2] if pred.shape[1] == 2 else pred)
+            else:
+                features.append(pred.reshape(-1, 1))
+        return np.hstack(features)
+
+    def load_model(self, path):
+        # The loaded models stay in memory for the following predictions.
+        if path not in self.model_cache:
+            with open(path, 'rb')as f:
+                self.model_cache[path] = pkl.load(f)
+        return self.model_cache[path]
+
+    def get_member_paths(self):
+        return [path for algo_id in self.stats.keys() for _, _, path in self.stats[algo_id]]
+
+    def get_pipeline_key(self, path):
+        # Members with the same fitted FE pipeline share the transformed features at prediction time.
+        if path not in self.pipeline_keys:
+            op_list, _, _ = self.load_model(path)
+            self.pipeline_keys[path] = get_pipeline_key(op_list)
+        return self.pipeline_keys[path]
+
+    def load_member(self, model_cnt, path):
+        op_list, model, _ = self.load_model(path)
+        return op_list, [model]
+
+    def get_member_loader(self):
+        return self.load_member
+
+    def export_members(self, mask=None):
+        """
+            Load the selected members with their fitted FE pipelines.
+        :param mask: the members to load; base_model_mask by default.
+        :return: a list of (op_list, estimators), in the same order as the members.
+        """
+        if mask is None:
+            mask = self.base_model_mask
+        load_member = self.get_member_loader()
+        return [load_member(model_cnt, path) for model_cnt, path in enumerate(self.get_member_paths())
+                if mask[model_cnt] == 1]
+
+    def predict_members(self, data, mask=None, batch_size=None, n_jobs=1, load_member=None):
+        """
+            Predict with the saved top-k models, skipping the members that are not selected.
+        :param mask: the members to predict with; base_model_mask by default.
+        :param batch_size: the number of rows transformed and predicted at a time.
+        :param n_jobs: the number of members evaluated in parallel.
+        :param load_member: maps (model_cnt, path) to (op_list, estimators); get_member_loader() by default.
+        :return: the predictions of all the members, None for those not selected.
+        """
+        if mask is None:
+            mask = self.base_model_mask
+        if load_member is None:
+            load_member = self.get_member_loader()
+        members, member_idx, keys = list(), list(), list()
+        for model_cnt, path in enumerate(self.get_member_paths()):
+            if mask[model_cnt] == 1:
+                members.append(load_member(model_cnt, path))
+                member_idx.append(model_cnt)
+                keys.append(self.get_pipeline_key(path))
+
+        predictions = [None] * len(mask)
+        preds = parallel_predict(members, data, self.task_type, batch_size=batch_size, n_jobs=n_jobs, keys=keys)
+        for model_cnt, pred in zip(member_idx, preds):
+            predictions[model_cnt] = pred
+        return predictions
+
+    def __getstate__(self):
+        # The loaded models are reloaded from disk when needed.
+        state = self.__dict__.copy()
+        state['model_cache'] = dict()
+        return state
+
     def fit(self, data):
         raise NotImplementedError
 
-    def predict(self, data):
+    def predict(self, data, batch_size=None, n_jobs=1):
+        raise NotImplementedError
+
+    def export(self):
+        """
+            Collect what is needed to predict without the saved models.
+        :return: a dict with the selected members, their weights (for averaging ensembles)
+                 and the meta-learner (for blending and stacking).
+        """
         raise NotImplementedError
 
     def get_ens_model_info(self):
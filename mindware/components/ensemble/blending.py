@@ -2,13 +2,13 @@ import numpy as np
 import warnings
 import os
 import pickle as pkl
-from sklearn.model_selection import train_test_split
 from sklearn.metrics._scorer import _BaseScorer
 
 from mindware.components.ensemble.base_ensemble import BaseEnsembleModel
 from mindware.components.utils.constants import CLS_TASKS
 from mindware.components.evaluators.base_evaluator import fetch_predict_estimator
 from mindware.components.feature_engineering.parse import construct_node
+from mindware.components.utils.split_registry import get_split_registry
 
 
 class Blending(BaseEnsembleModel):
@@ -52,8 +52,16 @@ class Blending(BaseEnsembleModel):
                 self.meta_learner = LGBMRegressor(max_depth=4, learning_rate=0.05, n_estimators=70, n_jobs=1)
 
     def fit(self, data):
+        if self.cached_predictions:
+            # The members were evaluated on held-out samples, so their saved predictions train the meta-learner.
+            self.meta_learner.fit(self.get_meta_feature(self.predictions), self.train_labels)
+            return self
+
         # Split training data for phase 1 and phase 2
         test_size = 0.2
+        p1_index, p2_index = get_split_registry().get_holdout_split(data.data[1], test_size=test_size,
+                                                                    stratify=self.task_type in CLS_TASKS,
+                                                                    random_state=1)
 
         # Train basic models using a part of training data
         model_cnt = 0
@@ -69,12 +77,7 @@ class Blending(BaseEnsembleModel):
                 _node = construct_node(_node, op_list, mode='train')
 
                 X, y = _node.data
-                if self.task_type in CLS_TASKS:
-                    x_p1, x_p2, y_p1, y_p2 = train_test_split(X, y, test_size=test_size,
-                                                              stratify=data.data[1], random_state=1)
-                else:
-                    x_p1, x_p2, y_p1, y_p2 = train_test_split(X, y, test_size=test_size,
-                                                              random_state=1)
+                x_p1, x_p2, y_p1, y_p2 = X[p1_index], X[p2_index], y[p1_index], y[p2_index]
 
                 if self.base_model_mask[model_cnt] == 1:
                     estimator = fetch_predict_estimator(self.task_type, algo_id, config, x_p1, y_p1,
@@ -111,53 +114,24 @@ class Blending(BaseEnsembleModel):
 
         return self
 
-    def get_feature(self, data):
+    def get_member_loader(self):
+        if self.cached_predictions:
+            return self.load_member
+
         # Predict the labels via blending
-        feature_p2 = None
-        model_cnt = 0
-        suc_cnt = 0
-        for algo_id in self.stats.keys():
-            model_to_eval = self.stats[algo_id]
-            for idx, (config, _, path) in enumerate(model_to_eval):
-                with open(path, 'rb')as f:
-                    op_list, model, _ = pkl.load(f)
-                _node = data.copy_()
+        def load_member(model_cnt, path):
+            op_list, _, _ = self.load_model(path)
+            estimator = self.load_model(
+                os.path.join(self.output_dir, '%s-blending-model%d' % (self.timestamp, model_cnt)))
+            return op_list, [estimator]
 
-                _node = construct_node(_node, op_list)
+        return load_member
 
-                if self.base_model_mask[model_cnt] == 1:
-                    with open(os.path.join(self.output_dir, '%s-blending-model%d' % (self.timestamp, model_cnt)),
-                              'rb') as f:
-                        estimator = pkl.load(f)
-                    if self.task_type in CLS_TASKS:
-                        pred = estimator.predict_proba(_node.data[0])
-                        n_dim = np.array(pred).shape[1]
-                        if n_dim == 2:
-                            # Binary classificaion
-                            n_dim = 1
-                        # Initialize training matrix for phase 2
-                        if feature_p2 is None:
-                            num_samples = len(data.data[0])
-                            feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                        if n_dim == 1:
-                            feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = pred[:, 1:2]
-                        else:
-                            feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = pred
-                    else:
-                        pred = estimator.predict(_node.data[0]).reshape(-1, 1)
-                        n_dim = 1
-                        # Initialize training matrix for phase 2
-                        if feature_p2 is None:
-                            num_samples = len(data.data[0])
-                            feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                        feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = pred
-                    suc_cnt += 1
-                model_cnt += 1
+    def get_feature(self, data, batch_size=None, n_jobs=1):
+        return self.get_meta_feature(self.predict_members(data, batch_size=batch_size, n_jobs=n_jobs))
 
-        return feature_p2
-
-    def predict(self, data):
-        feature_p2 = self.get_feature(data)
+    def predict(self, data, batch_size=None, n_jobs=1):
+        feature_p2 = self.get_feature(data, batch_size=batch_size, n_jobs=n_jobs)
         # Get predictions from meta-learner
         if self.task_type in CLS_TASKS:
             final_pred = self.meta_learner.predict_proba(feature_p2)
@@ -165,15 +139,21 @@ class Blending(BaseEnsembleModel):
             final_pred = self.meta_learner.predict(feature_p2)
         return final_pred
 
+    def export(self):
+        return {'members': self.export_members(), 'weights': None, 'meta_learner': self.meta_learner}
+
     def get_ens_model_info(self):
         model_cnt = 0
         ens_info = {}
         ens_config = []
         for algo_id in self.stats:
             model_to_eval = self.stats[algo_id]
-            for idx, (config, _, _) in enumerate(model_to_eval):
+            for idx, (config, _, path) in enumerate(model_to_eval):
                 if not hasattr(self, 'base_model_mask') or self.base_model_mask[model_cnt] == 1:
-                    model_path = os.path.join(self.output_dir, '%s-blending-model%d' % (self.timestamp, model_cnt))
+                    if self.cached_predictions:
+                        model_path = path
+                    else:
+                        model_path = os.path.join(self.output_dir, '%s-blending-model%d' % (self.timestamp, model_cnt))
                     ens_config.append((algo_id, config, model_path))
                 model_cnt += 1
         ens_info['ensemble_method'] = 'blending'
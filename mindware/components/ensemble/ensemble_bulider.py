@@ -50,8 +50,11 @@ class EnsembleBuilder:
     def fit(self, data):
         return self.model.fit(data)
 
-    def predict(self, data):
-        return self.model.predict(data)
+    def predict(self, data, batch_size=None, n_jobs=1):
+        return self.model.predict(data, batch_size=batch_size, n_jobs=n_jobs)
+
+    def export(self):
+        return self.model.export()
 
     def refit(self):
         return self.model.refit()
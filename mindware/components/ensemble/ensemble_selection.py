@@ -5,8 +5,9 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.metrics._scorer import _BaseScorer, _PredictScorer, _ThresholdScorer
 
 from mindware.components.utils.constants import *
+from mindware.components.ensemble.selection_engine import get_batch_score_func, ensemble_selection
 from mindware.components.ensemble.base_ensemble import BaseEnsembleModel
-from mindware.components.feature_engineering.parse import construct_node
+from mindware.components.computation.batch_inference import weighted_predict
 
 
 class EnsembleSelection(BaseEnsembleModel):
@@ -98,42 +99,14 @@ class EnsembleSelection(BaseEnsembleModel):
                 trajectory.append(ensemble_performance)
             ensemble_size -= n_best
 
-        for i in range(ensemble_size):
-            scores = np.zeros((len(predictions)))
-            s = len(ensemble)
-            if s == 0:
-                weighted_ensemble_prediction = np.zeros(predictions[0].shape)
-            else:
-                # Memory-efficient averaging!
-                ensemble_prediction = np.zeros(ensemble[0].shape)
-                for pred in ensemble:
-                    ensemble_prediction += pred
-                ensemble_prediction /= s
-
-                weighted_ensemble_prediction = (s / float(s + 1)) * \
-                                               ensemble_prediction
-            fant_ensemble_prediction = np.zeros(weighted_ensemble_prediction.shape)
-            for j, pred in enumerate(predictions):
-                # TODO: this could potentially be vectorized! - let's profile
-                # the script first!
-                if self.task_type in CLS_TASKS:
-                    fant_ensemble_prediction[:, :] = weighted_ensemble_prediction + \
-                                                     (1. / float(s + 1)) * pred
-                else:
-                    fant_ensemble_prediction[:] = weighted_ensemble_prediction + \
-                                                  (1. / float(s + 1)) * pred
-
-                scores[j] = -self.calculate_score(pred=fant_ensemble_prediction, y_true=labels)
-
-            all_best = np.argwhere(scores == np.nanmin(scores)).flatten()
-            best = self.random_state.choice(all_best)
-            ensemble.append(predictions[best])
-            trajectory.append(scores[best])
-            order.append(best)
-
-            # Handle special case
-            if len(predictions) == 1:
-                break
+        score_func = get_batch_score_func(self.metric, self.task_type, labels)
+        if score_func is None:
+            # Score the candidates one by one with the scorer.
+            score_func = lambda preds: np.array([self.calculate_score(pred=pred, y_true=labels) for pred in preds])
+        _order, _trajectory = ensemble_selection(predictions, ensemble_size, score_func, self.random_state,
+                                                 init_order=order)
+        order.extend(_order)
+        trajectory.extend(_trajectory)
 
         self.indices_ = order
         self.trajectory_ = trajectory
@@ -201,47 +174,21 @@ class EnsembleSelection(BaseEnsembleModel):
         indices = np.argsort(perf)[perf.shape[0] - n_best:]
         return indices
 
-    def predict(self, data):
-        predictions = []
-        cur_idx = 0
-        for algo_id in self.stats.keys():
-            model_to_eval = self.stats[algo_id]
-            for idx, (_, _, path) in enumerate(model_to_eval):
-                with open(path, 'rb')as f:
-                    op_list, estimator, _ = pkl.load(f)
-                _node = data.copy_()
-
-                _node = construct_node(_node, op_list)
-
-                X_test = _node.data[0]
-                if cur_idx in self.model_idx:
-                    if self.task_type in CLS_TASKS:
-                        predictions.append(estimator.predict_proba(X_test))
-                    else:
-                        predictions.append(estimator.predict(X_test))
-                else:
-                    if len(self.shape) == 1:
-                        predictions.append(np.zeros(len(_node.data[0])))
-                    else:
-                        predictions.append(np.zeros((len(_node.data[0]), self.shape[1])))
-                cur_idx += 1
-        predictions = np.asarray(predictions)
-
-        # if predictions.shape[0] == len(self.weights_),
-        # predictions include those of zero-weight models.
-        if predictions.shape[0] == len(self.weights_):
-            return np.average(predictions, axis=0, weights=self.weights_)
-
-        # if prediction model.shape[0] == len(non_null_weights),
-        # predictions do not include those of zero-weight models.
-        elif predictions.shape[0] == np.count_nonzero(self.weights_):
-            non_null_weights = [w for w in self.weights_ if w > 0]
-            return np.average(predictions, axis=0, weights=non_null_weights)
-
-        # If none of the above applies, then something must have gone wrong.
-        else:
-            raise ValueError("The dimensions of ensemble predictions"
-                             " and ensemble weights do not match!")
+    def predict(self, data, batch_size=None, n_jobs=1):
+        # Only the members with non-zero weights (model_idx) are loaded and evaluated.
+        member_paths = self.get_member_paths()
+        members = [self.load_member(model_cnt, member_paths[model_cnt]) for model_cnt in self.model_idx]
+        weights = [self.weights_[model_cnt] for model_cnt in self.model_idx]
+        keys = [self.get_pipeline_key(member_paths[model_cnt]) for model_cnt in self.model_idx]
+        return weighted_predict(members, weights, data, self.task_type, batch_size=batch_size, n_jobs=n_jobs,
+                                keys=keys)
+
+    def export(self):
+        mask = np.zeros(len(self.weights_), dtype=int)
+        mask[self.model_idx] = 1
+        return {'members': self.export_members(mask=mask),
+                'weights': np.asarray([self.weights_[model_cnt] for model_cnt in self.model_idx]),
+                'meta_learner': None}
 
     def __str__(self):
         return 'Ensemble Selection:\n\tTrajectory: %s\n\tMembers: %s' \
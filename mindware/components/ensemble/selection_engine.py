@@ -0,0 +1,107 @@
+import numpy as np
+from sklearn.metrics import accuracy_score, balanced_accuracy_score, log_loss, mean_squared_error
+from sklearn.metrics._scorer import _PredictScorer, _ProbaScorer
+
+from mindware.components.utils.constants import CLS_TASKS
+
+
+def _accuracy(preds, labels):
+    return np.mean(np.argmax(preds, axis=-1) == labels, axis=1)
+
+
+def _balanced_accuracy(preds, labels):
+    correct = np.argmax(preds, axis=-1) == labels
+    classes, y_idx = np.unique(labels, return_inverse=True)
+    onehot = np.zeros((len(labels), len(classes)))
+    onehot[np.arange(len(labels)), y_idx] = 1
+    # Recall of each class, averaged over the classes in labels.
+    recalls = correct.dot(onehot) / onehot.sum(axis=0)
+    return np.mean(recalls, axis=1)
+
+
+def _log_loss(preds, labels):
+    classes, y_idx = np.unique(labels, return_inverse=True)
+    if preds.shape[-1] != len(classes):
+        raise ValueError('The number of classes in predictions and labels do not match!')
+    eps = np.finfo(preds.dtype).eps
+    preds = np.clip(preds, eps, 1 - eps)
+    preds = preds / preds.sum(axis=-1, keepdims=True)
+    true_probs = np.take_along_axis(preds, y_idx[None, :, None], axis=-1)[..., 0]
+    return -np.mean(np.log(true_probs), axis=1)
+
+
+def _mean_squared_error(preds, labels):
+    return np.mean((preds - labels) ** 2, axis=1)
+
+
+def get_batch_score_func(metric, task_type, labels):
+    """
+        Get a vectorized version of the scorer for ensemble selection.
+    :param metric: the sklearn scorer.
+    :param labels: the labels of the validation samples.
+    :return: a function that maps the stacked predictions of M ensembles, with shape (M, n, k) for classification
+             or (M, n) for regression, to their M scores (the larger, the better),
+             or None if the metric is not supported.
+    """
+    score_func = getattr(metric, '_score_func', None)
+    if getattr(metric, '_kwargs', None):
+        return None
+
+    if task_type in CLS_TASKS:
+        if isinstance(metric, _PredictScorer) and score_func is accuracy_score:
+            kernel = _accuracy
+        elif isinstance(metric, _PredictScorer) and score_func is balanced_accuracy_score:
+            kernel = _balanced_accuracy
+        elif isinstance(metric, _ProbaScorer) and score_func is log_loss:
+            kernel = _log_loss
+        else:
+            return None
+    else:
+        if isinstance(metric, _PredictScorer) and score_func is mean_squared_error:
+            kernel = _mean_squared_error
+        else:
+            return None
+
+    labels = np.asarray(labels)
+    return lambda preds: kernel(preds, labels) * metric._sign
+
+
+def ensemble_selection(predictions, ensemble_size, score_func, random_state, init_order=None,
+                       max_chunk_bytes=64 * 1024 * 1024):
+    """
+        Greedy forward selection with replacement (Rich Caruana's ensemble selection).
+
+        The sum of the selected predictions is kept across rounds, and in each round all the candidates
+        are scored at once on a stacked array of the candidate ensembles, in chunks of at most max_chunk_bytes.
+    :param predictions: the predictions of the M models, with shape (M, n, k) or (M, n).
+    :param score_func: maps the predictions of a batch of ensembles to their scores (the larger, the better).
+    :param init_order: the indices of the models already in the ensemble.
+    :return: order, trajectory: the indices of the selected models, and the losses after each selection.
+    """
+    predictions = np.asarray(predictions, dtype=np.float64)
+    num_models = predictions.shape[0]
+    init_order = list() if init_order is None else list(init_order)
+
+    ensemble_sum = np.zeros(predictions.shape[1:])
+    for idx in init_order:
+        ensemble_sum += predictions[idx]
+    chunk_size = max(1, int(max_chunk_bytes // max(predictions[0].nbytes, 1)))
+
+    order, trajectory = list(), list()
+    for i in range(ensemble_size):
+        s = len(init_order) + len(order)
+        losses = np.zeros(num_models)
+        for start in range(0, num_models, chunk_size):
+            fant_ensemble_predictions = (ensemble_sum + predictions[start:start + chunk_size]) / float(s + 1)
+            losses[start:start + chunk_size] = -score_func(fant_ensemble_predictions)
+
+        all_best = np.argwhere(losses == np.nanmin(losses)).flatten()
+        best = random_state.choice(all_best)
+        ensemble_sum += predictions[best]
+        order.append(best)
+        trajectory.append(losses[best])
+
+        # Handle special case
+        if num_models == 1:
+            break
+    return order, trajectory
@@ -28,6 +28,7 @@ class Stacking(BaseEnsembleModel):
                          output_dir=output_dir)
 
         self.kfold = kfold
+        self.use_oof_predictions = False
         try:
             from lightgbm import LGBMClassifier
         except:
@@ -57,6 +58,12 @@ class Stacking(BaseEnsembleModel):
                 self.meta_learner = LGBMRegressor(max_depth=4, learning_rate=0.05, n_estimators=70, n_jobs=1)
 
     def fit(self, data):
+        # The out-of-fold predictions saved by cross-validation cover the whole training data.
+        self.use_oof_predictions = self.cached_predictions and len(self.train_labels) == len(data.data[1])
+        if self.use_oof_predictions:
+            self.meta_learner.fit(self.get_meta_feature(self.predictions), self.train_labels)
+            return self
+
         # Split training data for phase 1 and phase 2
         if self.task_type in CLS_TASKS:
             kf = StratifiedKFold(n_splits=self.kfold)
@@ -115,58 +122,25 @@ class Stacking(BaseEnsembleModel):
         self.meta_learner.fit(feature_p2, y)
         return self
 
-    def get_feature(self, data):
-        # Predict the labels via stacking
-        feature_p2 = None
-        model_cnt = 0
-        suc_cnt = 0
-        for algo_id in self.stats.keys():
-            model_to_eval = self.stats[algo_id]
-            for idx, (config, _, path) in enumerate(model_to_eval):
-                with open(path, 'rb')as f:
-                    op_list, model, _ = pkl.load(f)
-                _node = data.copy_()
+    def get_member_loader(self):
+        if self.use_oof_predictions:
+            return self.load_member
 
-                _node = construct_node(_node, op_list)
+        # Predict the labels via stacking, averaging the predictions of the models fitted on each fold
+        def load_member(model_cnt, path):
+            op_list, _, _ = self.load_model(path)
+            estimators = [self.load_model(
+                os.path.join(self.output_dir, '%s-model%d_part%d' % (self.timestamp, model_cnt, j)))
+                for j in range(self.kfold)]
+            return op_list, estimators
 
-                if self.base_model_mask[model_cnt] == 1:
-                    for j in range(self.kfold):
-                        with open(
-                                os.path.join(self.output_dir, '%s-model%d_part%d' % (self.timestamp, model_cnt, j)),
-                                'rb') as f:
-                            estimator = pkl.load(f)
-                        if self.task_type in CLS_TASKS:
-                            pred = estimator.predict_proba(_node.data[0])
-                            n_dim = np.array(pred).shape[1]
-                            if n_dim == 2:
-                                n_dim = 1
-                            if feature_p2 is None:
-                                num_samples = len(_node.data[0])
-                                feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                            # Get average predictions
-                            if n_dim == 1:
-                                feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = \
-                                    feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] + pred[:,
-                                                                                           1:2] / self.kfold
-                            else:
-                                feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = \
-                                    feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] + pred / self.kfold
-                        else:
-                            pred = estimator.predict(_node.data[0]).reshape(-1, 1)
-                            n_dim = 1
-                            # Initialize training matrix for phase 2
-                            if feature_p2 is None:
-                                num_samples = len(_node.data[0])
-                                feature_p2 = np.zeros((num_samples, self.ensemble_size * n_dim))
-                            # Get average predictions
-                            feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] = \
-                                feature_p2[:, suc_cnt * n_dim:(suc_cnt + 1) * n_dim] + pred / self.kfold
-                    suc_cnt += 1
-                model_cnt += 1
-        return feature_p2
+        return load_member
 
-    def predict(self, data):
-        feature_p2 = self.get_feature(data)
+    def get_feature(self, data, batch_size=None, n_jobs=1):
+        return self.get_meta_feature(self.predict_members(data, batch_size=batch_size, n_jobs=n_jobs))
+
+    def predict(self, data, batch_size=None, n_jobs=1):
+        feature_p2 = self.get_feature(data, batch_size=batch_size, n_jobs=n_jobs)
         # Get predictions from meta-learner
         if self.task_type in CLS_TASKS:
             final_pred = self.meta_learner.predict_proba(feature_p2)
@@ -174,15 +148,21 @@ class Stacking(BaseEnsembleModel):
             final_pred = self.meta_learner.predict(feature_p2)
         return final_pred
 
+    def export(self):
+        return {'members': self.export_members(), 'weights': None, 'meta_learner': self.meta_learner}
+
     def get_ens_model_info(self):
         model_cnt = 0
         ens_info = {}
         ens_config = []
         for algo_id in self.stats:
             model_to_eval = self.stats[algo_id]
-            for idx, (config, _, _) in enumerate(model_to_eval):
+            for idx, (config, _, path) in enumerate(model_to_eval):
                 if not hasattr(self, 'base_model_mask') or self.base_model_mask[model_cnt] == 1:
-                    model_path = os.path.join(self.output_dir, '%s-stacking-model%d' % (self.timestamp, model_cnt))
+                    if self.use_oof_predictions:
+                        model_path = path
+                    else:
+                        model_path = os.path.join(self.output_dir, '%s-stacking-model%d' % (self.timestamp, model_cnt))
                     ens_config.append((algo_id, config, model_path))
                 model_cnt += 1
         ens_info['ensemble_method'] = 'stacking'
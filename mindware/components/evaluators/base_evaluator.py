@@ -1,5 +1,9 @@
+import copy
 from abc import ABCMeta
 from mindware.components.metrics.metric import get_metric
+from mindware.components.computation.parallel_fold import ParallelFoldExecutor
+from mindware.components.feature_engineering.fe_cache import get_data_fingerprint
+from mindware.components.utils.topk_saver import get_topk_store, load_topk_config
 from mindware.components.utils.constants import *
 
 
@@ -42,3 +46,57 @@ class _BaseEvaluator(metaclass=ABCMeta):
 
     def __call__(self, *args, **kwargs):
         raise NotImplementedError()
+
+    def get_incumbent_score(self):
+        """
+            The best score so far, from the evaluations in this process and the top-k index of the run.
+        """
+        scores = list() if self.incumbent_score is None else [self.incumbent_score]
+        store = get_topk_store(self.output_dir, self.timestamp, create=False)
+        stats = store.get_sorted_dict() if store is not None else load_topk_config(self.output_dir, self.timestamp)
+        for items in stats.values():
+            scores.extend([perf for _, perf, _ in items])
+        return max(scores) if len(scores) > 0 else None
+
+    def get_split_key(self, *split_info):
+        if self.transformer_cache is None:
+            return None
+        if self.data_fingerprint is None:
+            self.data_fingerprint = get_data_fingerprint(self.data_node)
+        return '-'.join([self.data_fingerprint] + [str(item) for item in split_info])
+
+    def get_fold_executor(self):
+        if self.resampling_params is None:
+            return None
+        n_jobs = self.resampling_params.get('fold_n_jobs', 1)
+        if n_jobs <= 1:
+            return None
+        if self.fold_executor is None:
+            self.fold_executor = ParallelFoldExecutor(n_worker=n_jobs,
+                                                      backend=self.resampling_params.get('fold_backend', 'thread'))
+        return self.fold_executor
+
+    def get_fold_evaluator(self):
+        """
+            Return the evaluator that runs evaluate_fold in the fold workers.
+            Process workers receive a shallow copy without the training data, which they read from shared memmaps.
+            The copy is pickled with an empty TransformerCache, so the process workers do not share fitted FE stages.
+        """
+        if self.fold_executor.backend == 'thread':
+            return self
+        # The workers have no data to compute the fingerprint from.
+        self.get_split_key()
+        evaluator = copy.copy(self)
+        evaluator.data_node = copy.copy(self.data_node)
+        evaluator.data_node.data = None
+        evaluator.train_node, evaluator.val_node, evaluator.fold_executor = None, None, None
+        evaluator.holdout_data, evaluator.holdout_index = dict(), dict()
+        return evaluator
+
+    def gc(self):
+        """
+            Release the fold workers and the shared memmaps of the cross-validation.
+        """
+        if self.fold_executor is not None:
+            self.fold_executor.shutdown()
+            self.fold_executor = None
@@ -0,0 +1,65 @@
+import os
+import pickle as pkl
+from contextlib import contextmanager
+
+from mindware.components.models.base_model import IterativeComponent, IterativeComponentWithSampleWeight
+from mindware.components.utils.topk_saver import CombinedTopKModelSaver, _atomic_dump, _remove_file
+
+
+def is_iterative_estimator(estimator):
+    return isinstance(estimator, (IterativeComponent, IterativeComponentWithSampleWeight))
+
+
+@contextmanager
+def _acquire(lock):
+    if lock is None:
+        yield
+    else:
+        with lock:
+            yield
+
+
+class PartialFitCheckpoints(object):
+    """
+        A bounded on-disk cache of the partially fitted pipelines of the 'partial' strategy, keyed by config.
+
+        When a configuration is promoted to a higher rung, its evaluation resumes the estimator fitted on the
+        lower rung instead of training from scratch. The checkpoints are files named tmp_<timestamp>_<config id>.pkl
+        in the output dir, so that the evaluations in other processes can read them; the Hyperband-based optimizers
+        remove them after each bracket.
+    """
+
+    def __init__(self, model_dir, timestamp, max_checkpoints=64):
+        self.model_dir = model_dir
+        self.timestamp = timestamp
+        self.max_checkpoints = max_checkpoints
+
+    def get_path(self, config):
+        return os.path.join(self.model_dir, 'tmp_%s_%s.pkl' % (self.timestamp,
+                                                               CombinedTopKModelSaver.get_configuration_id(config)))
+
+    def load(self, config, rw_lock=None):
+        """
+        :return: [op_list, estimator, resource_ratio], or None if config has no checkpoint.
+        """
+        path = self.get_path(config)
+        with _acquire(rw_lock):
+            if not os.path.exists(path):
+                return None
+            try:
+                with open(path, 'rb') as f:
+                    return pkl.load(f)
+            except Exception:
+                return None
+
+    def save(self, config, op_list, estimator, resource_ratio, rw_lock=None):
+        prefix = 'tmp_%s_' % self.timestamp
+        with _acquire(rw_lock):
+            _atomic_dump([op_list, estimator, resource_ratio], self.get_path(config))
+            # Evict the oldest checkpoints beyond the bound.
+            paths = [os.path.join(self.model_dir, filename) for filename in os.listdir(self.model_dir)
+                     if filename.startswith(prefix) and filename.endswith('.pkl')]
+            if len(paths) > self.max_checkpoints:
+                paths.sort(key=lambda path: os.path.getmtime(path))
+                for path in paths[:len(paths) - self.max_checkpoints]:
+                    _remove_file(path)
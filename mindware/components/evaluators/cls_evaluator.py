@@ -1,6 +1,7 @@
 from ConfigSpace import ConfigurationSpace, CategoricalHyperparameter
 import warnings
 import os
+import copy
 import time
 import numpy as np
 import pickle as pkl
@@ -9,10 +10,13 @@ from sklearn.preprocessing import OneHotEncoder
 
 from mindware.utils.logging_utils import get_logger
 from mindware.components.evaluators.base_evaluator import _BaseEvaluator
-from mindware.components.evaluators.evaluate_func import validation
+from mindware.components.evaluators.evaluate_func import validation, partial_validation, learning_curve_validation
+from mindware.components.evaluators.checkpoint import PartialFitCheckpoints, is_iterative_estimator
 from mindware.components.feature_engineering.task_space import get_task_hyperparameter_space
 from mindware.components.feature_engineering.parse import parse_config, construct_node
-from mindware.components.utils.topk_saver import CombinedTopKModelSaver
+from mindware.components.feature_engineering.fe_cache import TransformerCache
+from mindware.components.utils.topk_saver import save_model_blob
+from mindware.components.utils.split_registry import get_split_registry, gather_split
 from mindware.components.utils.class_loader import get_combined_candidtates
 from mindware.components.models.classification import _classifiers, _addons
 from mindware.components.utils.constants import *
@@ -87,7 +91,9 @@ def get_combined_cs(task_type=CLASSIFICATION, include_image=False,
 
 class ClassificationEvaluator(_BaseEvaluator):
     def __init__(self, fixed_config=None, scorer=None, data_node=None, task_type=0, resampling_strategy='cv',
-                 resampling_params=None, timestamp=None, output_dir=None, seed=1, if_imbal=False):
+                 resampling_params=None, timestamp=None, output_dir=None, seed=1, if_imbal=False,
+                 fe_cache_size=256 * 1024 * 1024, continue_training=False,
+                 early_stop=False, early_stop_margin=0.):
         self.resampling_strategy = resampling_strategy
         self.resampling_params = resampling_params
 
@@ -100,12 +106,78 @@ class ClassificationEvaluator(_BaseEvaluator):
         self.seed = seed
         self.onehot_encoder = None
         self.logger = get_logger(self.__module__ + "." + self.__class__.__name__)
-        self.continue_training = False
+        self.continue_training = continue_training and output_dir is not None
 
         self.train_node = data_node.copy_()
         self.val_node = data_node.copy_()
 
         self.timestamp = timestamp
+        # Partially fitted iterative estimators of the 'partial' strategy, resumed when a config is promoted.
+        self.model_dir = output_dir
+        self.checkpoints = PartialFitCheckpoints(output_dir, timestamp) if self.continue_training else None
+        # Learning-curve early termination of the iterative learners in the holdout strategy.
+        self.early_stop = early_stop
+        self.early_stop_margin = early_stop_margin
+        self.incumbent_score = None
+
+        # Fitted FE stages are shared across trials that evaluate the same split.
+        self.transformer_cache = TransformerCache(fe_cache_size) if fe_cache_size else None
+        # Computed on the first cache use.
+        self.data_fingerprint = None
+        self.fold_executor = None
+        # The holdout parts of the data, gathered once and shared by all trials.
+        self.holdout_data = dict()
+        self.holdout_index = dict()
+
+    def get_holdout_data(self, test_size):
+        if test_size not in self.holdout_data:
+            train_index, val_index = get_split_registry().get_holdout_split(self.data_node.data[1], test_size=test_size,
+                                                                            stratify=True, random_state=self.seed)
+            self.holdout_data[test_size] = gather_split(*self.data_node.data, train_index, val_index)
+            self.holdout_index[test_size] = val_index
+        return self.holdout_data[test_size]
+
+    @staticmethod
+    def get_validation_prediction(clf, X_val):
+        # Kept along with the top-k models, so that the ensembles need not rebuild the pipelines to get them.
+        try:
+            return np.asarray(clf.predict_proba(X_val), dtype=np.float32)
+        except Exception:
+            return None
+
+    def evaluate_fold(self, X, y, config, train_index, test_index, fold_idx, folds):
+        # Warnings are filtered by the caller, as catch_warnings is not thread-safe.
+        train_node, val_node = copy.copy(self.data_node), copy.copy(self.data_node)
+        train_node.data = [X[train_index], y[train_index]]
+        val_node.data = [X[test_index], y[test_index]]
+
+        data_node, op_list = parse_config(train_node, config, record=True, if_imbal=self.if_imbal,
+                                          cache=self.transformer_cache,
+                                          data_key=self.get_split_key('cv', folds, fold_idx))
+        _val_node = construct_node(val_node, op_list)
+
+        _x_train, _y_train = data_node.data
+        _x_val, _y_val = _val_node.data
+
+        config_dict = config.copy()
+        # Prepare training and initial params for classifier.
+        init_params, fit_params = {}, {}
+        if data_node.enable_balance == 1:
+            init_params, fit_params = self.get_fit_params(_y_train, self.estimator_id)
+            for key, val in init_params.items():
+                config_dict[key] = val
+
+        if data_node.data_balance == 1:
+            fit_params['data_balance'] = True
+
+        classifier_id, clf = get_estimator(config_dict, self.estimator_id)
+
+        score = validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val,
+                           random_state=self.seed,
+                           onehot=self.onehot_encoder if isinstance(self.scorer,
+                                                                    _ThresholdScorer) else None,
+                           fit_params=fit_params)
+        return score, self.get_validation_prediction(clf, _x_val)
 
     def get_fit_params(self, y, estimator):
         from mindware.components.utils.balancing import get_weights
@@ -138,15 +210,13 @@ class ClassificationEvaluator(_BaseEvaluator):
                 else:
                     test_size = self.resampling_params['test_size']
 
-                from sklearn.model_selection import StratifiedShuffleSplit
-                ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=self.seed)
-                for train_index, test_index in ss.split(self.data_node.data[0], self.data_node.data[1]):
-                    _x_train, _x_val = self.data_node.data[0][train_index], self.data_node.data[0][test_index]
-                    _y_train, _y_val = self.data_node.data[1][train_index], self.data_node.data[1][test_index]
+                _x_train, _x_val, _y_train, _y_val = self.get_holdout_data(test_size)
                 self.train_node.data = [_x_train, _y_train]
                 self.val_node.data = [_x_val, _y_val]
 
-                data_node, op_list = parse_config(self.train_node, config, record=True, if_imbal=self.if_imbal)
+                data_node, op_list = parse_config(self.train_node, config, record=True, if_imbal=self.if_imbal,
+                                                  cache=self.transformer_cache,
+                                                  data_key=self.get_split_key('holdout', test_size))
                 _val_node = self.val_node.copy_()
                 _val_node = construct_node(_val_node, op_list)
 
@@ -171,25 +241,30 @@ class ClassificationEvaluator(_BaseEvaluator):
                 y = np.reshape(_y_train, (len(_y_train), 1))
                 self.onehot_encoder.fit(y)
 
-            score = validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val,
-                               random_state=self.seed,
-                               onehot=self.onehot_encoder if isinstance(self.scorer,
-                                                                        _ThresholdScorer) else None,
-                               fit_params=fit_params)
+            if self.early_stop and is_iterative_estimator(clf):
+                score, stopped = learning_curve_validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val,
+                                                           incumbent_score=self.get_incumbent_score(),
+                                                           margin=self.early_stop_margin,
+                                                           random_state=self.seed,
+                                                           onehot=self.onehot_encoder if isinstance(
+                                                               self.scorer, _ThresholdScorer) else None,
+                                                           fit_params=fit_params)
+                if stopped:
+                    self.logger.info('Early stopped at %d iterations.' % clf.estimator.n_estimators)
+            else:
+                score = validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val,
+                                   random_state=self.seed,
+                                   onehot=self.onehot_encoder if isinstance(self.scorer,
+                                                                            _ThresholdScorer) else None,
+                                   fit_params=fit_params)
 
             if np.isfinite(score):
-                model_path = CombinedTopKModelSaver.get_path_by_config(self.output_dir, config, self.timestamp)
-
-                if not os.path.exists(model_path):
-                    with open(model_path, 'wb') as f:
-                        pkl.dump([op_list, clf, score], f)
-                else:
-                    with open(model_path, 'rb') as f:
-                        _, _, perf = pkl.load(f)
-                    if score > perf:
-                        with open(model_path, 'wb') as f:
-                            pkl.dump([op_list, clf, score], f)
-
+                if self.incumbent_score is None or score > self.incumbent_score:
+                    self.incumbent_score = score
+                val_pred = self.get_validation_prediction(clf, _x_val)
+                val_pred = None if val_pred is None else (self.holdout_index[test_size].astype(np.int32), val_pred)
+                model_path = save_model_blob(self.output_dir, self.timestamp, config, score, [op_list, clf, score],
+                                             val_pred=val_pred)
                 self.logger.info("Model saved to %s" % model_path)
 
         elif 'cv' in self.resampling_strategy:
@@ -202,48 +277,32 @@ class ClassificationEvaluator(_BaseEvaluator):
                     else:
                         folds = self.resampling_params['folds']
 
-                from sklearn.model_selection import StratifiedKFold
-                skfold = StratifiedKFold(n_splits=folds, random_state=self.seed, shuffle=False)
-                scores = list()
-
-                for train_index, test_index in skfold.split(self.data_node.data[0], self.data_node.data[1]):
-                    _x_train, _x_val = self.data_node.data[0][train_index], self.data_node.data[0][test_index]
-                    _y_train, _y_val = self.data_node.data[1][train_index], self.data_node.data[1][test_index]
-                    self.train_node.data = [_x_train, _y_train]
-                    self.val_node.data = [_x_val, _y_val]
-
-                    data_node, op_list = parse_config(self.train_node, config, record=True, if_imbal=self.if_imbal)
-                    _val_node = self.val_node.copy_()
-                    _val_node = construct_node(_val_node, op_list)
-
-                    _x_train, _y_train = data_node.data
-                    _x_val, _y_val = _val_node.data
-
-                    config_dict = config.copy()
-                    # Prepare training and initial params for classifier.
-                    init_params, fit_params = {}, {}
-                    if data_node.enable_balance == 1:
-                        init_params, fit_params = self.get_fit_params(_y_train, self.estimator_id)
-                        for key, val in init_params.items():
-                            config_dict[key] = val
-
-                    if data_node.data_balance == 1:
-                        fit_params['data_balance'] = True
-
-                    classifier_id, clf = get_estimator(config_dict, self.estimator_id)
-
-                    if self.onehot_encoder is None:
-                        self.onehot_encoder = OneHotEncoder(categories='auto')
-                        y = np.reshape(_y_train, (len(_y_train), 1))
-                        self.onehot_encoder.fit(y)
-
-                    _score = validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val,
-                                        random_state=self.seed,
-                                        onehot=self.onehot_encoder if isinstance(self.scorer,
-                                                                                 _ThresholdScorer) else None,
-                                        fit_params=fit_params)
-                    scores.append(_score)
-                score = np.mean(scores)
+                X, y = self.data_node.data
+                cv_splits = get_split_registry().get_cv_splits(y, folds=folds, stratify=True, random_state=self.seed)
+                fold_params = [(config, train_index, test_index, fold_idx, folds)
+                               for fold_idx, (train_index, test_index) in enumerate(cv_splits)]
+
+                if self.onehot_encoder is None:
+                    self.onehot_encoder = OneHotEncoder(categories='auto')
+                    _y_train = y[fold_params[0][1]]
+                    self.onehot_encoder.fit(np.reshape(_y_train, (len(_y_train), 1)))
+
+                fold_executor = self.get_fold_executor()
+                if fold_executor is None:
+                    results = [self.evaluate_fold(X, y, *params) for params in fold_params]
+                else:
+                    results = fold_executor.parallel_execute(self.get_fold_evaluator().evaluate_fold, X, y,
+                                                             fold_params)
+                classifier_id, _x_train = self.estimator_id, X
+                score = np.mean([_score for _score, _ in results])
+
+                # Save the out-of-fold predictions; the models are fitted on the whole data by refit.
+                if np.isfinite(score) and all(pred is not None for _, pred in results):
+                    oof_pred = np.zeros((len(y),) + results[0][1].shape[1:], dtype=np.float32)
+                    for (_, pred), (_, _, test_index, _, _) in zip(results, fold_params):
+                        oof_pred[test_index] = pred
+                    save_model_blob(self.output_dir, self.timestamp, config, score, None,
+                                    val_pred=(np.arange(len(y), dtype=np.int32), oof_pred))
 
         elif 'partial' in self.resampling_strategy:
             # Prepare data node.
@@ -255,25 +314,22 @@ class ClassificationEvaluator(_BaseEvaluator):
                 else:
                     test_size = self.resampling_params['test_size']
 
-                from sklearn.model_selection import StratifiedShuffleSplit
-                ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=self.seed)
-                for train_index, test_index in ss.split(self.data_node.data[0], self.data_node.data[1]):
-                    _x_train, _x_val = self.data_node.data[0][train_index], self.data_node.data[0][test_index]
-                    _y_train, _y_val = self.data_node.data[1][train_index], self.data_node.data[1][test_index]
+                _x_train, _x_val, _y_train, _y_val = self.get_holdout_data(test_size)
                 self.train_node.data = [_x_train, _y_train]
                 self.val_node.data = [_x_val, _y_val]
 
-                data_node, op_list = parse_config(self.train_node, config, record=True, if_imbal=self.if_imbal)
+                data_node, op_list = parse_config(self.train_node, config, record=True, if_imbal=self.if_imbal,
+                                                  cache=self.transformer_cache,
+                                                  data_key=self.get_split_key('holdout', test_size))
                 _val_node = self.val_node.copy_()
                 _val_node = construct_node(_val_node, op_list)
 
             _x_train, _y_train = data_node.data
 
             if downsample_ratio != 1:
-                down_ss = StratifiedShuffleSplit(n_splits=1, test_size=downsample_ratio,
-                                                 random_state=self.seed)
-                for _, _val_index in down_ss.split(_x_train, _y_train):
-                    _act_x_train, _act_y_train = _x_train[_val_index], _y_train[_val_index]
+                _, _val_index = get_split_registry().get_holdout_split(_y_train, test_size=downsample_ratio,
+                                                                       stratify=True, random_state=self.seed)
+                _act_x_train, _act_y_train = _x_train[_val_index], _y_train[_val_index]
             else:
                 _act_x_train, _act_y_train = _x_train, _y_train
                 _val_index = list(range(len(_x_train)))
@@ -287,10 +343,11 @@ class ClassificationEvaluator(_BaseEvaluator):
                 init_params, fit_params = self.get_fit_params(_y_train, self.estimator_id)
                 for key, val in init_params.items():
                     config_dict[key] = val
-            if 'sample_weight' in fit_params:
-                fit_params['sample_weight'] = fit_params['sample_weight'][_val_index]
             if data_node.data_balance == 1:
                 fit_params['data_balance'] = True
+            full_fit_params = fit_params.copy()
+            if 'sample_weight' in fit_params:
+                fit_params['sample_weight'] = fit_params['sample_weight'][_val_index]
 
             classifier_id, clf = get_estimator(config_dict, self.estimator_id)
 
@@ -298,25 +355,32 @@ class ClassificationEvaluator(_BaseEvaluator):
                 self.onehot_encoder = OneHotEncoder(categories='auto')
                 y = np.reshape(_y_train, (len(_y_train), 1))
                 self.onehot_encoder.fit(y)
-            score = validation(clf, self.scorer, _act_x_train, _act_y_train, _x_val, _y_val,
-                               random_state=self.seed,
-                               onehot=self.onehot_encoder if isinstance(self.scorer,
-                                                                        _ThresholdScorer) else None,
-                               fit_params=fit_params)
+            if self.continue_training and is_iterative_estimator(clf):
+                # Iterative learners spend the resource on iterations over the whole training split,
+                # and resume the estimator fitted on the lower rung.
+                rw_lock = kwargs.get('rw_lock', None)
+                checkpoint = self.checkpoints.load(config, rw_lock=rw_lock)
+                if checkpoint is not None and checkpoint[2] <= downsample_ratio:
+                    clf = checkpoint[1]
+                score = partial_validation(clf, self.scorer, _x_train, _y_train, _x_val, _y_val, downsample_ratio,
+                                           random_state=self.seed,
+                                           onehot=self.onehot_encoder if isinstance(self.scorer,
+                                                                                    _ThresholdScorer) else None,
+                                           fit_params=full_fit_params)
+                if np.isfinite(score) and downsample_ratio != 1:
+                    self.checkpoints.save(config, op_list, clf, downsample_ratio, rw_lock=rw_lock)
+            else:
+                score = validation(clf, self.scorer, _act_x_train, _act_y_train, _x_val, _y_val,
+                                   random_state=self.seed,
+                                   onehot=self.onehot_encoder if isinstance(self.scorer,
+                                                                            _ThresholdScorer) else None,
+                                   fit_params=fit_params)
 
             if np.isfinite(score) and downsample_ratio == 1:
-                model_path = CombinedTopKModelSaver.get_path_by_config(self.output_dir, config, self.timestamp)
-
-                if not os.path.exists(model_path):
-                    with open(model_path, 'wb') as f:
-                        pkl.dump([op_list, clf, score], f)
-                else:
-                    with open(model_path, 'rb') as f:
-                        _, _, perf = pkl.load(f)
-                    if score > perf:
-                        with open(model_path, 'wb') as f:
-                            pkl.dump([op_list, clf, score], f)
-
+                val_pred = self.get_validation_prediction(clf, _x_val)
+                val_pred = None if val_pred is None else (self.holdout_index[test_size].astype(np.int32), val_pred)
+                model_path = save_model_blob(self.output_dir, self.timestamp, config, score, [op_list, clf, score],
+                                             val_pred=val_pred)
                 self.logger.info("Model saved to %s" % model_path)
 
         else:
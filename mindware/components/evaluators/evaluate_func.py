@@ -112,3 +112,73 @@ def validation(estimator, scorer, X_train, y_train, X_val, y_val, fit_params=Non
         if onehot is not None:
             y_val = get_onehot_y(onehot, y_val)
         return scorer(estimator, X_val, y_val)
+
+
+def partial_validation(estimator, scorer, X_train, y_train, X_val, y_val, resource_ratio, fit_params=None,
+                       onehot=None, random_state=1):
+    """
+        Fit an iterative estimator up to resource_ratio of its iterations (trees or boosting rounds) and score it.
+        If the estimator is already partially fitted, only the extra iterations are trained.
+    """
+    with warnings.catch_warnings():
+        # ignore all caught warnings
+        warnings.filterwarnings("ignore")
+        _fit_params = dict()
+        if fit_params:
+            if 'sample_weight' in fit_params:
+                _fit_params['sample_weight'] = fit_params['sample_weight']
+            elif 'data_balance' in fit_params:
+                X_train, y_train = smote(X_train, y_train)
+        n_iter = max(1, int(np.ceil(int(estimator.n_estimators) * resource_ratio)))
+        fitted = estimator.estimator is not None
+        current_iter = estimator.estimator.n_estimators if fitted else 0
+        if n_iter > current_iter:
+            estimator.iterative_fit(X_train, y_train, n_iter=n_iter - current_iter, refit=not fitted, **_fit_params)
+        if onehot is not None:
+            y_val = get_onehot_y(onehot, y_val)
+        return scorer(estimator, X_val, y_val)
+
+
+def extrapolate_learning_curve(iters, scores, max_iter):
+    """
+        An optimistic estimate of the final score: the last three points of the curve are extended linearly
+        in log(iterations), which overestimates the usual saturating curves.
+    """
+    x, y = np.log(iters[-3:]), np.asarray(scores[-3:])
+    slope = max(np.polyfit(x, y, 1)[0], 0.)
+    return np.max(scores) + slope * (np.log(max_iter) - x[-1])
+
+
+def learning_curve_validation(estimator, scorer, X_train, y_train, X_val, y_val, incumbent_score=None, margin=0.,
+                              fit_params=None, onehot=None, random_state=1):
+    """
+        Fit an iterative estimator in chunks of doubling size, and score it on the validation data after each chunk.
+        The fit stops once the extrapolated curve cannot come within margin of incumbent_score.
+    :return: (the score after the last chunk, whether the fit is stopped early)
+    """
+    with warnings.catch_warnings():
+        # ignore all caught warnings
+        warnings.filterwarnings("ignore")
+        _fit_params = dict()
+        if fit_params:
+            if 'sample_weight' in fit_params:
+                _fit_params['sample_weight'] = fit_params['sample_weight']
+            elif 'data_balance' in fit_params:
+                X_train, y_train = smote(X_train, y_train)
+        if onehot is not None:
+            y_val = get_onehot_y(onehot, y_val)
+
+        max_iter = int(estimator.n_estimators)
+        iters, scores = list(), list()
+        n_iter, refit = 2, True
+        while True:
+            estimator.iterative_fit(X_train, y_train, n_iter=n_iter, refit=refit, **_fit_params)
+            refit = False
+            iters.append(estimator.estimator.n_estimators)
+            scores.append(scorer(estimator, X_val, y_val))
+            if estimator.configuration_fully_fitted():
+                return scores[-1], False
+            if incumbent_score is not None and len(scores) >= 3 and np.all(np.isfinite(scores[-3:])):
+                if extrapolate_learning_curve(iters, scores, max_iter) + margin < incumbent_score:
+                    return scores[-1], True
+            n_iter = iters[-1]
@@ -9,7 +9,7 @@ from ConfigSpace.hyperparameters import UniformFloatHyperparameter, \
 
 from mindware.components.models.base_model import BaseClassificationModel, IterativeComponentWithSampleWeight
 from mindware.components.utils.configspace_utils import check_none
-from mindware.components.utils.constants import DENSE, UNSIGNED_DATA, PREDICTIONS
+from mindware.components.utils.constants import DENSE, SPARSE, UNSIGNED_DATA, PREDICTIONS
 
 
 class GradientBoostingClassifier(IterativeComponentWithSampleWeight,
@@ -117,7 +117,7 @@ class GradientBoostingClassifier(IterativeComponentWithSampleWeight,
                 'handles_multiclass': True,
                 'handles_multilabel': False,
                 'is_deterministic': True,
-                'input': (DENSE, UNSIGNED_DATA),
+                'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
     @staticmethod
@@ -6,7 +6,7 @@ import numpy as np
 
 from mindware.components.models.base_model import BaseClassificationModel
 from mindware.components.utils.constants import DENSE, UNSIGNED_DATA, PREDICTIONS
-from mindware.components.utils.model_util import softmax
+from mindware.components.utils.model_util import softmax, densify
 from mindware.components.utils.configspace_utils import check_none
 
 
@@ -53,19 +53,19 @@ class LDA(BaseClassificationModel):
         else:
             self.estimator = estimator
 
-        self.estimator.fit(X, Y)
+        self.estimator.fit(densify(X), Y)
         return self
 
     def predict(self, X):
         if self.estimator is None:
             raise NotImplementedError()
-        return self.estimator.predict(X)
+        return self.estimator.predict(densify(X))
 
     def predict_proba(self, X):
         if self.estimator is None:
             raise NotImplementedError()
 
-        df = self.estimator.predict_proba(X)
+        df = self.estimator.predict_proba(densify(X))
         return softmax(df)
 
     @staticmethod
@@ -4,7 +4,7 @@ import numpy as np
 
 from mindware.components.models.base_model import BaseClassificationModel
 from mindware.components.utils.constants import DENSE, UNSIGNED_DATA, PREDICTIONS
-from mindware.components.utils.model_util import softmax
+from mindware.components.utils.model_util import softmax, densify
 
 
 class QDA(BaseClassificationModel):
@@ -29,7 +29,7 @@ class QDA(BaseClassificationModel):
         else:
             self.estimator = estimator
 
-        self.estimator.fit(X, Y)
+        self.estimator.fit(densify(X), Y)
 
         if len(Y.shape) == 2 and Y.shape[1] > 1:
             problems = []
@@ -49,13 +49,13 @@ class QDA(BaseClassificationModel):
     def predict(self, X):
         if self.estimator is None:
             raise NotImplementedError()
-        return self.estimator.predict(X)
+        return self.estimator.predict(densify(X))
 
     def predict_proba(self, X):
         if self.estimator is None:
             raise NotImplementedError()
 
-        df = self.estimator.predict_proba(X)
+        df = self.estimator.predict_proba(densify(X))
         return softmax(df)
 
     @staticmethod
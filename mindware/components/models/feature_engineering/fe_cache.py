@@ -0,0 +1,144 @@
+import os
+import weakref
+import hashlib
+import threading
+import pickle as pkl
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from scipy import sparse
+
+from mindware.components.feature_engineering.transformation_graph import DataNode
+
+# The caches in this process, whose locks are reset in forked children.
+_caches = weakref.WeakSet()
+
+
+def _update_hash(sha, array):
+    if array is None:
+        sha.update(b'none')
+        return
+    if isinstance(array, pd.DataFrame):
+        array = array.values
+    if sparse.issparse(array):
+        array = array.tocsr()
+        for part in (array.data, array.indices, array.indptr):
+            _update_hash(sha, part)
+        sha.update(str(array.shape).encode('utf8'))
+        return
+    array = np.asarray(array)
+    sha.update(('%s%s' % (array.dtype, array.shape)).encode('utf8'))
+    if array.dtype == object:
+        sha.update(pkl.dumps(array.tolist()))
+    else:
+        sha.update(np.ascontiguousarray(array).view(np.uint8))
+
+
+def get_data_fingerprint(data_node: DataNode):
+    """
+        Compute a content hash of the data node (X, y and feature types).
+        The hash of (X, y) is computed once per data node and kept along with it until its data is reassigned.
+    :param data_node:
+    :return: hex digest.
+    """
+    digest = getattr(data_node, '_fingerprint', None)
+    if digest is None:
+        sha = hashlib.sha1()
+        _update_hash(sha, data_node.data[0])
+        _update_hash(sha, data_node.data[1])
+        digest = sha.hexdigest()
+        data_node._fingerprint = digest
+    sha = hashlib.sha1(digest.encode('utf8'))
+    sha.update(','.join(data_node.feature_types).encode('utf8'))
+    return sha.hexdigest()
+
+
+def get_node_nbytes(data_node: DataNode):
+    nbytes = 0
+    for array in data_node.data[:2]:
+        if array is None:
+            continue
+        if isinstance(array, pd.DataFrame):
+            array = array.values
+        if sparse.issparse(array):
+            array = array.tocsr()
+            nbytes += array.data.nbytes + array.indices.nbytes + array.indptr.nbytes
+        else:
+            nbytes += np.asarray(array).nbytes
+    return nbytes
+
+
+class TransformerCache(object):
+    """
+        A thread-safe LRU cache for fitted transformers.
+
+        Each entry is keyed by (data fingerprint, the FE sub-configs of all stages up to the current one),
+        and stores the fitted transformer of that stage together with its output data node.
+        Since the key of a stage is a prefix of the key of its successors, pipelines that share
+        their leading stages reuse them even if the later stages differ.
+        The cache is bounded by the total size of the cached data nodes.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.cur_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def __getstate__(self):
+        # Cached entries are process-local; a pickled cache starts empty.
+        state = self.__dict__.copy()
+        state['_entries'] = OrderedDict()
+        state['cur_bytes'] = 0
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            tran, node, _ = self._entries[key]
+            return tran, node
+
+    def put(self, key, tran, node: DataNode):
+        nbytes = get_node_nbytes(node)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (tran, node, nbytes)
+            self.cur_bytes += nbytes
+            while self.cur_bytes > self.max_bytes:
+                _, (_, _, _nbytes) = self._entries.popitem(last=False)
+                self.cur_bytes -= _nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.cur_bytes = 0
+
+
+def _reset_cache_locks():
+    # A child forked while another thread holds the lock (e.g., concurrent arm pulls) would block forever.
+    for cache in list(_caches):
+        cache._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_cache_locks)
@@ -5,12 +5,15 @@ from mindware.components.feature_engineering.transformation_graph import DataNod
 from mindware.components.feature_engineering.task_space import stage_list, thirdparty_candidates_dict
 
 
-def parse_config(data_node: DataNode, config: dict, record=False, skip_balance=False, if_imbal=False):
+def parse_config(data_node: DataNode, config: dict, record=False, skip_balance=False, if_imbal=False,
+                 cache=None, data_key=None):
     """
         Transform the data node based on the pipeline specified by configuration.
     :param data_node:
     :param config:
     :param record:
+    :param cache: a TransformerCache; fitted stages are reused when the same data and stage prefix is seen.
+    :param data_key: the fingerprint of data_node, required if cache is given.
     :return: the resulting data node.
     """
     _preprocessor_candidates = get_combined_fe_candidtates(_preprocessor, _gen_addons)
@@ -32,17 +35,30 @@ def parse_config(data_node: DataNode, config: dict, record=False, skip_balance=F
     if text_pre_id:
         config_dict.pop('text_preprocessor')
 
+    if cache is not None and data_key is None:
+        raise ValueError('data_key is required when the transformer cache is enabled!')
+    cache_key = (data_key, skip_balance, if_imbal)
+
     def tran_operate(id, tran_set, config, node):
+        nonlocal cache_key
         _config = {}
         for key in config:
             if id in key:
                 config_name = key.split(':')[1]
                 _config[config_name] = config[key]
+        if cache is not None:
+            cache_key = cache_key + ((id, tuple(sorted(_config.items()))),)
+            item = cache.get(cache_key)
+            if item is not None:
+                tran, output_node = item
+                return output_node, tran
         tran = tran_set[id](**_config)
         output_node = tran.operate(node)
+        if cache is not None:
+            cache.put(cache_key, tran, output_node)
         return output_node, tran
 
-    _node = data_node.copy_()
+    _node = data_node.copy_() if cache is None else data_node
     tran_dict = dict()
 
     # Image preprocessor
@@ -80,6 +96,9 @@ def parse_config(data_node: DataNode, config: dict, record=False, skip_balance=F
 
         tran_dict[stage] = tran
 
+    if cache is not None:
+        # Never hand out the nodes held by the cache.
+        _node = _node.copy_()
     _node.config = config
     if record:
         return _node, tran_dict
@@ -98,3 +117,21 @@ def construct_node(data_node: DataNode, tran_dict, mode='test'):
             continue
         data_node = tran_dict[stage].operate(data_node)
     return data_node
+
+
+def compile_node(tran_dict, mode='test'):
+    """
+        Freeze the fitted pipeline into the ordered list of transformers applied by construct_node.
+        The balancers only mark the data for the estimators during training, and are dropped in the test mode.
+    :return: a list of transformers, each mapping a data node to the next one.
+    """
+    trans = list()
+    for stage in ['image_preprocessor', 'text_preprocessor']:
+        if stage in tran_dict:
+            trans.append(tran_dict[stage])
+
+    for stage in stage_list:
+        if stage == 'balancer' and mode == 'test':
+            continue
+        trans.append(tran_dict[stage])
+    return trans
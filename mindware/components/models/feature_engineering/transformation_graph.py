@@ -1,8 +1,49 @@
 import numpy as np
+from scipy import sparse
 from mindware.components.utils.constants import CATEGORICAL
 
 
+def share_array(array):
+    """
+        Return a read-only alias of the array that shares its memory, or a copy for other payload types.
+    """
+    if array is None:
+        return None
+    if isinstance(array, np.ndarray):
+        alias = array.view()
+        alias.flags.writeable = False
+        return alias
+    if sparse.isspmatrix_csr(array) or sparse.isspmatrix_csc(array):
+        # The index arrays are shared read-only as well, so that no part of the payload is written through the alias.
+        alias = array.__class__((share_array(array.data), share_array(array.indices), share_array(array.indptr)),
+                                shape=array.shape, copy=False)
+        alias.has_sorted_indices = array.has_sorted_indices
+        return alias
+    return array.copy()
+
+
+def stack_blocks(blocks, dtype=None):
+    if len(blocks) == 1:
+        X = blocks[0]
+    elif any(sparse.issparse(block) for block in blocks):
+        X = sparse.hstack(blocks, format='csr')
+    else:
+        X = np.hstack(blocks)
+    if dtype is not None and X.dtype != dtype:
+        X = X.astype(dtype)
+    return X
+
+
 class DataNode(object):
+    """
+        The data payload (X, y) with its feature types.
+
+        Copies are copy-on-write: copy_ gives the new node read-only aliases of the arrays of X and y, and leaves
+        the arrays of the source node as they are, so a transformer that modifies a copy in place must copy it first.
+        X may also be held as a list of column blocks (see from_blocks), which is concatenated on the first access
+        of data.
+    """
+
     def __init__(self, data=None, feature_type=None, task_type=None, feature_names=None):
         self.task_type = task_type
         self.data = data
@@ -16,6 +57,46 @@ class DataNode(object):
         self.data_balance = 0
         self.config = None
 
+    @classmethod
+    def from_blocks(cls, blocks, y, feature_type, task_type=None, dtype=None):
+        """
+        :param blocks: a list of column blocks (dense or sparse) with the same number of rows.
+        :param dtype: the dtype of X once the blocks are concatenated.
+        """
+        node = cls(None, feature_type, task_type)
+        node._blocks, node._y, node._dtype = list(blocks), y, dtype
+        return node
+
+    @property
+    def data(self):
+        if self._blocks is not None:
+            self._data = [stack_blocks(self._blocks, self._dtype), self._y]
+            self._blocks, self._y = None, None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._blocks, self._y, self._dtype = None, None, None
+        # The content hash of (X, y), computed by fe_cache.get_data_fingerprint.
+        self._fingerprint = None
+        self._data = None if data is None else list(data)
+
+    def get_blocks(self):
+        """
+        :return: the column blocks of X, without concatenating them.
+        """
+        if self._blocks is not None:
+            return list(self._blocks)
+        return [self._data[0]]
+
+    def __setstate__(self, state):
+        # Nodes pickled before the copy-on-write storage keep the payload in "data".
+        if 'data' in state:
+            state['_data'] = state.pop('data')
+            state['_blocks'], state['_y'], state['_dtype'] = None, None, None
+        state.setdefault('_fingerprint', None)
+        self.__dict__.update(state)
+
     def __eq__(self, node):
         """Overrides the default implementation"""
         if isinstance(node, DataNode):
@@ -23,25 +104,49 @@ class DataNode(object):
                 return False
             X1 = self.data[0].astype("float64")
             X2 = node.data[0].astype("float64")
-            X_flag = np.isclose(X1, X2).all()
+            if sparse.issparse(X1) or sparse.issparse(X2):
+                # Compare the difference to avoid densifying the payloads.
+                diff = abs(sparse.csr_matrix(X1) - sparse.csr_matrix(X2))
+                X_flag = diff.nnz == 0 or np.isclose(diff.max(), 0)
+            else:
+                X_flag = np.isclose(X1, X2).all()
             y_flag = np.isclose(self.data[1], node.data[1]).all()
             if X_flag and y_flag:
                 return True
         return False
 
     def __add__(self, other):
-        X1, y1 = self.copy_().data
-        X2, y2 = other.copy_().data
+        X1, y1 = self.data
+        X2, y2 = other.data
         feat_types = self.feature_types.copy()
-        X = np.vstack((X1, X2))
+        if sparse.issparse(X1) or sparse.issparse(X2):
+            X = sparse.vstack((X1, X2), format='csr')
+        else:
+            X = np.vstack((X1, X2))
         y = np.vstack((y1, y2))
         return DataNode(data=[X, y], feature_type=feat_types)
 
+    def share_data(self):
+        """
+            Return a copy of the payload made of read-only aliases of the arrays of this node.
+            The arrays of this node are left unchanged.
+        """
+        if self._blocks is not None:
+            return [share_array(block) for block in self._blocks], share_array(self._y)
+        if self._data is None:
+            return None
+        return [share_array(val) for val in self._data]
+
     def copy_(self):
-        new_data = list([self.data[0].copy()])
-        new_data.append(None if self.data[1] is None else self.data[1].copy())
-        new_node = DataNode(new_data, self.feature_types.copy(), self.task_type,
+        new_node = DataNode(None, self.feature_types.copy(), self.task_type,
                             self.feature_names.copy() if self.feature_names is not None else None)
+        if self._blocks is not None:
+            blocks, y = self.share_data()
+            new_node._blocks, new_node._y, new_node._dtype = blocks, y, self._dtype
+        else:
+            new_node.data = self.share_data()
+        # The copy shares the payload, and thus its hash.
+        new_node._fingerprint = self._fingerprint
         new_node.trans_hist = self.trans_hist.copy()
         new_node.depth = self.depth
         new_node.enable_balance = self.enable_balance
@@ -58,12 +163,16 @@ class DataNode(object):
         :param node: the data node is copied.
         :return: None.
         """
-        self.data = []
-        for val in node.data[:2]:
-            self.data.append(val.copy() if val is not None else None)
+        self.data = node.copy_().data[:2]
         self.feature_types = node.feature_types.copy()
         self.task_type = node.task_type
 
+    @property
+    def is_sparse(self):
+        if self._blocks is not None:
+            return any(sparse.issparse(block) for block in self._blocks)
+        return sparse.issparse(self.data[0])
+
     @property
     def node_id(self):
         return self._node_id
@@ -77,8 +186,12 @@ class DataNode(object):
 
     @property
     def shape(self):
-        assert self.data[0].shape[1] == len(self.feature_types)
-        return self.data[0].shape
+        if self._blocks is not None:
+            shape = (self._blocks[0].shape[0], sum(block.shape[1] for block in self._blocks))
+        else:
+            shape = self.data[0].shape
+        assert shape[1] == len(self.feature_types)
+        return shape
 
     def __str__(self):
         from tabulate import tabulate
@@ -98,6 +211,8 @@ class DataNode(object):
             tabular_data.append(['feature names', names_summary])
         tabular_data.append(['feature types', types_summary])
         tabular_data.append(['data shape', '%d, %d' % self.shape])
+        if self.is_sparse:
+            tabular_data.append(['data format', '%s, %d non-zeros' % (self.data[0].format, self.data[0].nnz)])
         tabular_data.append(['#Cat-feature', self.cat_num])
         tabular_data.append(['#NonCat-feature', self.shape[1] - self.cat_num])
         return tabulate(tabular_data, tablefmt="github")
@@ -1,10 +1,11 @@
 import abc
 import typing
 import pandas as pd
+from scipy import sparse
 
 from mindware.components.utils.utils import *
 from mindware.components.utils.constants import *
-from mindware.components.feature_engineering.transformation_graph import DataNode
+from mindware.components.feature_engineering.transformation_graph import DataNode, share_array
 
 
 class Transformer(object, metaclass=abc.ABCMeta):
@@ -51,6 +52,9 @@ class Transformer(object, metaclass=abc.ABCMeta):
         44: robust_scaler
     """
     type = -1
+    # Whether the output depends on the target fields only, so that a sparse input
+    # can be densified on these columns alone.
+    column_wise = False
 
     def __init__(self, name, random_state=1):
         self.name = name
@@ -121,10 +125,97 @@ class Transformer(object, metaclass=abc.ABCMeta):
                 'handles_multiclass': True,
                 'handles_multilabel': True,
                 'is_deterministic': True,
-                'input': (DENSE, SPARSE, UNSIGNED_DATA),
+                'input': (DENSE, UNSIGNED_DATA),
                 'output': (INPUT,)}
 
 
+def accepts_sparse(trans):
+    return SPARSE in trans.get_properties()['input']
+
+
+def densify_node(input_node: DataNode, fields=None):
+    """
+        Return a copy of the data node with a dense payload, for the transformers without sparse support.
+    :param fields: if given, only these columns are kept (and densified).
+    """
+    X, y = input_node.data
+    if fields is None:
+        if not sparse.issparse(X):
+            return input_node
+        X, feature_types, feature_names = X.toarray(), input_node.feature_types, input_node.feature_names
+    else:
+        X = X[:, fields]
+        if sparse.issparse(X):
+            X = X.toarray()
+        feature_types = [input_node.feature_types[idx] for idx in fields]
+        feature_names = None
+        if input_node.feature_names is not None:
+            feature_names = [input_node.feature_names[idx] for idx in fields]
+    output_node = DataNode((X, y), feature_types, input_node.task_type, feature_names)
+    output_node.trans_hist = input_node.trans_hist
+    output_node.enable_balance = input_node.enable_balance
+    output_node.data_balance = input_node.data_balance
+    return output_node
+
+
+def hstack_columns(X1, X2):
+    """
+        Concatenate two column blocks; the result is CSR if either block is sparse.
+    """
+    if sparse.issparse(X1) or sparse.issparse(X2):
+        return sparse.hstack((X1, X2), format='csr')
+    return np.hstack((X1, X2))
+
+
+def delete_columns(X, fields):
+    if sparse.issparse(X):
+        keep_fields = np.setdiff1d(np.arange(X.shape[1]), fields)
+        return X.tocsc()[:, keep_fields].tocsr()
+    return np.delete(X, np.s_[fields], axis=1)
+
+
+def get_column_runs(n_columns, fields):
+    """
+        Split the columns into maximal runs of consecutive columns that are all in fields or all not.
+    :return: a list of (start, end, in_fields).
+    """
+    mask = np.zeros(n_columns, dtype=bool)
+    mask[fields] = True
+    bounds = np.flatnonzero(np.diff(mask)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [n_columns]))
+    return [(int(start), int(end), bool(mask[start])) for start, end in zip(starts, ends) if end > start]
+
+
+def take_columns(X, columns):
+    # A basic slice keeps a view of dense blocks.
+    columns = list(columns)
+    if len(columns) > 0 and columns == list(range(columns[0], columns[0] + len(columns))):
+        return X[:, columns[0]:columns[0] + len(columns)]
+    return X[:, columns]
+
+
+def get_output_blocks(X, fields, _X, compound_mode):
+    """
+        Build the column blocks of the output of ease_trans; the columns of X are shared, not copied.
+    """
+    X = share_array(X)
+    if compound_mode == 'concatenate':
+        return [X, _X]
+    runs = get_column_runs(X.shape[1], fields)
+    if compound_mode == 'replace':
+        return [X[:, start:end] for start, end, in_fields in runs if not in_fields] + [_X]
+    # in_place: the i-th column in fields is replaced by the i-th column of _X.
+    position = dict(zip(fields, range(len(fields))))
+    blocks = list()
+    for start, end, in_fields in runs:
+        if in_fields:
+            blocks.append(take_columns(_X, [position[idx] for idx in range(start, end)]))
+        else:
+            blocks.append(X[:, start:end])
+    return blocks
+
+
 def ease_trans(func):
     def dec(*args, **kwargs):
         param_name = 'target_fields'
@@ -149,34 +240,37 @@ def ease_trans(func):
         if isinstance(X, pd.DataFrame):
             X = X.values
 
-        args = (trans, input, target_fields)
+        if sparse.issparse(X) and not accepts_sparse(trans):
+            if trans.column_wise:
+                # Densify the target columns only; the output blocks are still built from the sparse X.
+                args = (trans, densify_node(input, target_fields), list(range(len(target_fields))))
+            else:
+                args = (trans, densify_node(input), target_fields)
+        else:
+            args = (trans, input, target_fields)
         _X = func(*args)
         if isinstance(trans.output_type, list):
             trans.output_type = trans.output_type[0]
         _types = [trans.output_type] * _X.shape[1]
 
         if trans.compound_mode == 'only_new':
-            new_X = _X
-            new_types = _types
-        elif trans.compound_mode == 'concatenate':
-            new_X = np.hstack((X, _X))
-            new_types = input.feature_types.copy()
-            new_types.extend(_types)
-        elif trans.compound_mode == 'replace':
-            new_X = np.hstack((X, _X))
-            new_types = input.feature_types.copy()
-            new_types.extend(_types)
-            new_X = np.delete(new_X, target_fields, axis=1)
-            temp_array = np.array(new_types)
-            new_types = list(np.delete(temp_array, target_fields))
+            output_datanode = DataNode((_X, y), _types, input.task_type)
         else:
-            assert _X.shape[1] == len(target_fields)
-            new_X = X.copy()
-            new_X = new_X.astype(float)
-            new_X[:, target_fields] = _X
-            new_types = input.feature_types.copy()
-
-        output_datanode = DataNode((new_X, y), new_types, input.task_type)
+            if trans.compound_mode == 'concatenate':
+                new_types = input.feature_types.copy()
+                new_types.extend(_types)
+            elif trans.compound_mode == 'replace':
+                new_types = input.feature_types.copy()
+                new_types.extend(_types)
+                temp_array = np.array(new_types)
+                new_types = list(np.delete(temp_array, target_fields))
+            else:
+                assert _X.shape[1] == len(target_fields)
+                new_types = input.feature_types.copy()
+            # Swap or append the column blocks instead of stacking the full matrix.
+            blocks = get_output_blocks(X, target_fields, _X, trans.compound_mode)
+            dtype = float if trans.compound_mode == 'in_place' else None
+            output_datanode = DataNode.from_blocks(blocks, y, new_types, input.task_type, dtype=dtype)
         output_datanode.trans_hist = input.trans_hist.copy()
         output_datanode.trans_hist.append(trans.type)
         output_datanode.enable_balance = input.enable_balance
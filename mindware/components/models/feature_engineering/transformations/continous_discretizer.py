@@ -5,6 +5,7 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 
 class KBinsDiscretizer(Transformer):
     type = 24
+    column_wise = True
 
     def __init__(self, n_bins=3, strategy='uniform'):
         super().__init__("discretizer")
@@ -14,3 +14,9 @@ class EmptyTransformer(Transformer):
     def operate(self, input_datanode, target_fields=None):
         X, _ = input_datanode.data
         return np.zeros((X.shape[0], 0))
+
+    @staticmethod
+    def get_properties(dataset_properties=None):
+        properties = Transformer.get_properties(dataset_properties)
+        properties['input'] = (DENSE, SPARSE, UNSIGNED_DATA)
+        return properties
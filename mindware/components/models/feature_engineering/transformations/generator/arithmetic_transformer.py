@@ -7,6 +7,7 @@ from mindware.components.utils.operations import *
 
 class ArithmeticTransformation(Transformer):
     type = 21
+    column_wise = True
 
     def __init__(self, func='sqrt'):
         super().__init__("arithmetic_transformer")
@@ -18,9 +19,8 @@ class ArithmeticTransformation(Transformer):
     @ease_trans
     def operate(self, input_datanode, target_fields):
         X, y = input_datanode.data
-        X_new = X[:, target_fields]
-
-        X_new = np.array(X_new.tolist())
+        # No copy when X is already a float array; the operators work on their own copies.
+        X_new = np.asarray(X[:, target_fields], dtype=float)
         if not self.model:
             self.get_model(self.func)
             self.model.fit(X_new)
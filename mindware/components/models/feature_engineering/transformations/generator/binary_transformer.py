@@ -6,6 +6,7 @@ from mindware.components.utils.operations import *
 
 class BinaryTransformation(Transformer):
     type = 22
+    column_wise = True
 
     def __init__(self, func='add'):
         super().__init__("binary_transformer")
@@ -5,6 +5,7 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 
 class CrossFeatureTransformation(Transformer):
     type = 32
+    column_wise = True
 
     def __init__(self, random_state=1):
         super().__init__("cross_features")
@@ -72,6 +72,12 @@ class RandomTreesEmbeddingTransformation(Transformer):
 
         return _X
 
+    @staticmethod
+    def get_properties(dataset_properties=None):
+        properties = Transformer.get_properties(dataset_properties)
+        properties['input'] = (DENSE, SPARSE, UNSIGNED_DATA)
+        return properties
+
     @staticmethod
     def get_hyperparameter_search_space(dataset_properties=None, optimizer='smac'):
         n_estimators = UniformIntegerHyperparameter(name="n_estimators",
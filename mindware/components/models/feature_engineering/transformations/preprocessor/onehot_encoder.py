@@ -4,9 +4,14 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 class OneHotTransformation(Transformer):
     type = 2
 
-    def __init__(self):
+    def __init__(self, sparse_threshold=0.):
+        """
+        :param sparse_threshold: the output is kept in CSR format if its density is below the threshold,
+            or if the input is sparse; the default 0 gives a dense output for a dense input.
+        """
         super().__init__("onehot_encoder")
         self.input_type = CATEGORICAL
+        self.sparse_threshold = sparse_threshold
 
     def operate(self, input_datanode: DataNode, target_fields=None):
         import pandas as pd
@@ -22,16 +27,23 @@ class OneHotTransformation(Transformer):
         if isinstance(X, pd.DataFrame):
             X = X.values
         X_input = X[:, target_fields]
+        if sparse.issparse(X_input):
+            X_input = X_input.toarray()
 
         if self.model is None:
             self.model = OneHotEncoder(handle_unknown='ignore')
             self.model.fit(X_input)
-        new_X = self.model.transform(X_input).toarray()
-        X_output = X.copy()
+        new_X = self.model.transform(X_input)
 
         # Delete the original columns.
-        X_output = np.delete(X_output, np.s_[target_fields], axis=1)
-        X_output = np.hstack((X_output, new_X))
+        X_output = delete_columns(X, target_fields)
+        n_rows, n_cols = X_output.shape[0], X_output.shape[1] + new_X.shape[1]
+        # The remaining columns are counted as dense.
+        density = (X_output.shape[1] * n_rows + new_X.nnz) / max(n_rows * n_cols, 1)
+        if sparse.issparse(X) or density < self.sparse_threshold:
+            X_output = hstack_columns(sparse.csr_matrix(X_output, dtype=float), new_X)
+        else:
+            X_output = np.hstack((X_output, new_X.toarray()))
         feature_types = input_datanode.feature_types.copy()
         feature_types = list(np.delete(feature_types, target_fields))
         feature_types.extend([CATEGORICAL] * new_X.shape[1])
@@ -40,3 +52,9 @@ class OneHotTransformation(Transformer):
         output_datanode.trans_hist.append(self.type)
 
         return output_datanode
+
+    @staticmethod
+    def get_properties(dataset_properties=None):
+        properties = Transformer.get_properties(dataset_properties)
+        properties['input'] = (DENSE, SPARSE, UNSIGNED_DATA)
+        return properties
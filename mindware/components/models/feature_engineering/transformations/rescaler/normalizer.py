@@ -25,3 +25,9 @@ class NormalizeTransformation(Transformer):
         _X = self.model.transform(X_new)
 
         return _X
+
+    @staticmethod
+    def get_properties(dataset_properties=None):
+        properties = Transformer.get_properties(dataset_properties)
+        properties['input'] = (DENSE, SPARSE, UNSIGNED_DATA)
+        return properties
@@ -6,6 +6,7 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 
 class QuantileTransformation(Transformer):
     type = 5
+    column_wise = True
 
     def __init__(self, n_quantiles=1000, output_distribution='uniform', random_state=1):
         super().__init__("quantile_transformer")
@@ -5,6 +5,7 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 
 class RobustScaler(Transformer):
     type = 44
+    column_wise = True
 
     def __init__(self, q_min=0.25, q_max=0.75, **kwargs):
         super().__init__("robust_scaler")
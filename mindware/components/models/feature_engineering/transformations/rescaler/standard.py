@@ -3,6 +3,7 @@ from mindware.components.feature_engineering.transformations.base_transformer im
 
 class StandardScaler(Transformer):
     type = 43
+    column_wise = True
 
     def __init__(self, **kwargs):
         super().__init__("standard_scaler")
@@ -41,7 +41,10 @@ class GenericUnivariateSelector(Transformer):
         # Because the pipeline guarantees that each feature is positive,
         # clip all values below zero to zero
         if self.score_func == 'chi2':
-            X_new[X_new < 0] = 0.0
+            if sparse.issparse(X_new):
+                X_new.data[X_new.data < 0] = 0.0
+            else:
+                X_new[X_new < 0] = 0.0
 
         if self.model is None:
             self.model = GenericUnivariateSelect(
@@ -55,7 +58,7 @@ class GenericUnivariateSelector(Transformer):
         selected_types = [feature_types[idx] for idx in target_fields if is_selected[idx]]
         selected_types.extend(irrevalent_types)
 
-        new_X = np.hstack((_X, X[:, irrevalent_fields]))
+        new_X = hstack_columns(_X, X[:, irrevalent_fields])
         new_feature_types = selected_types
         output_datanode = DataNode((new_X, y), new_feature_types, input_datanode.task_type)
         output_datanode.trans_hist = input_datanode.trans_hist.copy()
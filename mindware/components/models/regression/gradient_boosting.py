@@ -8,7 +8,7 @@ from ConfigSpace.hyperparameters import UniformFloatHyperparameter, \
 
 from mindware.components.models.base_model import BaseRegressionModel, IterativeComponentWithSampleWeight
 from mindware.components.utils.configspace_utils import check_none
-from mindware.components.utils.constants import DENSE, UNSIGNED_DATA, PREDICTIONS
+from mindware.components.utils.constants import DENSE, SPARSE, UNSIGNED_DATA, PREDICTIONS
 
 
 class GradientBoostingRegressor(IterativeComponentWithSampleWeight, BaseRegressionModel):
@@ -113,7 +113,7 @@ class GradientBoostingRegressor(IterativeComponentWithSampleWeight, BaseRegressi
                 'handles_multiclass': False,
                 'handles_multilabel': False,
                 'is_deterministic': True,
-                'input': (DENSE, UNSIGNED_DATA),
+                'input': (DENSE, SPARSE, UNSIGNED_DATA),
                 'output': (PREDICTIONS,)}
 
     @staticmethod
@@ -1,5 +1,16 @@
+import math
+import hashlib
+import threading
 from typing import List
 from ConfigSpace import Configuration, ConfigurationSpace
+from ConfigSpace.conditions import AndConjunction, OrConjunction
+from ConfigSpace.hyperparameters import Constant, CategoricalHyperparameter, OrdinalHyperparameter, \
+    UniformIntegerHyperparameter, UniformFloatHyperparameter
+
+# Cardinalities and branches of the configuration spaces, keyed by the digest of their description.
+_cardinality_cache = dict()
+_branch_cache = dict()
+_cardinality_lock = threading.Lock()
 
 
 def sample_configurations(configuration_space: ConfigurationSpace,
@@ -53,3 +64,204 @@ def check_for_bool(p):
         return True
     else:
         raise ValueError("%s is not a bool" % str(p))
+
+
+def get_hyperparameter_cardinality(hp):
+    if isinstance(hp, Constant):
+        return 1
+    if isinstance(hp, CategoricalHyperparameter):
+        return len(hp.choices)
+    if isinstance(hp, OrdinalHyperparameter):
+        return len(hp.sequence)
+    if isinstance(hp, UniformIntegerHyperparameter):
+        q = hp.q if hp.q is not None else 1
+        return (hp.upper - hp.lower) // q + 1
+    if isinstance(hp, UniformFloatHyperparameter) and hp.q is not None:
+        return int(round((hp.upper - hp.lower) / hp.q)) + 1
+    # Continuous (or unknown) hyperparameters.
+    return math.inf
+
+
+def _get_values(hp):
+    if isinstance(hp, Constant):
+        return [hp.value]
+    if isinstance(hp, CategoricalHyperparameter):
+        return list(hp.choices)
+    if isinstance(hp, OrdinalHyperparameter):
+        return list(hp.sequence)
+    if isinstance(hp, UniformIntegerHyperparameter):
+        q = hp.q if hp.q is not None else 1
+        return list(range(hp.lower, hp.upper + 1, q))
+    return None
+
+
+def _is_active(condition, assignment):
+    if isinstance(condition, AndConjunction):
+        return all(_is_active(component, assignment) for component in condition.components)
+    if isinstance(condition, OrConjunction):
+        return any(_is_active(component, assignment) for component in condition.components)
+    parent = condition.parent.name
+    if parent not in assignment:
+        return False
+    return condition.evaluate({parent: assignment[parent]})
+
+
+def _count_configurations(hps, conditions, parents, idx, assignment):
+    # Enumerate the values of the active parents only; the other hyperparameters contribute a factor.
+    count = 1
+    for i in range(idx, len(hps)):
+        hp = hps[i]
+        if hp.name in conditions and not _is_active(conditions[hp.name], assignment):
+            continue
+        if hp.name not in parents:
+            count *= get_hyperparameter_cardinality(hp)
+            continue
+        values = _get_values(hp)
+        if values is None:
+            return math.inf
+        total = 0
+        for value in values:
+            assignment[hp.name] = value
+            total += _count_configurations(hps, conditions, parents, i + 1, assignment)
+        del assignment[hp.name]
+        return count * total
+    return count
+
+
+def _group_hyperparameters(config_space: ConfigurationSpace):
+    """
+        Group the hyperparameters that are connected by conditions.
+    :return: the groups (lists of hyperparameters in the order of the space), the condition of each child,
+        and the names of the parents.
+    """
+    hps = config_space.get_hyperparameters()
+    conditions = {condition.get_children()[0].name: condition for condition in config_space.get_conditions()}
+    parents = set()
+    for condition in conditions.values():
+        parents.update(parent.name for parent in condition.get_parents())
+
+    component = dict()
+
+    def find(name):
+        while component.setdefault(name, name) != name:
+            name = component[name]
+        return name
+
+    for child, condition in conditions.items():
+        for parent in condition.get_parents():
+            component[find(child)] = find(parent.name)
+    groups = dict()
+    for hp in hps:
+        groups.setdefault(find(hp.name), list()).append(hp)
+    return list(groups.values()), conditions, parents
+
+
+def get_config_space_cardinality(config_space: ConfigurationSpace):
+    """
+        Count the configurations in a configuration space from the types of the hyperparameters and the conditions.
+        Forbidden clauses are ignored, so the count is an upper bound if there are any.
+        The result is cached per space.
+    :return: the number of configurations, or math.inf if there are continuous hyperparameters.
+    """
+    key = hashlib.sha1(repr(config_space).encode('utf8')).hexdigest()
+    with _cardinality_lock:
+        if key in _cardinality_cache:
+            return _cardinality_cache[key]
+
+    # The hyperparameters that are not connected by conditions are counted independently.
+    groups, conditions, parents = _group_hyperparameters(config_space)
+    cardinality = 1
+    for group in groups:
+        cardinality *= _count_configurations(group, conditions, parents, 0, dict())
+    with _cardinality_lock:
+        _cardinality_cache[key] = cardinality
+    return cardinality
+
+
+def _get_probabilities(hp, values):
+    probabilities = getattr(hp, 'probabilities', None)
+    if probabilities is not None:
+        return list(probabilities)
+    return [1. / len(values)] * len(values)
+
+
+def _get_branches(hps, conditions, parents, idx, assignment):
+    # Enumerate the values of the active parents, as in _count_configurations.
+    # Each branch is (the probability that a sample falls in it, the number of configurations in it).
+    count = 1
+    for i in range(idx, len(hps)):
+        hp = hps[i]
+        if hp.name in conditions and not _is_active(conditions[hp.name], assignment):
+            continue
+        if hp.name not in parents:
+            count *= get_hyperparameter_cardinality(hp)
+            continue
+        values = _get_values(hp)
+        if values is None:
+            return None
+        branches = list()
+        for value, probability in zip(values, _get_probabilities(hp, values)):
+            assignment[hp.name] = value
+            sub_branches = _get_branches(hps, conditions, parents, i + 1, assignment)
+            if sub_branches is None:
+                del assignment[hp.name]
+                return None
+            branches.extend((probability * p, count * c) for p, c in sub_branches)
+        del assignment[hp.name]
+        return branches
+    return [(1., count)]
+
+
+def get_config_space_branches(config_space: ConfigurationSpace, max_branches=100000):
+    """
+        Split a configuration space into the branches of its conditions, i.e., the assignments of the active
+        parent hyperparameters. ConfigSpace samples each active hyperparameter on its own, so a sample falls in a
+        branch with the product of the probabilities of its parent values, and is uniform over the branch.
+        The result is cached per space.
+    :return: a list of (probability, number of configurations), or None if the branches cannot be enumerated
+        (continuous parents, or more than max_branches).
+    """
+    key = hashlib.sha1(repr(config_space).encode('utf8')).hexdigest()
+    with _cardinality_lock:
+        if key in _branch_cache:
+            return _branch_cache[key]
+
+    # The hyperparameters that are not connected by conditions are sampled independently.
+    groups, conditions, parents = _group_hyperparameters(config_space)
+    branches = [(1., 1)]
+    for group in groups:
+        group_branches = _get_branches(group, conditions, parents, 0, dict())
+        if group_branches is None or len(branches) * len(group_branches) > max_branches:
+            branches = None
+            break
+        branches = [(p1 * p2, c1 * c2) for p1, c1 in branches for p2, c2 in group_branches]
+    with _cardinality_lock:
+        _branch_cache[key] = branches
+    return branches
+
+
+def estimate_config_num(config_space: ConfigurationSpace, sample_size: int):
+    """
+        The expected number of distinct configurations among sample_size samples of the configuration space.
+
+        A branch of the conditions with probability p and C configurations contributes
+        C * (1 - (1 - p/C)^n), or n * p if C is infinite. Small conditional sub-spaces are thus exhausted
+        earlier than the uniform estimate C * (1 - (1 - 1/C)^n) over the whole space predicts, which is used
+        when the branches cannot be enumerated. Integer hyperparameters on a log scale and forbidden clauses
+        are treated as uniform and ignored, respectively.
+    """
+    branches = get_config_space_branches(config_space)
+    if branches is None:
+        branches = [(1., get_config_space_cardinality(config_space))]
+    config_num = 0.
+    for probability, cardinality in branches:
+        if probability <= 0:
+            continue
+        if cardinality == math.inf:
+            config_num += sample_size * probability
+        elif probability >= cardinality:
+            # A single configuration that every sample takes.
+            config_num += cardinality
+        else:
+            config_num += cardinality * -math.expm1(sample_size * math.log1p(-probability / cardinality))
+    return config_num
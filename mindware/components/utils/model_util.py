@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import sparse
 
 
 def softmax(df):
@@ -37,4 +38,11 @@ def convert_multioutput_multiclass_to_multilabel(probas):
             else:
                 multioutput_probas[:, i] = 0
         probas = multioutput_probas
-    return probas
\ No newline at end of file
+    return probas
+
+
+def densify(X):
+    # For the models that do not declare SPARSE in their input properties.
+    if sparse.issparse(X):
+        return X.toarray()
+    return X
@@ -1,6 +1,15 @@
 import numpy as np
 
+
+def _to_float(array, dtype):
+    # Always a fresh copy, so that the ufuncs below can work in place without touching the input.
+    return np.array(array, dtype=dtype)
+
+
 class Arithmetic:
+    # The results are computed in place on a single float64 buffer.
+    dtype = np.float64
+
     def fit(self, array):
         return
 
@@ -11,66 +20,97 @@ class Arithmetic:
 # Abstract log
 class Log(Arithmetic):
     def transform(self, array):
-        return np.log(np.abs(array) + 1e-8)
+        result = _to_float(array, self.dtype)
+        np.abs(result, out=result)
+        result += 1e-8
+        return np.log(result, out=result)
 
 
 # Abstract sqrt
 class Sqrt(Arithmetic):
     def transform(self, array):
-        return np.sqrt(np.abs(array))
+        result = _to_float(array, self.dtype)
+        np.abs(result, out=result)
+        return np.sqrt(result, out=result)
 
 
 class Square(Arithmetic):
     def transform(self, array):
-        return np.square(array)
+        result = _to_float(array, self.dtype)
+        return np.square(result, out=result)
 
 
 class Freq(Arithmetic):
     def __init__(self):
+        # The sorted distinct values of each column and their frequencies.
         self.hashmap = []
         self.length = None
         self.col_num = None
 
     def fit(self, array):
-        from collections import Counter
+        array = np.asarray(array)
         self.col_num = array.shape[1]
         self.length = array.shape[0]
-        counters = []
+        self.hashmap = []
         for i in range(self.col_num):
-            counters.append(Counter(array[:, i]))
-        for ct in counters:
-            self.hashmap.append({x: ct[x] / self.length for x in ct})
+            values, counts = np.unique(array[:, i], return_counts=True)
+            self.hashmap.append((values, counts / self.length))
 
     def transform(self, array):
-        result = []
+        array = np.asarray(array)
         col_num = array.shape[1]
         assert (self.col_num == col_num)
+        # Unseen values (and NaNs, which never match) get the frequency of a single occurrence.
+        result = np.full(array.shape, 1 / self.length, dtype=self.dtype)
         for i in range(col_num):
-            col_result = []
-            for x in array[:, i]:
-                if x in self.hashmap[i]:
-                    col_result.append(self.hashmap[i][x])
-                else:
-                    col_result.append(1 / self.length)
-            result.append(col_result)
-        return np.array(result).transpose()
+            values, freqs = self.hashmap[i]
+            if len(values) == 0:
+                continue
+            column = array[:, i]
+            idx = np.searchsorted(values, column)
+            np.minimum(idx, len(values) - 1, out=idx)
+            found = values[idx] == column
+            result[found, i] = freqs[idx[found]]
+        return result
+
+    def __setstate__(self, state):
+        # Models pickled before the vectorized lookup keep a dict per column.
+        hashmap = list()
+        for mapping in state.get('hashmap', []):
+            if isinstance(mapping, dict):
+                values = np.array(sorted(mapping))
+                mapping = (values, np.array([mapping[x] for x in values.tolist()], dtype=float))
+            hashmap.append(mapping)
+        state['hashmap'] = hashmap
+        self.__dict__.update(state)
 
 
 class Round(Arithmetic):
     def transform(self, array):
-        return np.around(array)
+        result = _to_float(array, self.dtype)
+        return np.rint(result, out=result)
 
 
 class Tanh(Arithmetic):
     def transform(self, array):
-        return np.tanh(array)
+        result = _to_float(array, self.dtype)
+        return np.tanh(result, out=result)
 
 
 class Sigmoid(Arithmetic):
     def transform(self, array):
-        return 1 / (1 + np.exp(-np.array(array)))
+        result = _to_float(array, self.dtype)
+        np.negative(result, out=result)
+        # exp overflows to inf for large negative inputs, which still gives a sigmoid of 0.
+        with np.errstate(over='ignore'):
+            np.exp(result, out=result)
+        result += 1
+        return np.reciprocal(result, out=result)
+
 
 class BinaryArithmetic:
+    dtype = np.float64
+
     def fit(self, array1, array2):
         return
 
@@ -80,20 +120,23 @@ class BinaryArithmetic:
 
 class Addition(BinaryArithmetic):
     def transform(self, array1, array2):
-        return array1 + array2
+        result = _to_float(array1, self.dtype)
+        return np.add(result, array2, out=result)
 
 
 class Subtract(BinaryArithmetic):
     def transform(self, array1, array2):
-        return array1 - array2
+        result = _to_float(array1, self.dtype)
+        return np.subtract(result, array2, out=result)
 
 
 class Multiply(BinaryArithmetic):
     def transform(self, array1, array2):
-        return array1 * array2
+        result = _to_float(array1, self.dtype)
+        return np.multiply(result, array2, out=result)
 
 
 class Division(BinaryArithmetic):
     def transform(self, array1, array2):
-        return array1 / array2
-
+        result = _to_float(array1, self.dtype)
+        return np.divide(result, array2, out=result)
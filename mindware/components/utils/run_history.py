@@ -0,0 +1,130 @@
+import os
+import time
+import sqlite3
+import threading
+import pickle as pkl
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    fixed_id TEXT NOT NULL,
+    config_id TEXT NOT NULL,
+    algorithm TEXT,
+    config BLOB NOT NULL,
+    perf REAL,
+    status INTEGER NOT NULL,
+    created REAL NOT NULL,
+    pid INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_config_id ON runs (config_id);
+CREATE INDEX IF NOT EXISTS runs_algorithm ON runs (algorithm);
+CREATE INDEX IF NOT EXISTS runs_scope ON runs (name, fixed_id);
+"""
+
+
+class RunHistoryDB(object):
+    """
+        An append-only run history of the optimizers, stored in SQLite.
+
+        Each process and thread opens its own connection, so that the optimizers of several arms, blocks
+        or workers can append to the same database. The database is in WAL mode: readers do not block
+        the writer, and a committed run survives a crash of the process that wrote it.
+    """
+
+    def __init__(self, db_path, timeout=60):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def __getstate__(self):
+        # Connections cannot be pickled; a copy in another process opens its own.
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited from the parent process must not be used after fork.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=%d' % int(self.timeout * 1000))
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, records):
+        """
+        :param records: a list of (name, fixed_id, config_id, algorithm, config, perf, status);
+                        config is a dict, and perf is the larger, the better (None for failed runs).
+        """
+        created, pid = time.time(), os.getpid()
+        rows = [(name, fixed_id, config_id, algorithm, pkl.dumps(config), perf, status, created, pid)
+                for name, fixed_id, config_id, algorithm, config, perf, status in records]
+        if len(rows) == 0:
+            return
+        with self._connect() as conn:
+            conn.executemany('INSERT INTO runs (name, fixed_id, config_id, algorithm, config, perf, status, '
+                             'created, pid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def get_runs(self, name=None, fixed_id=None, config_id=None, algorithm=None):
+        """
+        :return: a list of (config_id, algorithm, config, perf, status, created), in the order of insertion.
+        """
+        conditions, params = list(), list()
+        for column, value in [('name', name), ('fixed_id', fixed_id), ('config_id', config_id),
+                              ('algorithm', algorithm)]:
+            if value is not None:
+                conditions.append('%s = ?' % column)
+                params.append(value)
+        query = 'SELECT config_id, algorithm, config, perf, status, created FROM runs'
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id'
+        rows = self._connect().execute(query, params).fetchall()
+        return [(config_id, algorithm, pkl.loads(config), perf, status, created)
+                for config_id, algorithm, config, perf, status, created in rows]
+
+    def count(self):
+        return self._connect().execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+
+_run_history_dbs = dict()
+_run_history_dbs_lock = threading.Lock()
+
+
+def get_run_history_db(model_dir, identifier):
+    """
+        Get the run history of a run; the optimizers with the same output_dir and timestamp share it.
+    """
+    db_path = os.path.join(model_dir, '%s_run_history.db' % identifier)
+    with _run_history_dbs_lock:
+        db = _run_history_dbs.get(db_path)
+        if db is None:
+            db = RunHistoryDB(db_path)
+            _run_history_dbs[db_path] = db
+        return db
+
+
+def _reset_run_history_dbs_lock():
+    # The lock may be held by another thread at fork time.
+    global _run_history_dbs_lock
+    _run_history_dbs_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_run_history_dbs_lock)
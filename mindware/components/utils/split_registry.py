@@ -0,0 +1,103 @@
+import os
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from sklearn.model_selection import StratifiedShuffleSplit, ShuffleSplit, StratifiedKFold, KFold
+
+
+class SplitRegistry(object):
+    """
+        Compute each train/validation split once and share the index arrays.
+
+        Splits only depend on the labels (for stratification), the number of samples and the resampling
+        parameters, so they are keyed by a hash of y plus those parameters. Evaluators, ensembles and
+        distributed workers that ask for the same split receive the same (read-only) index arrays.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._splits = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_label_key(y):
+        y = np.asarray(y)
+        sha = hashlib.sha1(('%s%s' % (y.dtype, y.shape)).encode('utf8'))
+        if y.dtype == object:
+            sha.update(str(y.tolist()).encode('utf8'))
+        else:
+            sha.update(np.ascontiguousarray(y).view(np.uint8))
+        return sha.hexdigest()
+
+    def _fetch(self, key, split_func):
+        with self._lock:
+            if key in self._splits:
+                self._splits.move_to_end(key)
+                return self._splits[key]
+        splits = list()
+        for train_index, val_index in split_func():
+            train_index.flags.writeable = False
+            val_index.flags.writeable = False
+            splits.append((train_index, val_index))
+        with self._lock:
+            self._splits[key] = splits
+            while len(self._splits) > self.max_entries:
+                self._splits.popitem(last=False)
+        return splits
+
+    def get_holdout_split(self, y, test_size=0.33, stratify=True, random_state=1):
+        """
+        :return: (train_index, val_index)
+        """
+        key = ('holdout', self.get_label_key(y), test_size, stratify, random_state)
+        if stratify:
+            ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+        else:
+            ss = ShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+        return self._fetch(key, lambda: ss.split(np.zeros(len(y)), y))[0]
+
+    def get_cv_splits(self, y, folds=5, stratify=True, shuffle=False, random_state=1):
+        """
+        :return: a list of (train_index, val_index), one for each fold.
+        """
+        key = ('cv', self.get_label_key(y), folds, stratify, shuffle, random_state)
+        # random_state only takes effect when shuffling.
+        _random_state = random_state if shuffle else None
+        if stratify:
+            kfold = StratifiedKFold(n_splits=folds, random_state=_random_state, shuffle=shuffle)
+        else:
+            kfold = KFold(n_splits=folds, random_state=_random_state, shuffle=shuffle)
+        return self._fetch(key, lambda: kfold.split(np.zeros(len(y)), y))
+
+    def clear(self):
+        with self._lock:
+            self._splits.clear()
+
+
+def gather_split(X, y, train_index, val_index):
+    """
+        Gather the train and validation parts with a single copy of the data.
+        X_train and X_val are views into one permuted array, equal to X[train_index] and X[val_index].
+    :return: X_train, X_val, y_train, y_val
+    """
+    n_train = len(train_index)
+    index = np.concatenate([train_index, val_index])
+    X_perm, y_perm = X[index], y[index]
+    return X_perm[:n_train], X_perm[n_train:], y_perm[:n_train], y_perm[n_train:]
+
+
+split_registry = SplitRegistry()
+
+
+def _reset_registry_lock():
+    # The lock may be held by another thread at fork time.
+    split_registry._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_registry_lock)
+
+
+def get_split_registry():
+    return split_registry
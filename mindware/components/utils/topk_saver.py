@@ -1,6 +1,15 @@
 import os
-import pickle as pkl
+import heapq
+import atexit
 import hashlib
+import threading
+import numpy as np
+import pickle as pkl
+from collections import OrderedDict
+
+# The top-k stores in this process, indexed by the path of their index file.
+_topk_stores = dict()
+_topk_stores_lock = threading.Lock()
 
 
 def load_combined_transformer_estimator(model_dir, config, timestamp):
@@ -10,13 +19,315 @@ def load_combined_transformer_estimator(model_dir, config, timestamp):
     return op_list, model
 
 
+def _atomic_dump(obj, path):
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, 'wb') as f:
+        pkl.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save_prediction(val_pred, path):
+    val_index, pred = val_pred
+    tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, index=val_index, pred=pred)
+    os.replace(tmp_path, path)
+
+
+def get_prediction_path(model_path):
+    return '%s_pred.npz' % os.path.splitext(model_path)[0]
+
+
+def load_validation_prediction(model_path):
+    """
+        Load the validation predictions saved along with a top-k model.
+    :return: (val_index, pred) or None if the predictions are not available.
+    """
+    pred_path = get_prediction_path(model_path)
+    if not os.path.exists(pred_path):
+        return None
+    with np.load(pred_path) as f:
+        return f['index'], f['pred']
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+class TopKModelStore(object):
+    """
+        The top-k models of a run, kept in memory and shared by all the savers in this process.
+
+        For each estimator, the members are indexed by configuration id, with a min-heap on performance
+        to find the member to evict. Model blobs are staged in memory by the evaluators and only written
+        to disk when their configuration enters the top-k. The sidecar index file ('<identifier>_topk_config.pkl')
+        is flushed by a background thread and replaced atomically.
+    """
+
+    def __init__(self, k, index_path, max_pending=None):
+        self.k = k
+        self.index_path = index_path
+        self.max_pending = max_pending if max_pending is not None else k
+        self.pid = os.getpid()
+        self.has_saver = False
+
+        # estimator_id -> {config_id: [perf, seq, config, model_path]}
+        self.members = dict()
+        # estimator_id -> [(perf, -seq, config_id)]
+        self.heaps = dict()
+        # model_path -> (perf, blob, val_pred)
+        self.pending = OrderedDict()
+        self.perf_by_path = dict()
+        self._seq = 0
+
+        self._lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._flusher = None
+        self._index_mtime = None
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as f:
+            sorted_dict = pkl.load(f)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._merge(sorted_dict)
+
+    def _merge(self, sorted_dict):
+        # Merge an index written by another process, e.g., a parallel optimizer with the same output directory.
+        for estimator_id, sorted_list in sorted_dict.items():
+            for config, perf, model_path in sorted_list:
+                config_id = CombinedTopKModelSaver.get_configuration_id(config)
+                members = self.members.get(estimator_id, dict())
+                if config_id in members and members[config_id][0] >= perf:
+                    continue
+                self._insert(estimator_id, config_id, config, perf, model_path)
+            self._trim(estimator_id, remove_files=False)
+
+    def _insert(self, estimator_id, config_id, config, perf, model_path):
+        self._seq += 1
+        self.members.setdefault(estimator_id, dict())[config_id] = [perf, self._seq, config, model_path]
+        heapq.heappush(self.heaps.setdefault(estimator_id, list()), (perf, -self._seq, config_id))
+        self.perf_by_path[model_path] = perf
+
+    def _pop_worst(self, estimator_id):
+        members, heap = self.members[estimator_id], self.heaps[estimator_id]
+        while heap:
+            perf, neg_seq, config_id = heapq.heappop(heap)
+            member = members.get(config_id)
+            # Skip the heap items that have been superseded.
+            if member is not None and member[1] == -neg_seq:
+                del members[config_id]
+                self.perf_by_path.pop(member[3], None)
+                return member
+        return None
+
+    def _trim(self, estimator_id, remove_files=True):
+        removed = list()
+        while len(self.members.get(estimator_id, dict())) > self.k:
+            member = self._pop_worst(estimator_id)
+            removed.append(member[3])
+            self.pending.pop(member[3], None)
+            if remove_files:
+                _remove_file(member[3])
+                _remove_file(get_prediction_path(member[3]))
+        return removed
+
+    def _write_pending(self, model_path):
+        item = self.pending.pop(model_path, None)
+        if item is None:
+            return
+        _, blob, val_pred = item
+        if blob is not None:
+            _atomic_dump(blob, model_path)
+        if val_pred is not None:
+            _atomic_save_prediction(val_pred, get_prediction_path(model_path))
+
+    def stage(self, model_path, perf, blob, val_pred=None):
+        """
+            Keep the model blob (and validation predictions) of an evaluated configuration
+            until the optimizer decides whether it enters the top-k.
+            perf: the larger, the better.
+        """
+        with self._lock:
+            if model_path in self.perf_by_path and self.perf_by_path[model_path] >= perf:
+                return
+            if model_path in self.pending and self.pending[model_path][0] >= perf:
+                return
+            self.pending[model_path] = (perf, blob, val_pred)
+            self.pending.move_to_end(model_path)
+            # Spill the oldest blobs to disk rather than losing them.
+            while len(self.pending) > self.max_pending:
+                _path = next(iter(self.pending))
+                self._write_pending(_path)
+
+    def add(self, config, perf, estimator_id, model_path):
+        with self._lock:
+            config_id = CombinedTopKModelSaver.get_configuration_id(config)
+            members = self.members.get(estimator_id, dict())
+
+            # Update existed configs
+            if config_id in members:
+                if perf > members[config_id][0]:
+                    self._insert(estimator_id, config_id, config, perf, model_path)
+                    self._write_pending(model_path)
+                else:
+                    self.pending.pop(model_path, None)
+                return True, model_path, False, None
+
+            self._insert(estimator_id, config_id, config, perf, model_path)
+            removed = self._trim(estimator_id)
+            save_flag = model_path not in removed
+            if save_flag:
+                self._write_pending(model_path)
+            removed = [path for path in removed if path != model_path]
+            delete_flag = len(removed) > 0
+            return save_flag, model_path, delete_flag, removed[0] if delete_flag else None
+
+    def get_sorted_dict(self):
+        with self._lock:
+            sorted_dict = dict()
+            for estimator_id, members in self.members.items():
+                # Sorted list is in a descending order; ties keep their insertion order.
+                sorted_members = sorted(members.values(), key=lambda x: (-x[0], x[1]))
+                sorted_dict[estimator_id] = [(config, perf, path) for perf, _, config, path in sorted_members]
+            return sorted_dict
+
+    def flush(self):
+        with self._lock:
+            self._dirty.clear()
+            if self._index_mtime is not None and os.path.exists(self.index_path) and \
+                    os.stat(self.index_path).st_mtime_ns != self._index_mtime:
+                with open(self.index_path, 'rb') as f:
+                    self._merge(pkl.load(f))
+            for model_path in list(self.pending.keys()):
+                if model_path in self.perf_by_path:
+                    self._write_pending(model_path)
+            _atomic_dump(self.get_sorted_dict(), self.index_path)
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def schedule_flush(self):
+        with self._lock:
+            self._dirty.set()
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            if self._dirty.wait(timeout=1.):
+                self.flush()
+                continue
+            with self._lock:
+                # Exit when idle; schedule_flush starts a new thread on demand.
+                if not self._dirty.is_set():
+                    self._flusher = None
+                    return
+
+
+def get_topk_store(model_dir, identifier, k=50, create=True):
+    index_path = os.path.join(model_dir, '%s_topk_config.pkl' % identifier)
+    with _topk_stores_lock:
+        store = _topk_stores.get(index_path)
+        # Stores inherited from a parent process are not shared with it.
+        if store is not None and store.pid != os.getpid():
+            store = None
+            del _topk_stores[index_path]
+        if store is None and create:
+            store = TopKModelStore(k, index_path)
+            _topk_stores[index_path] = store
+        return store
+
+
+def save_model_blob(model_dir, identifier, config, perf, blob, val_pred=None):
+    """
+        Called by the evaluators to save the model of an evaluated configuration.
+        The blob is staged in memory if a top-k saver lives in this process; otherwise, it is written to disk
+        and the saver in the other process deletes it if the configuration does not enter the top-k.
+    :param blob: [op_list, estimator, perf], or None if only the predictions are saved.
+    :param val_pred: (val_index, pred), the predictions on the validation samples of the training data.
+    :return: the model path.
+    """
+    model_path = CombinedTopKModelSaver.get_path_by_config(model_dir, config, identifier)
+    store = get_topk_store(model_dir, identifier, create=False)
+    if store is not None and store.has_saver:
+        store.stage(model_path, perf, blob, val_pred=val_pred)
+        return model_path
+
+    if blob is None:
+        if val_pred is not None:
+            _atomic_save_prediction(val_pred, get_prediction_path(model_path))
+        return model_path
+    if os.path.exists(model_path):
+        with open(model_path, 'rb') as f:
+            _, _, _perf = pkl.load(f)
+        if _perf is not None and perf <= _perf:
+            return model_path
+    _atomic_dump(blob, model_path)
+    if val_pred is not None:
+        _atomic_save_prediction(val_pred, get_prediction_path(model_path))
+    return model_path
+
+
+def load_topk_config(model_dir, identifier):
+    """
+        Load the top-k index of a run, flushing the in-memory store first if this process owns it.
+    """
+    store = get_topk_store(model_dir, identifier, create=False)
+    if store is not None:
+        store.flush()
+        return store.get_sorted_dict()
+    return BaseTopKModelSaver.get_topk_config(os.path.join(model_dir, '%s_topk_config.pkl' % identifier))
+
+
+def _reset_topk_stores_lock():
+    # The stores are not shared with forked children, but the lock may be held by another thread at fork time.
+    global _topk_stores_lock
+    _topk_stores_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_topk_stores_lock)
+
+
+@atexit.register
+def _flush_topk_stores():
+    for store in list(_topk_stores.values()):
+        if store.pid == os.getpid() and store._dirty.is_set():
+            try:
+                store.flush()
+            except Exception:
+                pass
+
+
 class BaseTopKModelSaver(object):
     def __init__(self, k, model_dir, identifier):
         self.k = k
         self.model_dir = model_dir
         self.identifier = identifier
         self.sorted_list_path = os.path.join(model_dir, '%s_topk_config.pkl' % identifier)
-        self.sorted_dict = None
+        self.store = get_topk_store(model_dir, identifier, k=k)
+        self.store.has_saver = True
+
+    def __getstate__(self):
+        # The store holds locks and threads; a copy in another process rebuilds it from the index file.
+        state = self.__dict__.copy()
+        del state['store']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.store = get_topk_store(self.model_dir, self.identifier, k=self.k)
+        self.store.has_saver = True
+
+    @property
+    def sorted_dict(self):
+        return self.store.get_sorted_dict()
 
     @staticmethod
     def get_topk_config(config_path):
@@ -27,8 +338,7 @@ class BaseTopKModelSaver(object):
         return content
 
     def save_topk_config(self):
-        with open(self.sorted_list_path, 'wb') as f:
-            pkl.dump(self.sorted_dict, f)
+        self.store.schedule_flush()
 
 
 class CombinedTopKModelSaver(BaseTopKModelSaver):
@@ -52,53 +362,20 @@ class CombinedTopKModelSaver(BaseTopKModelSaver):
     def add(self, config, perf, estimator_id):
         """
             perf: the larger, the better.
+            The model blob of config is written when it enters the top-k, and the blob of the evicted config
+            (if any) is deleted, so the callers do not need to manage the model files.
         :param estimator_id:
         :param config:
         :param perf:
-        :return:
+        :return: save_flag, model_path, delete_flag, model_path_removed
         """
         _config = config.copy()
         config = dict(sorted(_config.items(), key=lambda x: x[0]))
         model_path_id = self.get_path_by_config(self.model_dir, config, self.identifier)
-        model_path_removed = None
-        save_flag, delete_flag = False, False
-        self.sorted_dict = self.get_topk_config(self.sorted_list_path)
-        sorted_list = self.sorted_dict.get(estimator_id, list())
-
-        # Update existed configs
-        for sorted_element in sorted_list:
-            if config == sorted_element[0]:
-                if perf > sorted_element[1]:
-                    sorted_list.remove(sorted_element)
-                    for idx, item in enumerate(sorted_list):
-                        if perf > item[1]:
-                            sorted_list.insert(idx, (config, perf, model_path_id))
-                            break
-                        if idx == len(sorted_list) - 1:
-                            sorted_list.append((config, perf, model_path_id))
-                            break
-                    self.sorted_dict[estimator_id] = sorted_list
-                return True, model_path_id, False, model_path_removed
-
-        if len(sorted_list) == 0:
-            sorted_list.append((config, perf, model_path_id))
-        else:
-            # Sorted list is in a descending order.
-            for idx, item in enumerate(sorted_list):
-                if perf > item[1]:
-                    sorted_list.insert(idx, (config, perf, model_path_id))
-                    break
-                if idx == len(sorted_list) - 1:
-                    sorted_list.append((config, perf, model_path_id))
-                    break
-
-        if len(sorted_list) > self.k:
-            model_path_removed = sorted_list[-1][2]
-            delete_flag = True
-            sorted_list = sorted_list[:-1]
-        if model_path_id in [item[2] for item in sorted_list]:
-            save_flag = True
-
-        self.sorted_dict[estimator_id] = sorted_list
-
+        save_flag, model_path_id, delete_flag, model_path_removed = self.store.add(config, perf, estimator_id,
+                                                                                   model_path_id)
+        if not save_flag:
+            # The model may have been written by an evaluator in another process.
+            _remove_file(model_path_id)
+            _remove_file(get_prediction_path(model_path_id))
         return save_flag, model_path_id, delete_flag, model_path_removed
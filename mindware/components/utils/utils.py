@@ -3,6 +3,7 @@ import pkgutil
 import inspect
 import importlib
 import numpy as np
+import pandas as pd
 from collections import OrderedDict
 
 
@@ -87,37 +88,98 @@ def detect_categorical_type(values, threshold=0.001):
     return bool(unique_cnts/total_cnts < threshold)
 
 
-def detect_abnormal_type(column_values):
-    total_cnts = len(column_values)
-    numeric_cnts, str_cnts = 0, 0
-    str_idx, numeric_idx = list(), list()
-
-    for idx, val in enumerate(column_values):
-        try:
-            val = str(val)
-            if val == 'nan':
-                total_cnts -= 1
-                continue
-            if is_numeric(val):
-                numeric_cnts += 1
-                numeric_idx.append(idx)
-            else:
-                str_cnts += 1
-                str_idx.append(idx)
-        except TypeError as e:
-            print(e)
+def parse_numeric(column_values):
+    """
+        Parse the values of a column to floats in batch; each distinct value is parsed only once.
+    :return: (numbers, numeric_mask, missing_mask); the numbers are NaN where the value is not numeric.
+    """
+    if isinstance(column_values, pd.Categorical):
+        codes, uniques = column_values.codes, column_values.categories
+    else:
+        codes, uniques = pd.factorize(np.asarray(column_values, dtype=object))
+    missing = codes < 0
+    if len(uniques) == 0:
+        return np.full(len(codes), np.nan), np.zeros(len(codes), dtype=bool), missing
+    uniques = np.asarray(uniques, dtype=object)
+    try:
+        unique_numbers = uniques.astype(np.float64)
+    except (TypeError, ValueError):
+        unique_numbers = pd.to_numeric(pd.Series(uniques), errors='coerce').values.astype(np.float64)
+    # Booleans and the literal 'nan' are not numbers; the latter is missing.
+    unique_missing = np.asarray(uniques == 'nan', dtype=bool)
+    is_bool = np.array([isinstance(u, (bool, np.bool_)) for u in uniques], dtype=bool)
+    unique_numbers[is_bool | unique_missing] = np.nan
+    unique_numeric = ~np.isnan(unique_numbers)
+
+    numbers = np.where(missing, np.nan, unique_numbers[codes])
+    numeric = ~missing & unique_numeric[codes]
+    missing = missing | (unique_missing[codes] & ~missing)
+    return numbers, numeric, missing
+
+
+def detect_abnormal_type(column_values, parsed=None):
+    """
+        Detect whether a column mixes numbers with a few strings, or strings with a few numbers.
+    :param parsed: the result of parse_numeric(column_values), if available.
+    :return: (abnormal flag, candidate values, the indexes of the abnormal values, is string).
+    """
+    numbers, numeric, missing = parse_numeric(column_values) if parsed is None else parsed
+    total_cnts = len(column_values) - int(missing.sum())
+    numeric_cnts = int(numeric.sum())
+    str_cnts = total_cnts - numeric_cnts
+    numeric_idx = np.flatnonzero(numeric)
+    str_idx = np.flatnonzero(~numeric & ~missing)
 
     abnormal_flag = False
     is_str = True
     candidate_values, ab_idx = None, []
     ab_threshold = 0.05
-    if str_cnts == 1 or str_cnts / total_cnts <= ab_threshold:
+    if str_cnts == 1 or str_cnts <= ab_threshold * total_cnts:
         abnormal_flag = True
         candidate_values = column_values[numeric_idx]
         ab_idx = str_idx
         is_str = False
-    elif numeric_cnts == 1 or numeric_cnts / total_cnts <= ab_threshold:
+    elif numeric_cnts == 1 or numeric_cnts <= ab_threshold * total_cnts:
         abnormal_flag = True
         candidate_values = column_values[str_idx]
         ab_idx = numeric_idx
     return abnormal_flag, candidate_values, ab_idx, is_str
+
+
+def infer_feature_type(column_values, sample_size=10000, random_state=1):
+    """
+        Infer the feature type of a column.
+
+        Object columns are first checked on a random sample: if no sampled value is numeric, the column
+        is categorical; otherwise, the whole column is parsed to find the abnormal values.
+    :return: (feature type, the indexes of the abnormal values to set to NaN).
+    """
+    from mindware.components.utils.constants import CATEGORICAL, DISCRETE, NUMERICAL
+    if isinstance(column_values, pd.Categorical):
+        dtype = np.dtype(object)
+    else:
+        column_values = np.asarray(column_values)
+        dtype = column_values.dtype
+    if dtype.kind in 'iu':
+        return DISCRETE, []
+    if dtype.kind == 'f':
+        cleaned_vals = column_values[~np.isnan(column_values)]
+        return (DISCRETE if is_discrete(cleaned_vals) else NUMERICAL), []
+    if dtype.kind == 'b':
+        return CATEGORICAL, []
+
+    if sample_size is not None and len(column_values) > sample_size:
+        rng = np.random.RandomState(random_state)
+        sample_idx = rng.choice(len(column_values), sample_size, replace=False)
+        _, numeric, missing = parse_numeric(column_values[sample_idx])
+        if not numeric.any() and not missing.all():
+            return CATEGORICAL, []
+
+    numbers, numeric, missing = parse_numeric(column_values)
+    flag, _, ab_idx, is_str = detect_abnormal_type(column_values, parsed=(numbers, numeric, missing))
+    if not flag:
+        return CATEGORICAL, []
+    if is_str:
+        return CATEGORICAL, ab_idx
+    cleaned_vals = numbers[numeric]
+    return (DISCRETE if is_discrete(cleaned_vals) else NUMERICAL), ab_idx
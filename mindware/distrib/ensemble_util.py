@@ -5,6 +5,7 @@ from sklearn.preprocessing import OneHotEncoder
 from sklearn.metrics._scorer import _BaseScorer, _PredictScorer, _ThresholdScorer
 
 from mindware.components.utils.constants import *
+from mindware.components.ensemble.selection_engine import get_batch_score_func, ensemble_selection
 
 
 class EnsembleSelection:
@@ -85,42 +86,14 @@ class EnsembleSelection:
                 trajectory.append(ensemble_performance)
             ensemble_size -= n_best
 
-        for i in range(ensemble_size):
-            scores = np.zeros((len(predictions)))
-            s = len(ensemble)
-            if s == 0:
-                weighted_ensemble_prediction = np.zeros(predictions[0].shape)
-            else:
-                # Memory-efficient averaging!
-                ensemble_prediction = np.zeros(ensemble[0].shape)
-                for pred in ensemble:
-                    ensemble_prediction += pred
-                ensemble_prediction /= s
-
-                weighted_ensemble_prediction = (s / float(s + 1)) * \
-                                               ensemble_prediction
-            fant_ensemble_prediction = np.zeros(weighted_ensemble_prediction.shape)
-            for j, pred in enumerate(predictions):
-                # TODO: this could potentially be vectorized! - let's profile
-                # the script first!
-                if self.task_type in CLS_TASKS:
-                    fant_ensemble_prediction[:, :] = weighted_ensemble_prediction + \
-                                                     (1. / float(s + 1)) * pred
-                else:
-                    fant_ensemble_prediction[:] = weighted_ensemble_prediction + \
-                                                  (1. / float(s + 1)) * pred
-
-                scores[j] = -self.calculate_score(pred=fant_ensemble_prediction, y_true=labels)
-
-            all_best = np.argwhere(scores == np.nanmin(scores)).flatten()
-            best = self.random_state.choice(all_best)
-            ensemble.append(predictions[best])
-            trajectory.append(scores[best])
-            order.append(best)
-
-            # Handle special case
-            if len(predictions) == 1:
-                break
+        score_func = get_batch_score_func(self.metric, self.task_type, labels)
+        if score_func is None:
+            # Score the candidates one by one with the scorer.
+            score_func = lambda preds: np.array([self.calculate_score(pred=pred, y_true=labels) for pred in preds])
+        _order, _trajectory = ensemble_selection(predictions, ensemble_size, score_func, self.random_state,
+                                                 init_order=order)
+        order.extend(_order)
+        trajectory.extend(_trajectory)
 
         self.indices_ = order
         self.trajectory_ = trajectory
@@ -189,24 +162,32 @@ class EnsembleSelection:
         return indices
 
     def predict(self, predictions):
-        predictions = np.asarray(predictions)
-
-        # if predictions.shape[0] == len(self.weights_),
+        # if len(predictions) == len(self.weights_),
         # predictions include those of zero-weight models.
-        if predictions.shape[0] == len(self.weights_):
-            return np.average(predictions, axis=0, weights=self.weights_)
+        if len(predictions) == len(self.weights_):
+            weights = self.weights_
 
-        # if prediction model.shape[0] == len(non_null_weights),
+        # if len(predictions) == len(non_null_weights),
         # predictions do not include those of zero-weight models.
-        elif predictions.shape[0] == np.count_nonzero(self.weights_):
-            non_null_weights = [w for w in self.weights_ if w > 0]
-            return np.average(predictions, axis=0, weights=non_null_weights)
+        elif len(predictions) == np.count_nonzero(self.weights_):
+            weights = [w for w in self.weights_ if w > 0]
 
         # If none of the above applies, then something must have gone wrong.
         else:
             raise ValueError("The dimensions of ensemble predictions"
                              " and ensemble weights do not match!")
 
+        # Accumulate the weighted sum in place, skipping the zero-weight models.
+        ensemble_prediction = None
+        for weight, pred in zip(weights, predictions):
+            if weight == 0:
+                continue
+            if ensemble_prediction is None:
+                ensemble_prediction = weight * np.asarray(pred, dtype=np.float64)
+            else:
+                ensemble_prediction += weight * np.asarray(pred)
+        return ensemble_prediction / np.sum(weights)
+
     def __str__(self):
         return 'Ensemble Selection:\n\tTrajectory: %s\n\tMembers: %s' \
                '\n\tWeights: %s\n\tIdentifiers: %s' % \
@@ -1,12 +1,12 @@
 import time
 import numpy as np
-from sklearn.model_selection import StratifiedShuffleSplit, ShuffleSplit
 from openbox.core.message_queue.sender_messager import SenderMessager
 
 from mindware.distrib.distributed_bo import mqSMBO
 from mindware.distrib.ensemble_util import EnsembleSelection
 from mindware.base_estimator import BaseEstimator
 from mindware.components.utils.constants import CLS_TASKS
+from mindware.components.utils.split_registry import get_split_registry
 
 
 class Master(object):
@@ -78,15 +78,11 @@ class Master(object):
         else:
             test_size = self.evaluator.resampling_params['test_size']
 
-        if self.estimator.task_type in CLS_TASKS:
-            ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=self.evaluator.seed)
-        else:
-            ss = ShuffleSplit(n_splits=1, test_size=test_size, random_state=self.evaluator.seed)
-
-        node = self.evaluator.data_node.copy_()
-        for train_index, test_index in ss.split(node.data[0], node.data[1]):
-            _y_val = node.data[1][test_index]
-        self.ensemble.fit(all_preds, _y_val)
+        y = self.evaluator.data_node.data[1]
+        _, test_index = get_split_registry().get_holdout_split(y, test_size=test_size,
+                                                               stratify=self.estimator.task_type in CLS_TASKS,
+                                                               random_state=self.evaluator.seed)
+        self.ensemble.fit(all_preds, y[test_index])
 
     def run(self):
         self.optimizer.run()
@@ -3,7 +3,6 @@ import time
 import traceback
 import numpy as np
 import pickle as pkl
-from sklearn.model_selection import StratifiedShuffleSplit, ShuffleSplit
 
 from openbox.core.base import Observation
 from openbox.utils.util_funcs import get_result
@@ -14,7 +13,8 @@ from openbox.core.message_queue.receiver_messager import ReceiverMessager
 
 from mindware.utils.logging_utils import get_logger
 from mindware.components.utils.constants import CLS_TASKS
-from mindware.components.utils.topk_saver import CombinedTopKModelSaver
+from mindware.components.utils.topk_saver import CombinedTopKModelSaver, load_validation_prediction
+from mindware.components.utils.split_registry import get_split_registry
 from mindware.components.feature_engineering.parse import construct_node
 from mindware.distrib.utils import get_host_ip
 
@@ -135,6 +135,9 @@ class EvaluationWorker(BaseWorker):
             test_size = self.evaluator.resampling_params['test_size']
 
         preds = list()
+        _, test_index = get_split_registry().get_holdout_split(self.evaluator.data_node.data[1], test_size=test_size,
+                                                               stratify=self.estimator.task_type in CLS_TASKS,
+                                                               random_state=self.evaluator.seed)
 
         for config in self.best_configs:
             # Convert Configuration into dictionary
@@ -147,19 +150,19 @@ class EvaluationWorker(BaseWorker):
                                                                    config=config,
                                                                    identifier=self.evaluator.timestamp)
 
+            # Reuse the validation predictions saved by the evaluator.
+            cached_pred = load_validation_prediction(model_path)
+            if cached_pred is not None and np.array_equal(cached_pred[0], test_index):
+                preds.append(cached_pred[1])
+                continue
+
             with open(model_path, 'rb') as f:
                 op_list, model, _ = pkl.load(f)
 
             _node = self.evaluator.data_node.copy_()
             node = construct_node(_node, op_list)
 
-            if self.estimator.task_type in CLS_TASKS:
-                ss = StratifiedShuffleSplit(n_splits=1, test_size=test_size, random_state=self.evaluator.seed)
-            else:
-                ss = ShuffleSplit(n_splits=1, test_size=test_size, random_state=self.evaluator.seed)
-
-            for train_index, test_index in ss.split(node.data[0], node.data[1]):
-                _x_val = node.data[0][test_index]
+            _x_val = node.data[0][test_index]
 
             if self.estimator.task_type in CLS_TASKS:
                 pred = model.predict_proba(_x_val)
@@ -0,0 +1,75 @@
+import time
+import queue
+import numpy as np
+from collections import deque
+
+
+def run_asha_bracket(executor, T, r, R, eta, num_rungs, deadline=None):
+    """
+        Run a bracket of successive halving asynchronously (ASHA).
+
+        Instead of waiting for a whole rung, a configuration is promoted to the next rung as soon as it is
+        in the top 1/eta of the results collected so far in its rung, so that the workers do not sit idle
+        behind the slowest evaluation. When no more results can enter a rung with less than eta
+        configurations, its best one is promoted, as in the synchronous version.
+    :param executor: a ParallelProcessEvaluator.
+    :param T: the configurations of the bottom rung.
+    :param r: the resource of the bottom rung; rung k uses r * eta ** k.
+    :param deadline: no evaluation is started after the deadline.
+    :return: a list of (configs, val_losses) for each rung that has results, in the order of completion.
+    """
+    rungs = [(list(), list()) for _ in range(num_rungs)]
+    promoted = [set() for _ in range(num_rungs)]
+    running = [0] * num_rungs
+    pending = deque(T)
+    results = queue.Queue()
+
+    def is_closed(k):
+        # No more configurations can enter rung k.
+        if running[k] > 0:
+            return False
+        if k == 0:
+            return len(pending) == 0
+        return is_closed(k - 1) and len(promoted[k - 1]) >= get_quota(k - 1)
+
+    def get_quota(k):
+        n = len(rungs[k][0])
+        if n >= eta:
+            return n // eta
+        return 1 if n > 0 and is_closed(k) else 0
+
+    def get_job():
+        # Promotions first, from the top rung down.
+        for k in reversed(range(num_rungs - 1)):
+            configs, losses = rungs[k]
+            quota = get_quota(k)
+            if len(promoted[k]) >= quota:
+                continue
+            for idx in np.argsort(losses)[:quota]:
+                if idx not in promoted[k] and np.isfinite(losses[idx]):
+                    promoted[k].add(idx)
+                    return configs[idx], k + 1
+        if len(pending) > 0:
+            return pending.popleft(), 0
+        return None
+
+    def submit(config, k):
+        running[k] += 1
+        executor.submit(config, resource_ratio=float(r * eta ** k / R), eta=eta, first_iter=(k == 0),
+                        callback=lambda res: results.put((config, k, res[0])),
+                        error_callback=lambda e: results.put((config, k, np.inf)))
+
+    while True:
+        while sum(running) < executor.n_worker and (deadline is None or time.time() < deadline):
+            job = get_job()
+            if job is None:
+                break
+            submit(*job)
+        if sum(running) == 0:
+            break
+        config, k, val_loss = results.get()
+        running[k] -= 1
+        rungs[k][0].append(config)
+        rungs[k][1].append(val_loss)
+
+    return [rung for rung in rungs if len(rung[0]) > 0]
@@ -10,13 +10,14 @@ from mindware.components.optimizers.base.funcs import get_types, std_normalizati
 from mindware.components.optimizers.base.config_space_utils import sample_configurations
 from mindware.components.optimizers.base.config_space_utils import convert_configurations_to_array
 from mindware.components.computation.parallel_process import ParallelProcessEvaluator
+from mindware.components.optimizers.base.asha import run_asha_bracket
 from mindware.utils.logging_utils import get_logger
 from mindware.components.optimizers.base.prob_rf import RandomForestWithInstances
 
 
 class BohbBase(object):
     def __init__(self, eval_func, config_space, config_generator='tpe',
-                 seed=1, R=27, eta=3, n_jobs=1):
+                 seed=1, R=27, eta=3, n_jobs=1, scheduler='sh'):
         self.eval_func = eval_func
         self.config_space = config_space
         self.config_generator = config_generator
@@ -71,6 +72,11 @@ class BohbBase(object):
 
         self.eval_dict = dict()
 
+        # 'sh': synchronous successive halving; 'asha': promote as soon as a rung has enough results.
+        if scheduler not in ['sh', 'asha']:
+            raise ValueError('Invalid scheduler: %s!' % scheduler)
+        self.scheduler = scheduler
+
     def _iterate(self, s, budget=MAX_INT, skip_last=0):
         # Set initial number of configurations
         n = int(ceil(self.B / self.R / (s + 1) * self.eta ** s))
@@ -83,9 +89,16 @@ class BohbBase(object):
         time_elapsed = time.time() - start_time
         self.logger.info("Choosing next batch of configurations took %.2f sec." % time_elapsed)
 
+        use_asha = self.scheduler == 'asha' and self.n_workers > 1
         with ParallelProcessEvaluator(self.eval_func, n_worker=self.n_workers) as executor:
+            if use_asha:
+                rung_results = run_asha_bracket(executor, T, r, self.R, self.eta, (s + 1) - int(skip_last),
+                                                deadline=start_time + budget)
             for i in range((s + 1) - int(skip_last)):  # changed from s + 1
-                if time.time() >= budget + start_time:
+                if use_asha:
+                    if i >= len(rung_results):
+                        break
+                elif time.time() >= budget + start_time:
                     break
 
                 # Run each of the n configs for <iterations>
@@ -97,9 +110,12 @@ class BohbBase(object):
                 self.logger.info("BOHB: %d configurations x size %d / %d each" %
                                  (int(n_configs), n_resource, self.R))
 
-                val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
-                                                       eta=self.eta,
-                                                       first_iter=(i == 0))
+                if use_asha:
+                    T, val_losses = rung_results[i]
+                else:
+                    val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
+                                                           eta=self.eta,
+                                                           first_iter=(i == 0))
                 for _id, _val_loss in enumerate(val_losses):
                     if np.isfinite(_val_loss):
                         self.target_x[int(n_resource)].append(T[_id])
@@ -6,11 +6,12 @@ from mindware.utils.constant import MAX_INT
 from mindware.utils.logging_utils import get_logger
 from mindware.components.optimizers.base.config_space_utils import sample_configurations
 from mindware.components.computation.parallel_process import ParallelProcessEvaluator
+from mindware.components.optimizers.base.asha import run_asha_bracket
 
 
 class HyperbandBase(object):
     def __init__(self, eval_func, config_space,
-                 seed=1, R=81, eta=3, n_jobs=1):
+                 seed=1, R=81, eta=3, n_jobs=1, scheduler='sh'):
         self.eval_func = eval_func
         self.config_space = config_space
         self.n_workers = n_jobs
@@ -48,6 +49,11 @@ class HyperbandBase(object):
 
         self.eval_dict = dict()
 
+        # 'sh': synchronous successive halving; 'asha': promote as soon as a rung has enough results.
+        if scheduler not in ['sh', 'asha']:
+            raise ValueError('Invalid scheduler: %s!' % scheduler)
+        self.scheduler = scheduler
+
     def _iterate(self, s, budget=MAX_INT, skip_last=0):
 
         # Set initial number of configurations
@@ -61,9 +67,16 @@ class HyperbandBase(object):
         time_elapsed = time.time() - start_time
         self.logger.info("Choosing next batch of configurations took %.2f sec." % time_elapsed)
 
+        use_asha = self.scheduler == 'asha' and self.n_workers > 1
         with ParallelProcessEvaluator(self.eval_func, n_worker=self.n_workers) as executor:
+            if use_asha:
+                rung_results = run_asha_bracket(executor, T, r, self.R, self.eta, (s + 1) - int(skip_last),
+                                                deadline=start_time + budget)
             for i in range((s + 1) - int(skip_last)):  # changed from s + 1
-                if time.time() >= budget + start_time:
+                if use_asha:
+                    if i >= len(rung_results):
+                        break
+                elif time.time() >= budget + start_time:
                     break
 
                 # Run each of the n configs for <iterations>
@@ -75,9 +88,12 @@ class HyperbandBase(object):
                 self.logger.info("MFSE: %d configurations x size %d / %d each" %
                                  (int(n_configs), n_resource, self.R))
 
-                val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
-                                                       eta=self.eta,
-                                                       first_iter=(i == 0))
+                if use_asha:
+                    T, val_losses = rung_results[i]
+                else:
+                    val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
+                                                           eta=self.eta,
+                                                           first_iter=(i == 0))
                 for _id, _val_loss in enumerate(val_losses):
                     if np.isfinite(_val_loss):
                         self.target_x[int(n_resource)].append(T[_id])
@@ -7,12 +7,14 @@ from openbox.core.mf_batch_advisor import MFBatchAdvisor
 from mindware.utils.constant import MAX_INT
 from mindware.utils.logging_utils import get_logger
 from mindware.components.computation.parallel_process import ParallelProcessEvaluator
-from mindware.utils.decorators import time_limit
+from mindware.components.optimizers.base.asha import run_asha_bracket
+from mindware.components.utils.constants import SUCCESS
+from mindware.components.computation.trial_executor import TrialExecutor
 
 
 class MfseBase(object):
     def __init__(self, eval_func, config_space, per_run_time_limit=600,
-                 seed=1, R=81, eta=3, n_jobs=1, output_dir='./'):
+                 seed=1, R=81, eta=3, n_jobs=1, output_dir='./', scheduler='sh'):
         self.eval_func = eval_func
         self.config_space = config_space
         self.n_workers = n_jobs
@@ -56,6 +58,25 @@ class MfseBase(object):
         self.mf_advisor = MFBatchAdvisor(config_space, output_dir=output_dir)
         self.eval_dict = dict()
 
+        # The sequential trials run in a pre-forked subprocess, killed when exceeding the time limit.
+        # It is created on the first sequential trial, and closed by close_trial_executor.
+        self.trial_executor = None
+
+        # 'sh': synchronous successive halving; 'asha': promote as soon as a rung has enough results.
+        if scheduler not in ['sh', 'asha']:
+            raise ValueError('Invalid scheduler: %s!' % scheduler)
+        self.scheduler = scheduler
+
+    def get_trial_executor(self):
+        if self.trial_executor is None:
+            self.trial_executor = TrialExecutor(self.eval_func, time_limit=self.per_run_time_limit)
+        return self.trial_executor
+
+    def close_trial_executor(self):
+        if self.trial_executor is not None:
+            self.trial_executor.close()
+            self.trial_executor = None
+
     def _iterate(self, s, budget=MAX_INT, skip_last=0):
         # Set initial number of configurations
         n = int(ceil(self.B / self.R / (s + 1) * self.eta ** s))
@@ -70,9 +91,16 @@ class MfseBase(object):
 
         full_config_list = list()
         full_perf_list = list()
+        use_asha = self.scheduler == 'asha' and self.n_workers > 1
         with ParallelProcessEvaluator(self.eval_func, n_worker=self.n_workers) as executor:
+            if use_asha:
+                rung_results = run_asha_bracket(executor, T, r, self.R, self.eta, (s + 1) - int(skip_last),
+                                                deadline=start_time + budget)
             for i in range((s + 1) - int(skip_last)):  # changed from s + 1
-                if time.time() > budget + start_time:
+                if use_asha:
+                    if i >= len(rung_results):
+                        break
+                elif time.time() > budget + start_time:
                     break
 
                 # Run each of the n configs for <iterations>
@@ -84,10 +112,13 @@ class MfseBase(object):
                                  (int(n_configs), n_resource, self.R))
 
                 if self.n_workers > 1:
-                    # TODO: Time limit control
-                    val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
-                                                           eta=self.eta,
-                                                           first_iter=(i == 0))
+                    if use_asha:
+                        T, val_losses = rung_results[i]
+                    else:
+                        # TODO: Time limit control
+                        val_losses = executor.parallel_execute(T, resource_ratio=float(n_resource / self.R),
+                                                               eta=self.eta,
+                                                               first_iter=(i == 0))
                     for _id, _val_loss in enumerate(val_losses):
                         if np.isfinite(_val_loss):
                             self.target_x[int(n_resource)].append(T[_id])
@@ -100,11 +131,9 @@ class MfseBase(object):
                         if time.time() - start_time > budget:
                             self.logger.warning('Time limit exceeded!')
                             break
-                        try:
-                            with time_limit(self.per_run_time_limit):
-                                val_loss = self.eval_func(config, resource_ratio=float(n_resource / self.R),
-                                                          eta=self.eta, first_iter=(i == 0))
-                        except Exception as e:
+                        status, val_loss, _ = self.get_trial_executor().execute(
+                            config, resource_ratio=float(n_resource / self.R), eta=self.eta, first_iter=(i == 0))
+                        if status != SUCCESS:
                             # TODO: Distinguish error type
                             val_loss = np.inf
                         val_losses.append(val_loss)
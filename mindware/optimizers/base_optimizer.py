@@ -3,14 +3,22 @@ import os
 import time
 import numpy as np
 import pickle as pkl
+from collections import OrderedDict
+from ConfigSpace import Configuration
 from mindware.utils.constant import MAX_INT
 from mindware.utils.logging_utils import get_logger
 from mindware.components.evaluators.base_evaluator import _BaseEvaluator
+from mindware.components.utils.constants import SUCCESS, ERROR
 from mindware.components.utils.topk_saver import CombinedTopKModelSaver
+from mindware.components.utils.run_history import get_run_history_db
+
+# Only the runs recorded before this process started are restored; the optimizers record runs after this import.
+_process_start_time = time.time()
 
 
 class BaseOptimizer(object):
-    def __init__(self, evaluator: _BaseEvaluator, config_space, name, timestamp, eval_type, output_dir=None, seed=None):
+    def __init__(self, evaluator: _BaseEvaluator, config_space, name, timestamp, eval_type, output_dir=None, seed=None,
+                 resume=False):
         self.evaluator = evaluator
         self.config_space = config_space
 
@@ -27,6 +35,10 @@ class BaseOptimizer(object):
         self.timestamp = timestamp
         self.output_dir = output_dir
         self.topk_saver = CombinedTopKModelSaver(k=50, model_dir=self.output_dir, identifier=self.timestamp)
+        # Runs are appended to an on-disk history, from which a restarted search is restored if resume is set.
+        self.run_history = get_run_history_db(self.output_dir, self.timestamp)
+        self.resume = resume
+        self.restored_eval_dict = dict()
 
     @abc.abstractmethod
     def run(self):
@@ -36,8 +48,85 @@ class BaseOptimizer(object):
     def iterate(self, budget=MAX_INT):
         pass
 
+    def get_fixed_config(self):
+        fixed_config = getattr(self.evaluator, 'fixed_config', None)
+        if fixed_config is not None and not isinstance(fixed_config, dict):
+            fixed_config = fixed_config.get_dictionary()
+        return None if fixed_config is None else fixed_config.copy()
+
+    def get_fixed_id(self):
+        fixed_config = self.get_fixed_config()
+        return '' if fixed_config is None else CombinedTopKModelSaver.get_configuration_id(fixed_config)
+
+    def record_history(self, config_list, perf_list):
+        """
+            Append the evaluated configurations to the run history, including the failed ones.
+        :param perf_list: the losses returned by the evaluator.
+        """
+        fixed_config, fixed_id = self.get_fixed_config(), self.get_fixed_id()
+        records = list()
+        for config, perf in zip(config_list, perf_list):
+            config = config.copy() if isinstance(config, dict) else config.get_dictionary().copy()
+            full_config = config.copy()
+            if fixed_config is not None:
+                full_config.update(fixed_config)
+            valid = perf is not None and np.isfinite(perf) and perf != MAX_INT
+            # -perf: The larger, the better.
+            records.append((self.name, fixed_id, CombinedTopKModelSaver.get_configuration_id(full_config),
+                            full_config.get('algorithm'), config, -float(perf) if valid else None,
+                            SUCCESS if valid else ERROR))
+        self.run_history.append(records)
+
+    def restore_history(self):
+        """
+            Restore the runs recorded by an earlier search with the same output_dir, timestamp and fixed config,
+            e.g., a process that crashed. Only the runs recorded before this process started are restored, so the
+            optimizers rebuilt during a search (e.g., by AlternatingBlock.reinitialize) do not replay its runs.
+            The optimizers call it on construction if resume is set. The restored configurations are added to configs, perfs (or the
+            incumbent lists of Hyperband-based optimizers) and eval_dict, and are not evaluated again.
+        :return: the number of restored runs.
+        """
+        runs = OrderedDict()
+        for config_id, _, config, perf, status, created in self.run_history.get_runs(self.name, self.get_fixed_id()):
+            if created < _process_start_time:
+                runs[config_id] = (config, perf, status, created)
+
+        for config, perf, status, created in runs.values():
+            try:
+                config = Configuration(self.config_space, config)
+            except Exception:
+                # The configuration is not in the current search space.
+                continue
+            if self.name == 'hpo':
+                key = (getattr(self.evaluator, 'fe_config', None), config)
+            else:
+                key = (config, getattr(self.evaluator, 'hpo_config', None))
+            if status != SUCCESS:
+                self.restored_eval_dict[key] = [-np.inf, created, status]
+                continue
+            self.restored_eval_dict[key] = [perf, created, status]
+            if hasattr(self, 'incumbent_configs'):
+                self.incumbent_configs.append(config)
+                self.incumbent_perfs.append(-perf)
+            else:
+                self.configs.append(config)
+                self.perfs.append(perf)
+            if perf > getattr(self, 'incumbent_perf', -np.inf):
+                self.incumbent_perf = perf
+                self.incumbent_config = config
+
+        self.eval_dict.update(self.restored_eval_dict)
+        if len(runs) > 0:
+            self.logger.info('Restored %d runs from the run history.' % len(runs))
+        return len(runs)
+
+    def merge_restored_eval_dict(self):
+        for key, value in self.restored_eval_dict.items():
+            self.eval_dict.setdefault(key, value)
+
     # TODO：Refactor the other optimizers
     def update_saver(self, config_list, perf_list):
+        self.record_history(config_list, perf_list)
         # Check if all the configs is valid in case of storing None into the config file
         all_invalid = True
 
@@ -56,24 +145,14 @@ class BaseOptimizer(object):
                     config.update(fixed_config)
                 classifier_id = config['algorithm']
                 # -perf: The larger, the better.
+                # The saver writes the staged model if it enters the top-k, and deletes the evicted one.
                 save_flag, model_path, delete_flag, model_path_deleted = self.topk_saver.add(config, -perf,
                                                                                              classifier_id)
-                # By default, the evaluator has already stored the models.
                 if self.eval_type in ['holdout', 'partial']:
-                    if save_flag:
-                        pass
-                    else:
-                        os.remove(model_path)
-                        self.logger.info("Model deleted from %s" % model_path)
-
-                    try:
-                        if delete_flag:
-                            os.remove(model_path_deleted)
-                            self.logger.info("Model deleted from %s" % model_path_deleted)
-                        else:
-                            pass
-                    except:
-                        pass
+                    if not save_flag:
+                        self.logger.info("Model discarded: %s" % model_path)
+                    if delete_flag:
+                        self.logger.info("Model deleted from %s" % model_path_deleted)
             else:
                 continue
 
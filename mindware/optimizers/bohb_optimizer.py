@@ -9,16 +9,18 @@ class BohbOptimizer(BaseOptimizer, BohbBase):
     def __init__(self, evaluator, config_space, name, eval_type, time_limit=None, evaluation_limit=None,
                  per_run_time_limit=600, per_run_mem_limit=1024, output_dir='./', timestamp=None,
                  inner_iter_num_per_iter=1, seed=1,
-                 R=27, eta=3, mode='smac', n_jobs=1):
+                 R=27, eta=3, mode='smac', n_jobs=1, scheduler='sh', resume=False):
         BaseOptimizer.__init__(self, evaluator, config_space, name, eval_type=eval_type, timestamp=timestamp,
-                               output_dir=output_dir, seed=seed)
+                               output_dir=output_dir, seed=seed, resume=resume)
         BohbBase.__init__(self, eval_func=self.evaluator, config_generator=mode, config_space=self.config_space,
-                          seed=seed, R=R, eta=eta, n_jobs=n_jobs)
+                          seed=seed, R=R, eta=eta, n_jobs=n_jobs, scheduler=scheduler)
         self.time_limit = time_limit
         self.evaluation_num_limit = evaluation_limit
         self.inner_iter_num_per_iter = inner_iter_num_per_iter
         self.per_run_time_limit = per_run_time_limit
         self.per_run_mem_limit = per_run_mem_limit
+        if self.resume:
+            self.restore_history()
 
     def iterate(self, budget=MAX_INT):
         '''
@@ -31,7 +33,9 @@ class BohbOptimizer(BaseOptimizer, BohbBase):
             if _time_elapsed >= budget:
                 break
             budget_left = budget - _time_elapsed
+            _num_configs = len(self.incumbent_configs)
             self._iterate(self.s_values[self.inner_iter_id], budget=budget_left)
+            self.record_history(self.incumbent_configs[_num_configs:], self.incumbent_perfs[_num_configs:])
             self.inner_iter_id = (self.inner_iter_id + 1) % (self.s_max + 1)
 
             # Remove tmp model
@@ -8,11 +8,14 @@ from mindware.components.optimizers.tpe_optimizer import TPEOptimizer
 def build_hpo_optimizer(eval_type, evaluator, config_space, optimizer='smac',
                         per_run_time_limit=600, per_run_mem_limit=1024,
                         output_dir='./', inner_iter_num_per_iter=1,
-                        timestamp=None, seed=1, n_jobs=1):
+                        timestamp=None, seed=1, n_jobs=1, scheduler='sh', resume=False):
+    kwargs = dict()
     if eval_type == 'partial':
         optimizer_class = MfseOptimizer
+        kwargs['scheduler'] = scheduler
     elif eval_type == 'partial_bohb':
         optimizer_class = BohbOptimizer
+        kwargs['scheduler'] = scheduler
     else:
         # TODO: Support asynchronous BO
         if optimizer == 'random_search':
@@ -28,4 +31,4 @@ def build_hpo_optimizer(eval_type, evaluator, config_space, optimizer='smac',
                            eval_type=eval_type, output_dir=output_dir,
                            per_run_time_limit=per_run_time_limit,
                            inner_iter_num_per_iter=inner_iter_num_per_iter,
-                           timestamp=timestamp, seed=seed, n_jobs=n_jobs)
+                           timestamp=timestamp, seed=seed, n_jobs=n_jobs, resume=resume, **kwargs)
@@ -10,12 +10,12 @@ from mindware.components.optimizers.base.mfsebase import MfseBase
 class MfseOptimizer(BaseOptimizer, MfseBase):
     def __init__(self, evaluator, config_space, name, eval_type, time_limit=None, evaluation_limit=None,
                  per_run_time_limit=600, per_run_mem_limit=1024, output_dir='./', timestamp=None,
-                 inner_iter_num_per_iter=1, seed=1, R=27, eta=3, n_jobs=1):
+                 inner_iter_num_per_iter=1, seed=1, R=27, eta=3, n_jobs=1, scheduler='sh', resume=False):
         BaseOptimizer.__init__(self, evaluator, config_space, name, eval_type=eval_type, timestamp=timestamp,
-                               output_dir=output_dir, seed=seed)
+                               output_dir=output_dir, seed=seed, resume=resume)
         MfseBase.__init__(self, eval_func=self.evaluator, config_space=self.config_space,
                           per_run_time_limit=per_run_time_limit, seed=seed,
-                          R=R, eta=eta, n_jobs=n_jobs, output_dir=output_dir)
+                          R=R, eta=eta, n_jobs=n_jobs, output_dir=output_dir, scheduler=scheduler)
         self.time_limit = time_limit
         self.evaluation_num_limit = evaluation_limit
 
@@ -23,6 +23,8 @@ class MfseOptimizer(BaseOptimizer, MfseBase):
         self.inner_iter_num_per_iter = 5
         self.per_run_time_limit = per_run_time_limit
         self.per_run_mem_limit = per_run_mem_limit
+        if self.resume:
+            self.restore_history()
 
     def iterate(self, budget=MAX_INT):
         '''
@@ -83,3 +85,6 @@ class MfseOptimizer(BaseOptimizer, MfseBase):
 
     def get_evaluation_stats(self):
         return self.evaluation_stats
+
+    def gc(self):
+        self.close_trial_executor()
@@ -1,20 +1,28 @@
 import multiprocessing
+import queue
 import time
+import weakref
+import traceback
 import datetime
 import numpy as np
 import os
 import pickle
+from ConfigSpace import Configuration
 from smac.scenario.scenario import Scenario
 from smac.facade.smac_facade import SMAC
-from smac.optimizer import pSMAC
+from smac.tae.execute_ta_run import StatusType
 
 from mindware.components.optimizers.base_optimizer import BaseOptimizer
+from mindware.components.computation.shared_history import SharedHistoryBuffer, HistoryReader
+from mindware.components.utils.configspace_utils import estimate_config_num
 
 
 class PSMACOptimizer(BaseOptimizer):
     def __init__(self, evaluator, config_space, name, n_jobs=4, time_limit=None, evaluation_limit=200,
-                 per_run_time_limit=600, per_run_mem_limit=1024, output_dir='./', trials_per_iter=1, seed=1):
-        super().__init__(evaluator, config_space, name, seed)
+                 per_run_time_limit=600, per_run_mem_limit=1024, output_dir='./', trials_per_iter=1, seed=1,
+                 eval_type='holdout', timestamp=None):
+        super().__init__(evaluator, config_space, name, timestamp=timestamp, eval_type=eval_type,
+                         output_dir=output_dir, seed=seed)
         self.time_limit = time_limit
         self.evaluation_num_limit = evaluation_limit
         self.trials_per_iter = trials_per_iter
@@ -33,7 +41,8 @@ class PSMACOptimizer(BaseOptimizer):
                               "run_obj": "quality",
                               "cs": self.config_space,
                               "deterministic": "true",
-                              "shared-model": True,  # PSMAC Entry
+                              # The runs are exchanged through the shared history instead of the output dirs.
+                              "shared-model": False,
                               "runcount-limit": self.evaluation_num_limit,
                               "output_dir": output_dir,
                               "cutoff_time": self.per_run_time_limit
@@ -53,10 +62,19 @@ class PSMACOptimizer(BaseOptimizer):
         if hp_num == 0:
             self.config_num_threshold = 0
         else:
-            _threshold = int(len(set(self.config_space.sample_configuration(12500))) * 0.8)
+            _threshold = int(estimate_config_num(self.config_space, 12500) * 0.8)
             self.config_num_threshold = _threshold
         self.logger.info('HP_THRESHOLD is: %d' % self.config_num_threshold)
 
+        # The workers are started on the first iteration and live until gc, or until the optimizer is collected.
+        self.workers = list()
+        self.task_queues = list()
+        self.done_queue = None
+        self.trial_left = None
+        self.history = None
+        self.reader = None
+        self._finalizer = None
+
     def run(self):
         while True:
             if self.evaluation_num_limit is not None and self.trial_cnt > self.evaluation_num_limit:
@@ -69,10 +87,72 @@ class PSMACOptimizer(BaseOptimizer):
                 self.trials_this_run = self.evaluation_num_limit - self.trial_cnt
             self.iterate()
 
+        self.gc()
         return np.max(self.perfs)
 
+    def start_workers(self):
+        dim = len(self.config_space.get_hyperparameters())
+        capacity = max(4096, 2 * (self.evaluation_num_limit or 0))
+        self.history = SharedHistoryBuffer(dim, capacity=capacity)
+        self.reader = HistoryReader(self.history)
+        self.trial_left = multiprocessing.Value('i', 0)
+        self.done_queue = multiprocessing.Queue()
+        self.workers, self.task_queues = [None] * self.n_jobs, [None] * self.n_jobs
+        for i in range(self.n_jobs):
+            self.start_worker(i)
+        # Stop the workers and release the shared history if the optimizer is dropped without gc.
+        self._finalizer = weakref.finalize(self, _stop_workers, self.workers, self.task_queues, self.history)
+
+    def start_worker(self, worker_id):
+        task_queue = multiprocessing.Queue()
+        p = multiprocessing.Process(
+            target=_psmac_worker,
+            args=[worker_id, self.optimizer_list[worker_id], self.history, self.trial_left, task_queue,
+                  self.done_queue]
+        )
+        p.daemon = True
+        p.start()
+        self.workers[worker_id] = p
+        self.task_queues[worker_id] = task_queue
+
+    def run_trials(self, trial_num):
+        """
+            Let the workers run trial_num trials in total, and merge the observations they published.
+        """
+        if len(self.workers) == 0:
+            self.start_workers()
+        for worker_id, p in enumerate(self.workers):
+            if not p.is_alive():
+                self.logger.warning('PSMAC worker %d exited with code %s, restarting it.' % (worker_id, p.exitcode))
+                self.start_worker(worker_id)
+        with self.trial_left.get_lock():
+            self.trial_left.value = trial_num
+        for task_queue in self.task_queues:
+            task_queue.put(True)
+        # Wait for the workers to finish, but not for the ones that died (e.g., killed by the OOM killer).
+        pending = set(range(self.n_jobs))
+        while len(pending) > 0:
+            try:
+                pending.discard(self.done_queue.get(timeout=1))
+            except queue.Empty:
+                for worker_id in [_id for _id in pending if not self.workers[_id].is_alive()]:
+                    self.logger.error('PSMAC worker %d died with code %s!' % (worker_id,
+                                                                             self.workers[worker_id].exitcode))
+                    pending.discard(worker_id)
+
+        for vector, cost in self.reader.poll():
+            _reward = 1. - cost
+            _config = Configuration(self.config_space, vector=vector)
+            self.perfs.append(_reward)
+            self.configs.append(_config)
+            if _reward > self.incumbent_perf:
+                self.incumbent_perf = _reward
+                self.incumbent_config = _config
+        if self.reader.lost_num > 0:
+            self.logger.warning('%d observations were overwritten in the shared history!' % self.reader.lost_num)
+            self.reader.lost_num = 0
+
     def iterate(self):
-        trial_left = multiprocessing.Value('i', self.trials_this_run)
         _start_time = time.time()
         _flag = False
         if len(self.configs) >= self.config_num_threshold:
@@ -80,40 +160,7 @@ class PSMACOptimizer(BaseOptimizer):
             self.logger.warning('Already explored 70 percentage of the '
                                 'hp space: %d!' % self.config_num_threshold)
         else:
-            # for i in range(self.n_jobs):
-            #     self.trial_statistics.append(self.pool.submit(_iterate,
-            #                                                   self.optimizer_list[i], trial_left))
-            # self.wait_tasks_finish()
-            processes = []
-            return_hist = multiprocessing.Manager().list()
-            for i in range(self.n_jobs):
-                pSMAC.read(
-                    run_history=self.optimizer_list[i].solver.runhistory,
-                    output_dirs=self.optimizer_list[i].solver.scenario.output_dir + '/run_1',
-                    configuration_space=self.optimizer_list[i].solver.config_space,
-                    logger=self.optimizer_list[i].solver.logger,
-                )
-            for i in range(self.n_jobs):
-                p = multiprocessing.Process(
-                    target=_iterate,
-                    args=[self.optimizer_list[i], trial_left, return_hist]
-                )
-                processes.append(p)
-                p.start()
-            for p in processes:
-                p.join()
-
-            for runhistory in return_hist:
-                runkeys = list(runhistory.data.keys())
-                for key in runkeys:
-                    _reward = 1. - runhistory.data[key][0]
-                    _config = runhistory.ids_config[key[0]]
-                    if _config not in self.configs:
-                        self.perfs.append(_reward)
-                        self.configs.append(_config)
-                    if _reward > self.incumbent_perf:
-                        self.incumbent_perf = _reward
-                        self.incumbent_config = _config
+            self.run_trials(self.trials_this_run)
             self.trial_cnt += self.trials_per_iter
         if not _flag:
             iteration_cost = time.time() - _start_time
@@ -122,67 +169,65 @@ class PSMACOptimizer(BaseOptimizer):
         return self.incumbent_perf, iteration_cost, self.incumbent_config
 
     def optimize(self):
-        for i in range(self.n_jobs):
-            self.optimizer_list.append(SMAC(scenario=Scenario(self.scenario_dict),
-                                            rng=np.random.RandomState(None),  # Different seed for different optimizers
-                                            tae_runner=self.evaluator))
+        self.run_trials(self.evaluation_num_limit - self.trial_cnt)
+        self.trial_cnt = self.evaluation_num_limit
+        self.gc()
+        return self.incumbent_config, self.incumbent_perf
+
+    def gc(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self.workers, self.task_queues = list(), list()
+        self.history, self.reader, self._finalizer = None, None, None
+
 
-        processes = []
-        return_hist = multiprocessing.Manager().list()
-        for i in range(1, self.n_jobs):
-            p = multiprocessing.Process(
-                target=self._optimize,
-                args=[self.optimizer_list[i], return_hist]
-            )
-            processes.append(p)
-            p.start()
-        self._optimize(self.optimizer_list[0], return_hist)
-        for p in processes:
+def _stop_workers(workers, task_queues, history, timeout=10):
+    for task_queue in task_queues:
+        task_queue.put(None)
+    for p in workers:
+        p.join(timeout=timeout)
+        if p.is_alive():
+            p.terminate()
             p.join()
+    history.close()
 
-        for runhistory in return_hist:
-            runkeys = list(runhistory.data.keys())
-            for key in runkeys:
-                _reward = 1. - runhistory.data[key][0]
-                _config = runhistory.ids_config[key[0]]
-                if _config not in self.configs:
-                    self.perfs.append(_reward)
-                    self.configs.append(_config)
-                if _reward > self.incumbent_perf:
-                    self.incumbent_perf = _reward
-                    self.incumbent_config = _config
-        return self.incumbent_config, self.incumbent_perf
 
-    def _optimize(self, optimizer, hist_list):
-        optimizer.optimize()
-        pSMAC.read(
-            run_history=optimizer.solver.runhistory,
-            output_dirs=optimizer.solver.scenario.input_psmac_dirs,
-            configuration_space=optimizer.solver.config_space,
-            logger=optimizer.solver.logger,
-        )
-        hist_list.append(optimizer.solver.runhistory)
-
-    def wait_tasks_finish(self):
-        all_completed = False
-        while not all_completed:
-            all_completed = True
-            for trial in self.trial_statistics:
-                if not trial.done():
-                    all_completed = False
-                    time.sleep(0.1)
-                    break
-
-
-def _iterate(optimizer, runcount_left, return_hist):
-    while runcount_left.value > 0:
-        runcount_left.value -= 1
-        optimizer.iterate()
-    pSMAC.read(
-        run_history=optimizer.solver.runhistory,
-        output_dirs=optimizer.solver.scenario.input_psmac_dirs,
-        configuration_space=optimizer.solver.config_space,
-        logger=optimizer.solver.logger,
-    )
-    # print(optimizer.solver.runhistory.data)
-    return_hist.append(optimizer.solver.runhistory)
+def _psmac_worker(worker_id, optimizer, history, trial_left, task_queue, done_queue):
+    """
+        A long-lived PSMAC worker. Before each trial, it imports the runs published by the other workers
+        into its run history; after the trial, it publishes its own run.
+    """
+    solver = optimizer.solver
+    runhistory = solver.runhistory
+    reader = HistoryReader(history, worker_id)
+    while task_queue.get() is not None:
+        try:
+            while True:
+                with trial_left.get_lock():
+                    if trial_left.value <= 0:
+                        break
+                    trial_left.value -= 1
+
+                for vector, cost in reader.poll():
+                    runhistory.add(config=Configuration(solver.config_space, vector=vector), cost=cost, time=0.,
+                                   status=StatusType.SUCCESS)
+
+                run_num = len(runhistory.data)
+                optimizer.iterate()
+                # The runs of this trial are the last ones in the ordered run history.
+                new_runs = list()
+                for key in reversed(runhistory.data):
+                    if len(new_runs) == len(runhistory.data) - run_num:
+                        break
+                    new_runs.append((runhistory.ids_config[key.config_id], runhistory.data[key].cost))
+                for config, cost in reversed(new_runs):
+                    vector = config.get_array()
+                    if reader.mark_seen(vector):
+                        history.publish(vector, cost, worker_id)
+        except Exception:
+            # The other workers take over the trials left.
+            traceback.print_exc()
+        finally:
+            # The parent waits for every worker to report.
+            done_queue.put(worker_id)
+    history.close()
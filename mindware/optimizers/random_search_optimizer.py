@@ -5,15 +5,16 @@ from openbox.optimizer.parallel_smbo import pSMBO as pRandomSearch
 
 from mindware.components.utils.constants import SUCCESS
 from mindware.components.optimizers.base_optimizer import BaseOptimizer, MAX_INT
+from mindware.components.utils.configspace_utils import estimate_config_num
 
 
 class RandomSearchOptimizer(BaseOptimizer):
 
     def __init__(self, evaluator, config_space, name, eval_type, time_limit=None, evaluation_limit=None,
                  per_run_time_limit=300, output_dir='./', timestamp=None,
-                 inner_iter_num_per_iter=1, seed=1, n_jobs=1):
+                 inner_iter_num_per_iter=1, seed=1, n_jobs=1, resume=False):
         super().__init__(evaluator, config_space, name, eval_type=eval_type, timestamp=timestamp, output_dir=output_dir,
-                         seed=seed)
+                         seed=seed, resume=resume)
         self.time_limit = time_limit
         self.evaluation_num_limit = evaluation_limit
         self.inner_iter_num_per_iter = inner_iter_num_per_iter
@@ -47,13 +48,15 @@ class RandomSearchOptimizer(BaseOptimizer):
         if hp_num == 0:
             self.config_num_threshold = 0
         else:
-            _threshold = int(len(set(self.config_space.sample_configuration(5000))))
+            _threshold = int(estimate_config_num(self.config_space, 5000))
             self.config_num_threshold = _threshold
 
         self.logger.debug("The maximum trial number in HPO is :%d" % self.config_num_threshold)
         self.maximum_config_num = min(1500, self.config_num_threshold)
         self.eval_dict = {}
         self.n_jobs = n_jobs
+        if self.resume:
+            self.restore_history()
 
     def run(self):
         while True:
@@ -121,8 +124,12 @@ class RandomSearchOptimizer(BaseOptimizer):
                 hpo_config = None
             self.eval_dict = {(fe_config, hpo_config): [-run_history.perfs[i], time.time(), run_history.trial_states[i]]
                               for i, fe_config in enumerate(run_history.configurationsa)}
+        self.merge_restored_eval_dict()
+
         if len(run_history.get_incumbents()) > 0:
-            self.incumbent_config, self.incumbent_perf = run_history.get_incumbents()[0]
-            self.incumbent_perf = -self.incumbent_perf
+            incumbent_config, incumbent_perf = run_history.get_incumbents()[0]
+            # The restored incumbent is kept unless the runs of this process beat it.
+            if -incumbent_perf > self.incumbent_perf:
+                self.incumbent_config, self.incumbent_perf = incumbent_config, -incumbent_perf
         iteration_cost = time.time() - _start_time
         return self.incumbent_perf, iteration_cost, self.incumbent_config
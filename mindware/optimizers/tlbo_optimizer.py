@@ -8,6 +8,7 @@ from collections import OrderedDict
 from openbox.utils.constants import SUCCESS
 from openbox.optimizer.smbo import SMBO
 from solnml.components.optimizers.base_optimizer import BaseOptimizer, MAX_INT
+from mindware.components.utils.configspace_utils import estimate_config_num
 
 cur_dir = os.path.dirname(__file__)
 source_dir = os.path.join('%s', '..', 'transfer_learning', 'tlbo', 'runhistory') % cur_dir
@@ -53,7 +54,7 @@ class TlboOptimizer(BaseOptimizer):
         if hp_num == 0:
             self.config_num_threshold = 0
         else:
-            _threshold = int(len(set(self.config_space.sample_configuration(10000))) * 0.75)
+            _threshold = int(estimate_config_num(self.config_space, 10000) * 0.75)
             self.config_num_threshold = _threshold
         self.logger.debug('The maximum trial number in HPO is: %d' % self.config_num_threshold)
         self.maximum_config_num = min(600, self.config_num_threshold)
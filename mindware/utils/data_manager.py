@@ -1,8 +1,9 @@
+import multiprocessing
 import numpy as np
 import pandas as pd
 
 from mindware.components.utils.constants import *
-from mindware.components.utils.utils import is_discrete, detect_abnormal_type, detect_categorical_type
+from mindware.components.utils.utils import infer_feature_type
 from mindware.components.feature_engineering.transformation_graph import DataNode
 from mindware.components.feature_engineering.transformations.preprocessor.imputer import ImputationTransformation
 from mindware.components.feature_engineering.transformations.preprocessor.onehot_encoder import \
@@ -12,6 +13,95 @@ from mindware.components.feature_engineering.transformations.selector.variance_s
 default_missing_values = ["n/a", "na", "--", "-", "?"]
 
 
+def compact_column(values, float_dtype=None):
+    """
+        Store a column compactly: the float columns in float_dtype, and the object columns as category codes.
+    """
+    if isinstance(values, pd.Categorical):
+        return values
+    if values.dtype.kind == 'f' and float_dtype is not None:
+        return values.astype(float_dtype)
+    if values.dtype.kind == 'O':
+        return pd.Categorical(values)
+    return values
+
+
+def concat_column(parts):
+    if len(parts) == 1:
+        return parts[0]
+    if not any(isinstance(part, pd.Categorical) for part in parts):
+        return np.concatenate(parts)
+    from pandas.api.types import union_categoricals
+    # The chunks may parse the same column differently, so the categories are unified as objects.
+    categoricals = list()
+    for part in parts:
+        if not isinstance(part, pd.Categorical):
+            part = pd.Categorical(np.asarray(part, dtype=object))
+        categoricals.append(pd.Categorical.from_codes(part.codes, part.categories.astype(object)))
+    return union_categoricals(categoricals)
+
+
+def to_numeric_column(values):
+    if isinstance(values, pd.Categorical):
+        categories = pd.Series(np.asarray(values.categories, dtype=object))
+        numbers = pd.to_numeric(categories, errors='coerce').values.astype(np.float64)
+        return np.where(values.codes < 0, np.nan, numbers[values.codes])
+    return pd.to_numeric(pd.Series(values), errors='coerce').values
+
+
+def read_table(file_location, na_values=None, keep_default_na=True, header='infer', sep=',',
+               chunksize=100000, dtype=None, float_dtype=None):
+    """
+        Read a csv, parquet, feather or npy file into a data frame.
+
+        A csv file is read in chunks: each chunk is converted to compact columns (see compact_column) before
+        the next one is read, and the columns are concatenated one at a time, so that the peak memory stays
+        close to the size of the result. A npy file is memory-mapped.
+    """
+    suffix = file_location.split('.')[-1]
+    if suffix in ['csv', 'xls']:
+        if suffix == 'xls':
+            sep = ','
+        reader = pd.read_csv(file_location, keep_default_na=keep_default_na, na_values=na_values,
+                             header=header, sep=sep, dtype=dtype, chunksize=chunksize)
+        chunks = [reader] if chunksize is None else reader
+    elif suffix == 'parquet':
+        chunks = [pd.read_parquet(file_location)]
+    elif suffix == 'feather':
+        chunks = [pd.read_feather(file_location)]
+    elif suffix == 'npy':
+        X = np.load(file_location, mmap_mode='r')
+        if X.ndim != 2:
+            raise ValueError('Expected a 2-d array in %s!' % file_location)
+        if float_dtype is not None and X.dtype.kind == 'f':
+            X = X.astype(float_dtype)
+        return pd.DataFrame(X, copy=False)
+    else:
+        raise ValueError('Unsupported file format: %s!' % suffix)
+
+    columns, parts = None, None
+    for chunk in chunks:
+        if columns is None:
+            columns = chunk.columns
+            parts = [list() for _ in columns]
+        for idx in range(chunk.shape[1]):
+            parts[idx].append(compact_column(chunk.iloc[:, idx].values, float_dtype))
+        del chunk
+
+    data = dict()
+    for idx, column in enumerate(columns):
+        data[column] = concat_column(parts[idx])
+        parts[idx] = None
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+
+_infer_df = None
+
+
+def _infer_column_type(idx):
+    return infer_feature_type(_infer_df.iloc[:, idx].values)
+
+
 class DataManager(object):
     """
     This class implements the wrapper for data used in the ML task.
@@ -21,8 +111,13 @@ class DataManager(object):
     """
 
     # X,y should be None if using DataManager().load_csv(...)
-    def __init__(self, X=None, y=None, na_values=default_missing_values, feature_types=None, feature_names=None):
+    def __init__(self, X=None, y=None, na_values=default_missing_values, feature_types=None, feature_names=None,
+                 n_jobs=1):
+        """
+        :param n_jobs: the number of processes to infer the feature types.
+        """
         self.na_values = na_values
+        self.n_jobs = n_jobs
         self.feature_types = feature_types
         self.feature_names = feature_names
         self.missing_flags = None
@@ -41,43 +136,47 @@ class DataManager(object):
         for idx, col_name in enumerate(df.columns):
             self.missing_flags.append(True if col_name in columns_missed else False)
 
+        # Infer the columns in parallel; the workers are forked and read the columns of df directly.
+        if self.n_jobs > 1 and df.shape[1] > 1:
+            global _infer_df
+            _infer_df = df
+            try:
+                ctx = multiprocessing.get_context('fork')
+                with ctx.Pool(processes=min(self.n_jobs, df.shape[1])) as pool:
+                    results = pool.map(_infer_column_type, range(df.shape[1]))
+            finally:
+                _infer_df = None
+        else:
+            results = [infer_feature_type(df.iloc[:, idx].values) for idx in range(df.shape[1])]
+
         self.feature_types = list()
-        for idx, col_name in enumerate(df.columns):
-            col_vals = df[col_name].values
-            dtype = df[col_name].dtype
-
-            # Filter the element with missing value.
-            cleaned_vals = col_vals
-            if col_name in columns_missed:
-                cleaned_vals = np.array([val for val in col_vals if not pd.isnull(val)])
-
-            if dtype in [np.int, np.int16, np.int32, np.int64]:
-                feat_type = DISCRETE
-            elif dtype in [np.float, np.float16, np.float32, np.float64, np.double]:
-                feat_type = DISCRETE if is_discrete(cleaned_vals) else NUMERICAL
-            else:
-                flag, cand_values, ab_idx, is_str = detect_abnormal_type(col_vals)
-                if flag:
-                    # Set the invalid element to NaN.
-                    df.at[ab_idx, col_name] = np.nan
-                    # Refresh the cleaned column.
-                    cleaned_vals = np.array([val for val in df[col_name].values if not pd.isnull(val)])
-                    if is_str:
-                        feat_type = CATEGORICAL
-                    else:
-                        feat_type = DISCRETE if is_discrete(cleaned_vals) else NUMERICAL
-                else:
-                    feat_type = CATEGORICAL
+        for idx, (feat_type, ab_idx) in enumerate(results):
+            if len(ab_idx) > 0:
+                # Set the invalid element to NaN.
+                df.iloc[ab_idx, idx] = np.nan
             self.feature_types.append(feat_type)
 
+    def cast_numeric_columns(self, df, float_dtype=None):
+        """
+            Store the numerical and discrete columns read as strings or categories as floats.
+        """
+        for idx, feat_type in enumerate(self.feature_types):
+            if feat_type in [NUMERICAL, DISCRETE] and df.dtypes.iloc[idx].kind not in 'biuf':
+                numbers = to_numeric_column(df.iloc[:, idx].values)
+                df.isetitem(idx, numbers if float_dtype is None else numbers.astype(float_dtype))
+
     def get_data_node(self, X, y):
         if self.feature_types is None:
             raise ValueError("Feature type missing")
         return DataNode([X, y], self.feature_types, feature_names=self.feature_names)
 
     def clean_data_with_nan(self, df, label_col, phase='train', drop_index=None, has_label=True):
-        columns_missed = df.columns[df.isnull().any()].tolist()
-
+        """
+            Extract the labels, and remove the rows with NaN labels, the label column and the dropped columns.
+        :return: the cleaned data frame.
+        """
+        row_mask = None
+        drop_col = list()
         if has_label:
             if self.label_name is None:
                 if phase != 'train':
@@ -87,27 +186,40 @@ class DataManager(object):
                 label_colname = self.label_name
 
             self.label_name = label_colname
-            if label_colname in columns_missed:
-                labels = df[label_colname].values
-                row_idx = [idx for idx, val in enumerate(labels) if np.isnan(val)]
-                # Delete the row with NaN label.
-                df.drop(df.index[row_idx], inplace=True)
+            # Delete the row with NaN label.
+            label_missed = pd.isnull(df[label_colname]).values
+            if label_missed.any():
+                row_mask = ~label_missed
 
+            labels = np.asarray(df[label_colname])
+            labels = labels if row_mask is None else labels[row_mask]
             if phase == 'train':
-                self.train_y = df[label_colname].values
+                self.train_y = labels
             else:
-                self.test_y = df[label_colname].values
+                self.test_y = labels
 
             # Delete the label column.
-            df.drop(label_colname, axis=1, inplace=True)
+            drop_col.append(label_colname)
 
         if drop_index:
-            drop_col = [df.columns[index] for index in drop_index]
-            df.drop(drop_col, axis=1, inplace=True)
+            drop_col.extend([df.columns[index] for index in drop_index])
+        if row_mask is None and len(drop_col) == 0:
+            return df
+        # Select the rows and columns at once to copy the data only once.
+        keep_col = [col for col in df.columns if col not in drop_col]
+        if row_mask is None:
+            return df.loc[:, keep_col]
+        return df.loc[row_mask, keep_col]
 
     def load_train_csv(self, file_location, label_col=-1, drop_index=None,
                        keep_default_na=True, na_values=None, header='infer',
-                       sep=','):
+                       sep=',', chunksize=100000, dtype=None, float_dtype=None):
+        """
+        :param file_location: a csv, parquet, feather or npy file.
+        :param chunksize: the number of rows per chunk when reading a csv file; None reads it at once.
+        :param dtype: the dtypes of the columns, passed to pd.read_csv.
+        :param float_dtype: if given, e.g., np.float32, the float columns are cast to it.
+        """
         # Set the NA values.
         if na_values is not None:
             na_set = set(self.na_values)
@@ -115,26 +227,21 @@ class DataManager(object):
                 na_set.add(item)
             self.na_values = list(na_set)
 
-        if file_location.endswith('csv'):
-            df = pd.read_csv(file_location, keep_default_na=keep_default_na,
-                             na_values=self.na_values, header=header, sep=sep)
-        elif file_location.endswith('xls'):
-            df = pd.read_csv(file_location, keep_default_na=keep_default_na,
-                             na_values=self.na_values, header=header)
-        else:
-            raise ValueError('Unsupported file format: %s!' % file_location.split('.')[-1])
+        df = read_table(file_location, na_values=self.na_values, keep_default_na=keep_default_na, header=header,
+                        sep=sep, chunksize=chunksize, dtype=dtype, float_dtype=float_dtype)
 
         # Drop the row with all NaNs.
         df.dropna(how='all')
 
         # Clean the data where the label columns have nans.
-        self.clean_data_with_nan(df, label_col, drop_index=drop_index)
+        df = self.clean_data_with_nan(df, label_col, drop_index=drop_index)
 
         # The columns with missing values.
         columns_missed = df.columns[df.isnull().any()].tolist()
 
         # Identify the feature types
         self.set_feat_types(df, columns_missed)
+        self.cast_numeric_columns(df, float_dtype)
 
         self.train_X = df
         data = [self.train_X, self.train_y]
@@ -142,12 +249,13 @@ class DataManager(object):
 
     def load_test_csv(self, file_location, has_label=False, label_col=-1,
                       drop_index=None, keep_default_na=True, header='infer',
-                      sep=','):
-        df = pd.read_csv(file_location, keep_default_na=keep_default_na,
-                         na_values=self.na_values, header=header, sep=sep)
+                      sep=',', chunksize=100000, dtype=None, float_dtype=None):
+        df = read_table(file_location, na_values=self.na_values, keep_default_na=keep_default_na, header=header,
+                        sep=sep, chunksize=chunksize, dtype=dtype, float_dtype=float_dtype)
         # Drop the row with all NaNs.
         df.dropna(how='all')
-        self.clean_data_with_nan(df, label_col, phase='test', drop_index=drop_index, has_label=has_label)
+        df = self.clean_data_with_nan(df, label_col, phase='test', drop_index=drop_index, has_label=has_label)
+        self.cast_numeric_columns(df, float_dtype)
         self.test_X = df
 
         data = [self.test_X, self.test_y]
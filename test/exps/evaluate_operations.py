@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from collections import Counter
+
+sys.path.append(os.getcwd())
+from mindware.components.utils.operations import *
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=1000000)
+parser.add_argument('--cols', type=int, default=4)
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+
+# The list-based implementations before vectorization, kept for comparison.
+class LegacyLog(object):
+    def fit(self, array):
+        return
+
+    def transform(self, array):
+        return np.log(np.abs(array) + 1e-8)
+
+
+class LegacySqrt(LegacyLog):
+    def transform(self, array):
+        return np.sqrt(np.abs(array))
+
+
+class LegacySquare(LegacyLog):
+    def transform(self, array):
+        return np.square(array)
+
+
+class LegacyRound(LegacyLog):
+    def transform(self, array):
+        return np.around(array)
+
+
+class LegacyTanh(LegacyLog):
+    def transform(self, array):
+        return np.tanh(array)
+
+
+class LegacySigmoid(LegacyLog):
+    def transform(self, array):
+        return 1 / (1 + np.exp(-np.array(array)))
+
+
+class LegacyFreq(object):
+    def __init__(self):
+        self.hashmap = []
+        self.length = None
+        self.col_num = None
+
+    def fit(self, array):
+        self.col_num = array.shape[1]
+        self.length = array.shape[0]
+        counters = []
+        for i in range(self.col_num):
+            counters.append(Counter(array[:, i]))
+        for ct in counters:
+            self.hashmap.append({x: ct[x] / self.length for x in ct})
+
+    def transform(self, array):
+        result = []
+        col_num = array.shape[1]
+        assert (self.col_num == col_num)
+        for i in range(col_num):
+            col_result = []
+            for x in array[:, i]:
+                if x in self.hashmap[i]:
+                    col_result.append(self.hashmap[i][x])
+                else:
+                    col_result.append(1 / self.length)
+            result.append(col_result)
+        return np.array(result).transpose()
+
+
+def legacy_operate(model, X):
+    # ArithmeticTransformation.operate before vectorization.
+    X_new = np.array(X.tolist())
+    model.fit(X_new)
+    return model.transform(X_new)
+
+
+def operate(model, X):
+    X_new = np.asarray(X, dtype=float)
+    model.fit(X_new)
+    return model.transform(X_new)
+
+
+def timeit(func, *func_args):
+    costs, result = list(), None
+    for _ in range(args.repeat):
+        start_time = time.time()
+        result = func(*func_args)
+        costs.append(time.time() - start_time)
+    return min(costs), result
+
+
+def evaluate_operations():
+    rng = np.random.RandomState(1)
+    X = rng.randn(args.rows, args.cols) * 10
+    X_discrete = rng.randint(0, 1000, size=(args.rows, args.cols)).astype(float)
+    X_test = np.vstack((X_discrete[:args.rows // 2], X_discrete[:args.rows // 2] + 1000))
+
+    pairs = [('log', LegacyLog, Log, X), ('sqrt', LegacySqrt, Sqrt, X), ('square', LegacySquare, Square, X),
+             ('round', LegacyRound, Round, X), ('tanh', LegacyTanh, Tanh, X), ('sigmoid', LegacySigmoid, Sigmoid, X),
+             ('freq', LegacyFreq, Freq, X_discrete)]
+    print('%d rows x %d columns, best of %d.' % (args.rows, args.cols, args.repeat))
+    print('%-8s %12s %12s %9s %12s' % ('func', 'legacy (s)', 'new (s)', 'speedup', 'max abs err'))
+    for name, legacy_cls, new_cls, data in pairs:
+        legacy_cost, legacy_result = timeit(lambda: legacy_operate(legacy_cls(), data))
+        new_cost, new_result = timeit(lambda: operate(new_cls(), data))
+        error = np.max(np.abs(legacy_result - new_result) / np.maximum(np.abs(legacy_result), 1))
+        print('%-8s %12.4f %12.4f %8.1fx %12.2e' % (name, legacy_cost, new_cost, legacy_cost / new_cost, error))
+
+    # Frequency lookup with half of the values unseen during fit.
+    legacy_model, new_model = LegacyFreq(), Freq()
+    legacy_model.fit(X_discrete)
+    new_model.fit(X_discrete)
+    legacy_cost, legacy_result = timeit(legacy_model.transform, X_test)
+    new_cost, new_result = timeit(new_model.transform, X_test)
+    error = np.max(np.abs(legacy_result - new_result))
+    print('%-8s %12.4f %12.4f %8.1fx %12.2e' % ('unseen', legacy_cost, new_cost, legacy_cost / new_cost, error))
+
+
+if __name__ == "__main__":
+    evaluate_operations()